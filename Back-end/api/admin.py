@@ -6,7 +6,8 @@ from .models import (
     CareerOpportunity, TactsoBranch, TactsoCommitteeMember, ApplicationRequest,
     AdminStaffMember, AuditLog,
     SellerListing, Order, OrderItem,
-    UsersHelp, ContributionHistory, MonthlyReport, Visitor
+    UsersHelp, ContributionHistory, MonthlyReport, Visitor, FaceEmbedding, ChangeLogEntry,
+    AttendanceMonthlyRollup, WeeklyContribution, GeocodeCache, DuplicateFaceFlag
 )
 
 # ===========================
@@ -235,4 +236,47 @@ class ContributionHistoryAdmin(admin.ModelAdmin):
 class MonthlyReportAdmin(admin.ModelAdmin):
     list_display = ('community_name', 'month', 'year')
     list_filter = ('month', 'year')
-    search_fields = ('community_name',)
\ No newline at end of file
+    search_fields = ('community_name',)
+
+
+@admin.register(FaceEmbedding)
+class FaceEmbeddingAdmin(admin.ModelAdmin):
+    list_display = ('face_url', 'model_name', 'updated_at')
+    list_filter = ('model_name',)
+    search_fields = ('face_url',)
+    readonly_fields = ('embedding', 'created_at', 'updated_at')
+
+
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(admin.ModelAdmin):
+    list_display = ('seq', 'model_label', 'object_id', 'operation', 'changed_at')
+    list_filter = ('model_label', 'operation')
+    search_fields = ('object_id',)
+
+
+@admin.register(AttendanceMonthlyRollup)
+class AttendanceMonthlyRollupAdmin(admin.ModelAdmin):
+    list_display = ('member_uid', 'community_name', 'year', 'month', 'present_count')
+    list_filter = ('year', 'month', 'is_visitor')
+    search_fields = ('member_uid', 'community_name')
+
+
+@admin.register(WeeklyContribution)
+class WeeklyContributionAdmin(admin.ModelAdmin):
+    list_display = ('member_uid', 'community_name', 'year', 'month', 'week', 'amount')
+    list_filter = ('year', 'month', 'week')
+    search_fields = ('member_uid', 'community_name', 'district_elder_name')
+
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ('address', 'found', 'latitude', 'longitude', 'updated_at')
+    list_filter = ('found',)
+    search_fields = ('address_key',)
+
+
+@admin.register(DuplicateFaceFlag)
+class DuplicateFaceFlagAdmin(admin.ModelAdmin):
+    list_display = ('member_uid', 'candidate_uid', 'score', 'status', 'created_at')
+    list_filter = ('status',)
+    search_fields = ('member_uid', 'candidate_uid')
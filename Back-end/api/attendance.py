@@ -0,0 +1,371 @@
+"""
+Attendance rollups and report queries.
+
+AttendanceMonthlyRollup keeps, per member and month, two day bitmaps (bit d
+set = a log exists / the member was present on day d) and the present count.
+Rollups are refreshed from AttendanceLog in the same transaction as every log
+write, so reports read a handful of rollup rows instead of scanning daily logs.
+"""
+import json
+import uuid
+import datetime
+from calendar import monthrange
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import (
+    BigIntegerField, BooleanField, CharField, Case, Count, Exists, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+)
+from django.db.models.functions import (
+    Cast, Coalesce, Concat, ExtractDay, ExtractMonth, ExtractYear, Lower, Power, Replace, Substr
+)
+from django.utils import timezone
+
+from rest_framework import serializers
+
+from .models import AttendanceLog, AttendanceMonthlyRollup, Users, Visitor
+from .signals import invalidate_model
+from .sync import record_changes
+
+ROLLUP_FIELDS = ['is_visitor', 'community_name', 'recorded_days', 'present_days', 'present_count', 'updated_at']
+ROLLUP_COLUMNS = ['id', 'member_uid', 'year', 'month'] + ROLLUP_FIELDS
+LOG_FIELDS = ['community_name', 'is_visitor', 'is_present', 'updated_at']
+LOG_COLUMNS = ['id', 'member_uid', 'date'] + LOG_FIELDS
+
+def month_bounds(year, month):
+    start = datetime.date(year, month, 1)
+    return start, start + datetime.timedelta(days=monthrange(year, month)[1])
+
+# ==========================================
+# BULK UPSERT
+# ==========================================
+
+def upsert_rows(model, columns, rows, unique_fields, update_fields, returning=None):
+    """
+    The INSERT ... ON CONFLICT DO UPDATE that bulk_create(update_conflicts=True)
+    issues, for plain value tuples (in `columns` order). Skips building and
+    preparing a model instance per row, which is most of bulk_create's cost at
+    a thousand rows. Returns the `returning` field of every written row (the
+    existing row's value on conflict) when the backend can report it, else None.
+    """
+    # The wrapper itself, not the django.db.connection proxy (a thread-local lookup per access)
+    connection = connections[DEFAULT_DB_ALIAS]
+    opts, quote = model._meta, connection.ops.quote_name
+    fields = [opts.get_field(name) for name in columns]
+    prepared = [{} for _ in fields]
+
+    def prepare(index, value):
+        # Drivers take str/int/bool/None as they are; anything else (uuid, date,
+        # datetime) goes through the field once per distinct value
+        if value is None or type(value) in (str, int, bool): return value
+        cache = prepared[index]
+        if value not in cache: cache[value] = fields[index].get_db_prep_save(value, connection)
+        return cache[value]
+
+    returning = opts.get_field(returning) if returning and connection.features.can_return_rows_from_bulk_insert else None
+    sql_columns = ', '.join(quote(field.column) for field in fields)
+    conflict = ', '.join(quote(opts.get_field(name).column) for name in unique_fields)
+    updates = ', '.join(f"{quote(opts.get_field(name).column)} = EXCLUDED.{quote(opts.get_field(name).column)}" for name in update_fields)
+    row_sql = f"({', '.join(['%s'] * len(fields))})"
+    batch_size = max(1, min(500, connection.ops.bulk_batch_size(fields, rows)))
+
+    written = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = (
+                f"INSERT INTO {quote(opts.db_table)} ({sql_columns}) VALUES {', '.join([row_sql] * len(batch))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+            )
+            if returning: sql += f" RETURNING {quote(returning.column)}"
+            cursor.execute(sql, [prepare(i, value) for row in batch for i, value in enumerate(row)])
+            if returning: written += [returning.to_python(row[0]) for row in cursor.fetchall()]
+    return written if returning else None
+
+# ==========================================
+# ROLLUP MAINTENANCE
+# ==========================================
+
+def monthly_aggregates(logs):
+    """Groups a log queryset by member and month into rollup values (bitmaps + counts), in the database."""
+    day_bit = Cast(Power(Value(2), ExtractDay('date')), BigIntegerField())
+    return logs.annotate(year=ExtractYear('date'), month=ExtractMonth('date')).values('member_uid', 'year', 'month').annotate(
+        recorded=Sum(day_bit),
+        present=Sum(Case(When(is_present=True, then=day_bit), default=Value(0), output_field=BigIntegerField())),
+        present_total=Count('id', filter=Q(is_present=True)),
+        visitor_logs=Count('id', filter=Q(is_visitor=True)),
+        community=Max('community_name'),
+    ).order_by()
+
+def save_rollups(aggregates, batch_size=1000):
+    """Upserts rollups from monthly_aggregates() rows, a batch at a time. Returns the number written."""
+    written, batch, now = 0, [], timezone.now()
+    for row in aggregates:
+        batch.append((
+            uuid.uuid4(), row['member_uid'], row['year'], row['month'],
+            row['visitor_logs'] > 0, row['community'] or '',
+            row['recorded'] or 0, row['present'] or 0, row['present_total'], now,
+        ))
+        if len(batch) >= batch_size:
+            written += _upsert_rollups(batch)
+            batch = []
+    if batch: written += _upsert_rollups(batch)
+    return written
+
+def _upsert_rollups(rollups):
+    upsert_rows(AttendanceMonthlyRollup, ROLLUP_COLUMNS, rollups, ['member_uid', 'year', 'month'], ROLLUP_FIELDS)
+    return len(rollups)
+
+def rollup_updates(logs):
+    """
+    Rollup column values recomputed from `logs` (one member's logs for the
+    month, correlated on OuterRef('member_uid')), for queryset.update().
+    """
+    day_bit = Cast(Power(Value(2), ExtractDay('date')), BigIntegerField())
+    member_logs = logs.order_by().values('member_uid')
+
+    def per_member(aggregate, output_field, default):
+        value = Subquery(member_logs.annotate(value=aggregate).values('value')[:1], output_field=output_field)
+        return Coalesce(value, Value(default), output_field=output_field)
+
+    return {
+        'recorded_days': per_member(Sum(day_bit), BigIntegerField(), 0),
+        'present_days': per_member(Sum(day_bit, filter=Q(is_present=True)), BigIntegerField(), 0),
+        'present_count': per_member(Count('id', filter=Q(is_present=True)), IntegerField(), 0),
+        'is_visitor': Exists(logs.filter(is_visitor=True)),
+        'community_name': per_member(Max('community_name'), CharField(), ''),
+        'updated_at': timezone.now(),
+    }
+
+def refresh_rollups(member_uids, year, month):
+    """
+    Recomputes the rollups of these members for one month (at most 31 logs each,
+    read through the (member_uid, date) index). Call inside the transaction
+    that wrote the logs. Existing rollups are recomputed by a single UPDATE;
+    only members without one for the month go through the aggregate + insert.
+    """
+    member_uids = set(member_uids)
+    start, end = month_bounds(year, month)
+    month_logs = AttendanceLog.objects.filter(date__gte=start, date__lt=end)
+    rollups = AttendanceMonthlyRollup.objects.filter(member_uid__in=member_uids, year=year, month=month)
+
+    updated = rollups.update(**rollup_updates(month_logs.filter(member_uid=OuterRef('member_uid'))))
+    if updated == len(member_uids): return updated
+    missing = member_uids.difference(rollups.values_list('member_uid', flat=True))
+    return updated + save_rollups(monthly_aggregates(month_logs.filter(member_uid__in=missing)))
+
+def record_attendance(member_uid, community_name, is_visitor, is_present, date):
+    with transaction.atomic():
+        AttendanceLog.objects.update_or_create(
+            member_uid=member_uid, date=date,
+            defaults={'community_name': community_name, 'is_visitor': is_visitor, 'is_present': is_present}
+        )
+        refresh_rollups([member_uid], date.year, date.month)
+
+
+# ==========================================
+# REPORTS
+# ==========================================
+
+def attendance_summary(year, community=None, overseer_uid=None, month=None):
+    """Per-community, per-month totals read straight from the rollups (no log scan)."""
+    rollups = AttendanceMonthlyRollup.objects.filter(year=year).annotate(community_key=Lower('community_name'))
+    if month: rollups = rollups.filter(month=month)
+    if community: rollups = rollups.filter(community_key=community.strip().lower())
+    if overseer_uid:
+        communities = Users.objects.filter(overseer_uid=overseer_uid).annotate(key=Lower('community_name')).values('key')
+        rollups = rollups.filter(community_key__in=communities)
+    return list(
+        rollups.values('community_name', 'month').annotate(
+            members=Count('id', filter=Q(is_visitor=False)),
+            visitors=Count('id', filter=Q(is_visitor=True)),
+            present_total=Sum('present_count'),
+        ).order_by('community_name', 'month')
+    )
+
+def _rollup_subquery(year, month, column):
+    rollup = AttendanceMonthlyRollup.objects.filter(member_uid=OuterRef('uid_key'), year=year, month=month)
+    return Coalesce(Subquery(rollup.values(column)[:1], output_field=BigIntegerField()), Value(0), output_field=BigIntegerField())
+
+def visitor_uid(field='id'):
+    """
+    A visitor's id as str(uuid) (dashed), the form AttendanceLog and the rollups
+    store. Cast alone gives dashes on Postgres but 32 bare hex digits on SQLite,
+    so strip any dashes and put them back in the same places on every backend.
+    """
+    hex_id = Replace(Lower(Cast(field, output_field=CharField())), Value('-'), Value(''))
+    parts = [Substr(hex_id, start, length) for start, length in ((1, 8), (9, 4), (13, 4), (17, 4), (21, 12))]
+    return Concat(
+        parts[0], Value('-'), parts[1], Value('-'), parts[2], Value('-'), parts[3], Value('-'), parts[4],
+        output_field=CharField(),
+    )
+
+def _member_rows(queryset, year, month, is_visitor):
+    # Both member tables are projected onto the same columns so they can be UNIONed
+    # (names differ from the model fields because annotations can't shadow them)
+    uid_key = visitor_uid() if is_visitor else F('uid')
+    queryset = queryset.annotate(uid_key=uid_key).annotate(
+        present_mask=_rollup_subquery(year, month, 'present_days'),
+        recorded_mask=_rollup_subquery(year, month, 'recorded_days'),
+    )
+    return queryset.values(
+        community_key=Lower('community_name'),
+        community_name_out=F('community_name'),
+        ui_id=F('uid_key'),
+        name_out=F('name'),
+        surname_out=F('surname'),
+        gender_out=F('gender'),
+        is_visitor_out=Value(is_visitor, output_field=BooleanField()),
+        visitor_category_out=F('visitor_category') if is_visitor else Value('Registered', output_field=CharField()),
+        visitor_role_out=F('visitor_role') if is_visitor else Value('', output_field=CharField()),
+        present=F('present_mask'),
+        recorded=F('recorded_mask'),
+    )
+
+def attendance_rows(year, month, community=None, overseer_uid=None, district_elder_name=None):
+    """
+    One UNION query over Users and Visitors (filtered by one community, or by
+    overseer and optionally district), each joined to its month's rollup,
+    ordered by community. Yields one dict per member.
+    """
+    users, visitors = Users.objects.all(), Visitor.objects.all()
+    if community:
+        key = community.strip().lower()
+        users = users.annotate(community_lower=Lower('community_name')).filter(community_lower=key)
+        visitors = visitors.annotate(community_lower=Lower('community_name')).filter(community_lower=key)
+    if overseer_uid:
+        users, visitors = users.filter(overseer_uid=overseer_uid), visitors.filter(overseer_uid=overseer_uid)
+    if district_elder_name:
+        users = users.filter(district_elder_name__iexact=district_elder_name.strip())
+        visitors = visitors.filter(district_elder_name__iexact=district_elder_name.strip())
+
+    combined = _member_rows(users, year, month, False).union(
+        _member_rows(visitors, year, month, True), all=True
+    ).order_by('community_key', 'is_visitor_out')
+    yield from combined.iterator(chunk_size=1000)
+
+def build_row(row, num_days):
+    present, recorded = row['present'], row['recorded']
+    attendance = {day: bool(present >> day & 1) for day in range(1, num_days + 1) if recorded >> day & 1}
+    total_present = bin(present).count('1')
+    percentage = (total_present / num_days) * 100 if num_days > 0 else 0
+    return {
+        'ui_id': row['ui_id'], 'name': row['name_out'], 'surname': row['surname_out'],
+        'gender': row['gender_out'], 'is_visitor': row['is_visitor_out'], 'visitor_category': row['visitor_category_out'],
+        'visitor_role': row['visitor_role_out'] or '', 'attendance': attendance, 'total_present': total_present,
+        'total_absent': num_days - total_present, 'percentage': round(percentage, 1)
+    }
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+def stream_community_report(community, year, month):
+    num_days = monthrange(year, month)[1]
+    yield _dumps({'community_name': community, 'month': month, 'year': year, 'num_days': num_days})[:-1] + ', "data": ['
+    for i, row in enumerate(attendance_rows(year, month, community=community)):
+        yield (',' if i else '') + _dumps(build_row(row, num_days))
+    yield ']}'
+
+def stream_regional_report(year, month, overseer_uid, district_elder_name=None):
+    """Same rows as the community report, grouped per community, for a whole overseer or district."""
+    num_days = monthrange(year, month)[1]
+    header = {'overseer_uid': overseer_uid, 'district_elder_name': district_elder_name, 'month': month, 'year': year, 'num_days': num_days}
+    yield _dumps(header)[:-1] + ', "communities": ['
+    current, first_group, first_row = None, True, True
+    for row in attendance_rows(year, month, overseer_uid=overseer_uid, district_elder_name=district_elder_name):
+        if row['community_key'] != current:
+            if current is not None: yield ']}'
+            yield ('' if first_group else ',') + _dumps({'community_name': row['community_name_out']})[:-1] + ', "data": ['
+            current, first_group, first_row = row['community_key'], False, True
+        yield ('' if first_row else ',') + _dumps(build_row(row, num_days))
+        first_row = False
+    if current is not None: yield ']}'
+    yield ']}'
+
+
+# ==========================================
+# BULK CHECK-IN
+# ==========================================
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+_FLAG = serializers.BooleanField()
+
+def _parse_flags(entry):
+    # Same parsing as the serializers: "false"/"0"/"no" are False, anything unrecognised is an error
+    flags = {}
+    for name in ('is_visitor', 'present'):
+        value = entry.get(name)
+        try:
+            flags[name] = False if value is None else _FLAG.to_internal_value(value)
+        except serializers.ValidationError:
+            raise ValueError(f"{name} must be a boolean")
+    return flags['is_visitor'], flags['present']
+
+def bulk_record_attendance(community_name, date, entries):
+    """
+    Marks a whole service at once. `entries` is a list of
+    {'member_uid', 'is_visitor', 'present'}; returns one result per entry.
+    All logs are upserted in one statement and last_attended_date, rollups and
+    the change feed are updated in bulk, in a single transaction.
+    """
+    results = [None] * len(entries)
+    latest, parsed = {}, {}
+    for i, entry in enumerate(entries):
+        member_uid = str(entry.get('member_uid') or '').strip() if isinstance(entry, dict) else ''
+        if not member_uid:
+            results[i] = {'index': i, 'status': 'invalid', 'error': 'member_uid is required'}
+            continue
+        try:
+            is_visitor, present = _parse_flags(entry)
+        except ValueError as e:
+            results[i] = {'index': i, 'member_uid': member_uid, 'status': 'invalid', 'error': str(e)}
+            continue
+        if is_visitor and not _is_uuid(member_uid):
+            results[i] = {'index': i, 'member_uid': member_uid, 'status': 'not_found'}
+            continue
+        if member_uid in latest:
+            # The last entry for a member wins
+            earlier = latest[member_uid]
+            results[earlier] = {'index': earlier, 'member_uid': member_uid, 'status': 'duplicate'}
+        latest[member_uid], parsed[member_uid] = i, (is_visitor, present)
+
+    user_uids = {uid for uid, (is_visitor, _) in parsed.items() if not is_visitor}
+    visitor_ids = {uid for uid, (is_visitor, _) in parsed.items() if is_visitor}
+    # uid -> primary key, which the change feed needs for the users marked present
+    known = dict(Users.objects.filter(uid__in=user_uids).values_list('uid', 'id'))
+    known.update((str(pk), pk) for pk in Visitor.objects.filter(id__in=visitor_ids).values_list('id', flat=True))
+
+    logs, now = [], timezone.now()
+    for uid, (is_visitor, present) in parsed.items():
+        i = latest[uid]
+        if uid not in known:
+            results[i] = {'index': i, 'member_uid': uid, 'status': 'not_found'}
+            continue
+        logs.append((uuid.uuid4(), uid, date, community_name, is_visitor, present, now))
+        results[i] = {'index': i, 'member_uid': uid, 'is_visitor': is_visitor, 'present': present, 'status': 'saved'}
+
+    if logs:
+        saved_uids = [log[1] for log in logs]
+        present_users = [log[1] for log in logs if log[5] and not log[4]]
+        present_visitors = [log[1] for log in logs if log[5] and log[4]]
+        with transaction.atomic():
+            log_ids = upsert_rows(AttendanceLog, LOG_COLUMNS, logs, ['member_uid', 'date'], LOG_FIELDS, returning='id')
+            if present_users: Users.objects.filter(uid__in=present_users).update(last_attended_date=date)
+            if present_visitors: Visitor.objects.filter(id__in=present_visitors).update(last_attended_date=date)
+            refresh_rollups(saved_uids, date.year, date.month)
+
+            # Raw upserts and update() skip signals: feed the change log and caches explicitly
+            if log_ids is None:
+                log_ids = AttendanceLog.objects.filter(member_uid__in=saved_uids, date=date).values_list('id', flat=True)
+            record_changes(AttendanceLog, log_ids)
+            record_changes(Users, [known[uid] for uid in present_users])
+            record_changes(Visitor, present_visitors)
+            for model in (AttendanceLog, Users, Visitor): invalidate_model(model)
+
+    return results
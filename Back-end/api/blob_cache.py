@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def blob_key(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+class DecryptedBlobCache:
+    """
+    Process-local LRU of decrypted blobs (content type + bytes) keyed by the
+    encrypted URL and bounded by total size in bytes. An optional shared tier
+    (any configured Django cache alias, e.g. Redis) is consulted on a local miss.
+    """
+
+    def __init__(self, max_bytes, max_item_bytes, shared_alias=None, shared_timeout=None):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.shared_alias = shared_alias
+        self.shared_timeout = shared_timeout
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def get(self, url):
+        key = blob_key(url)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                return item
+        if self.shared is not None:
+            item = self.shared.get(f"decrypted_blob_{key}")
+            if item is not None:
+                self._store(key, item)
+                return item
+        return None
+
+    def set(self, url, content_type, data):
+        if len(data) > self.max_item_bytes: return
+        key = blob_key(url)
+        item = (content_type, bytes(data))
+        self._store(key, item)
+        if self.shared is not None:
+            self.shared.set(f"decrypted_blob_{key}", item, timeout=self.shared_timeout)
+
+    def _store(self, key, item):
+        size = len(item[1])
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None: self._size -= len(old[1])
+            while self._items and self._size + size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._size -= len(evicted)
+            self._items[key] = item
+            self._size += size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+decrypted_blob_cache = DecryptedBlobCache(
+    max_bytes=getattr(settings, 'DECRYPTED_BLOB_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+    max_item_bytes=getattr(settings, 'DECRYPTED_BLOB_CACHE_MAX_ITEM_BYTES', 8 * 1024 * 1024),
+    shared_alias=getattr(settings, 'DECRYPTED_BLOB_SHARED_CACHE', None),
+    shared_timeout=getattr(settings, 'DECRYPTED_BLOB_SHARED_TIMEOUT', 60 * 60),
+)
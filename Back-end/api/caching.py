@@ -0,0 +1,182 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Generation counters never expire; they only move forward
+GENERATION_TIMEOUT = None
+FILL_POLL_INTERVAL = 0.05
+
+
+def generation_key(model_name):
+    return f"cache_gen_{model_name}"
+
+def get_generation(model_name):
+    """
+    Current cache generation of a model. Seeded from the clock when missing
+    (first use, or evicted), so a lost counter never reuses an old generation.
+    """
+    key = generation_key(model_name)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns() // 1000, timeout=GENERATION_TIMEOUT)
+        generation = cache.get(key)
+    return generation
+
+def bump_generation(model_name):
+    # O(1) invalidation: every key built on the old generation becomes unreachable
+    key = generation_key(model_name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation = time.time_ns() // 1000
+        cache.set(key, generation, timeout=GENERATION_TIMEOUT)
+        return generation
+
+def params_hash(query_params):
+    # Same filters in any order (or with stray whitespace) map to the same key
+    normalized = sorted((key, [value.strip() for value in query_params.getlist(key)]) for key in query_params.keys())
+    return hashlib.sha1(json.dumps(normalized).encode('utf-8')).hexdigest()
+
+def list_cache_key(model_name, query_params):
+    return f"list_cache_{model_name}_{get_generation(model_name)}_{params_hash(query_params)}"
+
+
+# ==========================================
+# STAMPEDE PROTECTION + STALE-WHILE-REVALIDATE
+# ==========================================
+
+class UncacheableResponse(Exception):
+    """Raised by a fill function whose result must be returned but not cached (e.g. an error response)."""
+
+    def __init__(self, response):
+        super().__init__(response)
+        self.response = response
+
+
+class CacheStats:
+    """
+    Hit/miss/fill-time counters per key family (e.g. the model name of a
+    cached list), kept per process and exposed by the cache_stats endpoint.
+    """
+    FIELDS = ('hits', 'stale_hits', 'misses', 'coalesced', 'fills', 'fill_errors', 'fill_time_ms')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, name, field, amount=1):
+        with self._lock:
+            counters = self._counters.setdefault(name, dict.fromkeys(self.FIELDS, 0))
+            counters[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, counters in self._counters.items():
+                counters = dict(counters)
+                lookups = counters['hits'] + counters['stale_hits'] + counters['misses']
+                counters['hit_ratio'] = round((counters['hits'] + counters['stale_hits']) / lookups, 4) if lookups else None
+                counters['avg_fill_ms'] = round(counters['fill_time_ms'] / counters['fills'], 2) if counters['fills'] else None
+                result[name] = counters
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+cache_stats = CacheStats()
+
+# Threads of this process waiting on the same key share one of these locks;
+# across processes the cache.add() lock below does the same job.
+_fill_locks = [threading.Lock() for _ in range(64)]
+
+def _local_lock(key):
+    return _fill_locks[hash(key) % len(_fill_locks)]
+
+def _fill_lock_key(key):
+    return f"fill_lock_{key}"
+
+def _store(key, value, timeout, stale_ttl):
+    entry = {'value': value, 'fresh_until': time.time() + timeout if timeout else None}
+    cache.set(key, entry, timeout=timeout + stale_ttl if timeout else None)
+
+def _fill(key, fill, timeout, stale_ttl, name):
+    started = time.monotonic()
+    try:
+        value = fill()
+    except UncacheableResponse:
+        raise
+    except Exception:
+        cache_stats.record(name, 'fill_errors')
+        raise
+    cache_stats.record(name, 'fills')
+    cache_stats.record(name, 'fill_time_ms', int((time.monotonic() - started) * 1000))
+    _store(key, value, timeout, stale_ttl)
+    return value
+
+def _revalidate_in_background(key, fill, timeout, stale_ttl, name):
+    lock_key = _fill_lock_key(key)
+    if not cache.add(lock_key, 1, timeout=getattr(settings, 'CACHE_FILL_LOCK_TIMEOUT', 30)): return
+
+    def run():
+        try:
+            _fill(key, fill, timeout, stale_ttl, name)
+        except Exception as e:
+            logger.warning(f"⚠️ Background refresh of {name} failed: {e}")
+        finally:
+            cache.delete(lock_key)
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
+
+def get_or_fill(key, fill, timeout, name, stale_ttl=None):
+    """
+    Returns the cached value for `key`, calling `fill()` at most once across
+    all concurrent callers on a miss. Once `timeout` passes the entry is still
+    served for `stale_ttl` seconds while one background refresh runs.
+    """
+    stale_ttl = getattr(settings, 'CACHE_STALE_TTL', 300) if stale_ttl is None else stale_ttl
+    entry = cache.get(key)
+    if entry is not None:
+        if entry['fresh_until'] is None or entry['fresh_until'] > time.time():
+            cache_stats.record(name, 'hits')
+        else:
+            cache_stats.record(name, 'stale_hits')
+            _revalidate_in_background(key, fill, timeout, stale_ttl, name)
+        return entry['value']
+
+    cache_stats.record(name, 'misses')
+    with _local_lock(key):
+        entry = cache.get(key)
+        if entry is not None:
+            cache_stats.record(name, 'coalesced')
+            return entry['value']
+
+        lock_key = _fill_lock_key(key)
+        lock_timeout = getattr(settings, 'CACHE_FILL_LOCK_TIMEOUT', 30)
+        acquired = cache.add(lock_key, 1, timeout=lock_timeout)
+        if not acquired:
+            # Another process is filling this key: wait for its result instead of querying too
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(FILL_POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    cache_stats.record(name, 'coalesced')
+                    return entry['value']
+                if cache.get(lock_key) is None: break
+            acquired = cache.add(lock_key, 1, timeout=lock_timeout)
+        try:
+            return _fill(key, fill, timeout, stale_ttl, name)
+        finally:
+            # Never release a lock another process took while we waited
+            if acquired: cache.delete(lock_key)
@@ -0,0 +1,151 @@
+"""
+Weekly contribution ledger, totals and monthly archiving.
+
+WeeklyContribution is the typed record of what each member gave per week;
+the legacy Users.week1..week4 strings are mirrored into it on every write,
+so totals are SUM queries instead of loops over Users.
+
+Archiving copies every member's week1..week4 into ContributionHistory and
+resets the weeks, as set operations: one SELECT of the members in scope, one
+batched INSERT and one UPDATE, instead of a save() per member. Ledger rows the
+archived weeks were mirrored into for a later month are dropped.
+"""
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ContributionHistory, Users, WeeklyContribution
+from .signals import invalidate_model
+from .sync import record_changes
+
+WEEK_FIELDS = ['week1', 'week2', 'week3', 'week4']
+ARCHIVE_BATCH_SIZE = 1000
+TOTAL_GROUPS = {'community': 'community_name', 'district': 'district_elder_name', 'overseer': 'overseer_uid'}
+
+logger = logging.getLogger(__name__)
+
+
+def parse_amount(value):
+    """Legacy week strings ("50", "50.00", "", None, "R 1,200") as a Decimal; unreadable values count as 0."""
+    text = str(value if value is not None else '').replace('R', '').replace(',', '').replace(' ', '')
+    if not text: return Decimal('0.00')
+    try:
+        return Decimal(text).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        logger.warning(f"⚠️ Unreadable contribution amount {value!r}, counted as 0")
+        return Decimal('0.00')
+
+def ledger_rows(members, year, month, overseer_uid=None):
+    return [
+        WeeklyContribution(
+            member_uid=m['uid'], overseer_uid=overseer_uid or m.get('overseer_uid'),
+            district_elder_name=m['district_elder_name'], community_name=m['community_name'],
+            year=year, month=month, week=week, amount=parse_amount(m[f"week{week}"]),
+        ) for m in members for week in range(1, len(WEEK_FIELDS) + 1)
+    ]
+
+def save_ledger(rows):
+    WeeklyContribution.objects.bulk_create(
+        rows, batch_size=ARCHIVE_BATCH_SIZE, update_conflicts=True,
+        unique_fields=['member_uid', 'year', 'month', 'week'],
+        update_fields=['overseer_uid', 'district_elder_name', 'community_name', 'amount', 'updated_at'],
+    )
+
+def record_weekly_contributions(member_uids, year, month):
+    """Mirrors the members' legacy week1..week4 columns into the ledger for (year, month)."""
+    members = Users.objects.filter(uid__in=member_uids).values(
+        'uid', 'overseer_uid', 'district_elder_name', 'community_name', *WEEK_FIELDS
+    )
+    save_ledger(ledger_rows(members, year, month))
+
+def contribution_totals(year, month, group_by='community', overseer_uid=None, district_elder=None, community=None):
+    """
+    Per-week and overall totals for (year, month), one row per community,
+    district or overseer, computed by the database from the ledger.
+    """
+    group_field = TOTAL_GROUPS[group_by]
+    queryset = WeeklyContribution.objects.filter(year=year, month=month)
+    if overseer_uid: queryset = queryset.filter(overseer_uid=overseer_uid)
+    if district_elder: queryset = queryset.filter(district_elder_name__iexact=district_elder)
+    if community: queryset = queryset.filter(community_name__iexact=community)
+
+    zero = Value(Decimal('0.00'))
+    weeks = {
+        f"week{week}": Coalesce(Sum('amount', filter=Q(week=week)), zero)
+        for week in range(1, len(WEEK_FIELDS) + 1)
+    }
+    return list(
+        queryset.values(group_field)
+        .annotate(**weeks, total=Coalesce(Sum('amount'), zero))
+        .order_by(group_field)
+    )
+
+
+def _matches(field, value):
+    # '' in history stands for both '' and NULL on Users
+    return Q(**{field: value}) | Q(**{f"{field}__isnull": True}) if value == '' else Q(**{field: value})
+
+def archive_contributions(overseer_uid, year, month, district_elder=None, community=None):
+    """
+    Archives (year, month) for one community, one district or a whole overseer.
+    Communities that already have history for that month are skipped, so
+    retrying an archive never duplicates rows or wipes newer contributions.
+    Returns {'archived': [communities], 'skipped': [communities], 'members': n}.
+    """
+    scope = Users.objects.filter(overseer_uid=overseer_uid)
+    if district_elder: scope = scope.filter(district_elder_name=district_elder)
+    if community: scope = scope.filter(community_name=community)
+
+    with transaction.atomic():
+        # One locking read of the members in scope; their weeks can't change before the reset below
+        members = list(
+            scope.select_for_update()
+            .values('id', 'uid', 'name', 'surname', 'district_elder_name', 'community_name', *WEEK_FIELDS)
+        )
+        # Keyed by (district, community): other overseers and districts can reuse a community name.
+        # History stores a missing district or community as ''.
+        place = lambda m: (m['district_elder_name'] or '', m['community_name'] or '')
+        history = ContributionHistory.objects.filter(
+            overseer_uid=overseer_uid, community__in={c for _, c in map(place, members)}, year=year, month=month
+        )
+        if district_elder: history = history.filter(district_elder=district_elder)
+        already = set(history.values_list('district_elder', 'community').distinct())
+        members = [m for m in members if place(m) not in already]
+        if not members:
+            return {'archived': [], 'skipped': sorted(c for _, c in already), 'members': 0}
+
+        ContributionHistory.objects.bulk_create([
+            ContributionHistory(
+                overseer_uid=overseer_uid, user_uid=m['uid'], name=m['name'], surname=m['surname'] or '',
+                district_elder=m['district_elder_name'] or '', community=m['community_name'] or '',
+                month=month, year=year, **{week: parse_amount(m[week]) for week in WEEK_FIELDS},
+            ) for m in members
+        ], batch_size=ARCHIVE_BATCH_SIZE, ignore_conflicts=True)
+        # The ledger keeps the archived month even after the legacy columns are reset
+        save_ledger(ledger_rows(members, year, month, overseer_uid=overseer_uid))
+
+        member_ids = [m['id'] for m in members]
+        # Same rows as `members`, without binding every id (an overseer can exceed the parameter limit)
+        archived = scope
+        for district, name in already: archived = archived.exclude(_matches('district_elder_name', district) & _matches('community_name', name))
+        # Weeks edited after month end were mirrored into a later month's ledger; they now
+        # belong to the archived month, and the later month starts again from the reset
+        WeeklyContribution.objects.filter(member_uid__in=archived.values('uid')).filter(
+            Q(year__gt=year) | Q(year=year, month__gt=month)
+        ).delete()
+        archived.update(updated_at=timezone.now(), **{week: '0' for week in WEEK_FIELDS})
+
+        # bulk_create/update() skip signals: feed the change log and caches explicitly
+        record_changes(Users, member_ids)
+        invalidate_model(Users)
+        invalidate_model(ContributionHistory)
+
+    return {
+        'archived': sorted({m['community_name'] or '' for m in members}),
+        'skipped': sorted(c for _, c in already),
+        'members': len(members),
+    }
@@ -0,0 +1,373 @@
+"""
+Face inference for verification and identification.
+
+When FACE_WORKER_ADDRESS is configured, web workers never load the ONNX model:
+detect/embed jobs are sent to the inference worker (`python manage.py run_face_worker`)
+over a local socket and the request thread waits for the result. Without it the
+model is loaded in-process, lazily on first use (see warm_up for the web process).
+"""
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+FACE_MODEL_NAME = "buffalo_l"
+
+
+def face_model_options():
+    """(allowed_modules, det_size) from settings; allowed_modules None loads every ONNX sub-model of the pack."""
+    modules = getattr(settings, 'FACE_ALLOWED_MODULES', ['detection', 'recognition'])
+    det_size = getattr(settings, 'FACE_DET_SIZE', 640)
+    return (list(modules) if modules else None), (det_size, det_size)
+
+def load_face_app(options=None):
+    from insightface.app import FaceAnalysis
+    allowed_modules, det_size = options or face_model_options()
+    app = FaceAnalysis(name=FACE_MODEL_NAME, providers=["CPUExecutionProvider"], allowed_modules=allowed_modules)
+    app.prepare(ctx_id=0, det_size=det_size)
+    return app
+
+def decode_image(data, max_side=None):
+    """
+    Decodes an encoded image held in memory (bytes/bytearray, no copy) and
+    downscales it so the longest side is at most FACE_MAX_IMAGE_SIDE.
+    """
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None: return None
+    max_side = max_side or getattr(settings, 'FACE_MAX_IMAGE_SIDE', 1280)
+    scale = max_side / float(max(img.shape[:2]))
+    if scale < 1:
+        img = cv2.resize(img, (int(img.shape[1] * scale), int(img.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    return img
+
+def largest_face_embedding(faces):
+    if not faces: return None
+    faces = sorted(faces, key=lambda x: (x.bbox[2]-x.bbox[0]) * (x.bbox[3]-x.bbox[1]), reverse=True)
+    return faces[0].normed_embedding.astype(np.float32)
+
+
+# ==========================================
+# BATCHED DETECTION + RECOGNITION
+# ==========================================
+
+def _letterbox(img, input_size):
+    # Same resize/pad as SCRFD.detect, so batched and single results agree
+    im_ratio = float(img.shape[0]) / img.shape[1]
+    model_ratio = float(input_size[1]) / input_size[0]
+    if im_ratio > model_ratio:
+        new_height = input_size[1]
+        new_width = int(new_height / im_ratio)
+    else:
+        new_width = input_size[0]
+        new_height = int(new_width * im_ratio)
+    det_scale = float(new_height) / img.shape[0]
+    det_img = np.zeros((input_size[1], input_size[0], 3), dtype=np.uint8)
+    det_img[:new_height, :new_width, :] = cv2.resize(img, (new_width, new_height))
+    return det_img, det_scale
+
+def _anchor_centers(det_model, height, width, stride):
+    key = (height, width, stride)
+    centers = det_model.center_cache.get(key)
+    if centers is None:
+        centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+        centers = (centers * stride).reshape((-1, 2))
+        if det_model._num_anchors > 1:
+            centers = np.stack([centers] * det_model._num_anchors, axis=1).reshape((-1, 2))
+        if len(det_model.center_cache) < 100: det_model.center_cache[key] = centers
+    return centers
+
+def _decode_detections(det_model, outs, input_size, det_scale):
+    """Post-processes one image's slice of a batched SCRFD output (mirrors SCRFD.forward/detect)."""
+    from insightface.model_zoo.scrfd import distance2bbox, distance2kps
+    scores_list, bboxes_list, kpss_list = [], [], []
+    fmc = det_model.fmc
+    for idx, stride in enumerate(det_model._feat_stride_fpn):
+        scores = outs[idx]
+        centers = _anchor_centers(det_model, input_size[1] // stride, input_size[0] // stride, stride)
+        pos = np.where(scores >= det_model.det_thresh)[0]
+        scores_list.append(scores[pos])
+        bboxes_list.append(distance2bbox(centers, outs[idx + fmc] * stride)[pos])
+        if det_model.use_kps:
+            kpss = distance2kps(centers, outs[idx + fmc * 2] * stride)
+            kpss_list.append(kpss.reshape((kpss.shape[0], -1, 2))[pos])
+
+    scores = np.vstack(scores_list)
+    order = scores.ravel().argsort()[::-1]
+    pre_det = np.hstack((np.vstack(bboxes_list) / det_scale, scores)).astype(np.float32, copy=False)[order, :]
+    keep = det_model.nms(pre_det)
+    kpss = (np.vstack(kpss_list) / det_scale)[order][keep] if det_model.use_kps else None
+    return pre_det[keep, :], kpss
+
+def detect_batch(det_model, images):
+    """
+    Returns (bboxes, kpss) per image. Models exported with a batch dimension run
+    the whole batch in one session call; fixed-batch models fall back to one call per image.
+    """
+    if not det_model.batched:
+        return [det_model.detect(img, max_num=0, metric='default') for img in images]
+
+    input_size = det_model.input_size
+    prepared = [_letterbox(img, input_size) for img in images]
+    mean = det_model.input_mean
+    blob = cv2.dnn.blobFromImages([p[0] for p in prepared], 1.0 / det_model.input_std, input_size, (mean, mean, mean), swapRB=True)
+    net_outs = det_model.session.run(det_model.output_names, {det_model.input_name: blob})
+    return [
+        _decode_detections(det_model, [out[i] for out in net_outs], input_size, det_scale)
+        for i, (_, det_scale) in enumerate(prepared)
+    ]
+
+def embed_batch(app, images):
+    """
+    Normalized embedding of the largest face in each image (None where no face).
+    Detection runs per batch (see detect_batch); the recognition model embeds
+    every aligned crop of the batch in one session call.
+    """
+    from insightface.utils import face_align
+    rec_model = app.models['recognition']
+    results = [None] * len(images)
+    valid = [i for i, img in enumerate(images) if img is not None]
+    if not valid: return results
+
+    crops, owners = [], []
+    for i, (bboxes, kpss) in zip(valid, detect_batch(app.det_model, [images[i] for i in valid])):
+        if bboxes.shape[0] == 0 or kpss is None: continue
+        areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        largest = int(np.argmax(areas))
+        crops.append(face_align.norm_crop(images[i], landmark=kpss[largest], image_size=rec_model.input_size[0]))
+        owners.append(i)
+
+    if crops:
+        feats = np.asarray(rec_model.get_feat(crops), dtype=np.float32).reshape(len(crops), -1)
+        feats /= np.linalg.norm(feats, axis=1, keepdims=True)
+        for i, feat in zip(owners, feats): results[i] = feat
+    return results
+
+
+class FaceBatcher:
+    """
+    Micro-batching scheduler in front of the model: requests that arrive within
+    `window_ms` of each other (up to `max_batch` images) are embedded together
+    and each waiting caller gets its own slice of the result back.
+    """
+
+    def __init__(self, run_batch, window_ms=20, max_batch=16, threads=1):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._jobs = queue.Queue()
+        for _ in range(threads):
+            threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, images):
+        future = Future()
+        self._jobs.put((list(images), future))
+        return future
+
+    def _collect(self):
+        batch = [self._jobs.get()]
+        size = len(batch[0][0])
+        # Idle queue: nobody to coalesce with, so a lone request doesn't pay the window
+        if self._jobs.empty(): return batch
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            try: job = self._jobs.get(timeout=remaining)
+            except queue.Empty: break
+            batch.append(job)
+            size += len(job[0])
+        return batch
+
+    def _run(self, batch):
+        images = [img for job_images, _ in batch for img in job_images]
+        results = self.run_batch(images)
+        offset = 0
+        for job_images, future in batch:
+            future.set_result(results[offset:offset + len(job_images)])
+            offset += len(job_images)
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._run(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                # One bad request must not fail everyone it was batched with: retry each job alone
+                for job in batch:
+                    try: self._run([job])
+                    except Exception as e: job[1].set_exception(e)
+
+def make_batcher(app, threads=1):
+    return FaceBatcher(
+        lambda images: embed_batch(app, images),
+        window_ms=getattr(settings, 'FACE_BATCH_WINDOW_MS', 20),
+        max_batch=getattr(settings, 'FACE_BATCH_MAX_SIZE', 16),
+        threads=threads,
+    )
+
+
+# ==========================================
+# CONNECTION SETTINGS
+# ==========================================
+
+def worker_address():
+    address = getattr(settings, 'FACE_WORKER_ADDRESS', None)
+    if not address: return None
+    if address.startswith('unix:'): return address[len('unix:'):]
+    if address.startswith('/'): return address
+    host, _, port = address.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+def worker_authkey():
+    # No SECRET_KEY fallback: when it is unset every process generates its own
+    key = getattr(settings, 'FACE_WORKER_AUTHKEY', None)
+    if not key: raise ImproperlyConfigured('FACE_WORKER_AUTHKEY must be set (to the same value for web and face worker) when FACE_WORKER_ADDRESS is.')
+    return key.encode() if isinstance(key, str) else key
+
+
+# ==========================================
+# CLIENT (web workers)
+# ==========================================
+
+class FaceWorkerClient:
+    """One persistent connection per request thread to the inference worker."""
+
+    def __init__(self, address, authkey, timeout):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try: conn.close()
+            except OSError: pass
+
+    def call(self, op, payload):
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((op, payload))
+                if not conn.poll(self.timeout):
+                    self._reset()
+                    raise TimeoutError(f"Face worker did not answer within {self.timeout}s")
+                status, result = conn.recv()
+                if status != 'ok': raise RuntimeError(result)
+                return result
+            except (EOFError, ConnectionError):
+                # The worker restarted or dropped us; reconnect once.
+                self._reset()
+                if attempt: raise
+
+
+# ==========================================
+# LAZY ENGINE
+# ==========================================
+
+# Nothing is loaded at import: migrate, collectstatic, admin and Celery processes
+# never pay for the model. The first face request (or warm_up) loads it once.
+_client = None
+_batcher = None
+_engine_ready = False
+_engine_lock = threading.Lock()
+
+def _ensure_engine():
+    global _client, _batcher, _engine_ready
+    if _engine_ready: return
+    with _engine_lock:
+        if _engine_ready: return
+        if worker_address():
+            _client = FaceWorkerClient(worker_address(), worker_authkey(), getattr(settings, 'FACE_WORKER_TIMEOUT', 30))
+            logger.info(f"✅ Face inference delegated to worker at {settings.FACE_WORKER_ADDRESS}")
+        else:
+            try:
+                started = time.perf_counter()
+                _batcher = make_batcher(load_face_app())
+                logger.info(f"✅ InsightFace model loaded in {time.perf_counter() - started:.1f}s.")
+            except Exception as e:
+                logger.error(f"❌ Error loading InsightFace: {e}")
+        _engine_ready = True
+
+def warm_up():
+    """Loads the model and runs one inference so the first real request doesn't pay for session init."""
+    _ensure_engine()
+    if _batcher is None: return
+    started = time.perf_counter()
+    try:
+        _batcher.submit([np.zeros((112, 112, 3), dtype=np.uint8)]).result()
+        logger.info(f"✅ Face engine warmed up in {time.perf_counter() - started:.1f}s.")
+    except Exception as e:
+        logger.warning(f"⚠️ Face engine warm-up failed: {e}")
+
+def warm_up_in_background():
+    # Called by the web process (wsgi.py) so the model loads while gunicorn starts accepting requests
+    threading.Thread(target=warm_up, name='face-warm-up', daemon=True).start()
+
+def is_available():
+    _ensure_engine()
+    return _client is not None or _batcher is not None
+
+def embed_images(images):
+    """Returns the normalized embedding of the largest face in each image (None where no face)."""
+    _ensure_engine()
+    if _client is not None: return _client.call('embed', images)
+    if _batcher is None: raise RuntimeError('AI Engine Down')
+    return _batcher.submit(images).result()
+
+def embed_image(img):
+    return embed_images([img])[0]
+
+
+# ==========================================
+# SERVER (inference worker process)
+# ==========================================
+
+def serve(address, authkey, inference_threads=1):
+    """
+    Owns the model and answers embed jobs. Each client connection gets a
+    thread that only does I/O; jobs from all connections are micro-batched
+    onto `inference_threads` threads sharing one ONNX session.
+    """
+    batcher = make_batcher(load_face_app(), threads=inference_threads)
+
+    def handle(conn):
+        with conn:
+            while True:
+                try: op, payload = conn.recv()
+                except (EOFError, OSError): return
+                if op != 'embed':
+                    conn.send(('error', f"Unknown op '{op}'"))
+                    continue
+                try: conn.send(('ok', batcher.submit(payload).result()))
+                except Exception as e: conn.send(('error', str(e)))
+
+    with Listener(address, authkey=authkey) as listener:
+        logger.info(f"✅ Face worker listening on {address}")
+        while True:
+            try: conn = listener.accept()
+            except Exception as e:
+                # Failed handshakes (bad authkey) must not take the worker down
+                logger.warning(f"Face worker rejected a connection: {e}")
+                continue
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
@@ -0,0 +1,114 @@
+import json
+import threading
+import numpy as np
+
+from .caching import get_generation
+from .models import FaceEmbedding, AdminStaffMember, OverseerCommitteeMember, TactsoBranch, TactsoCommitteeMember
+
+SCOPE_STAFF = 'staff'
+
+def overseer_scope(overseer_id):
+    return f"overseer:{overseer_id}"
+
+def branch_scope(branch_id):
+    return f"branch:{branch_id}"
+
+# Scope kind -> models whose writes change what the scope holds
+SCOPE_SOURCES = {
+    SCOPE_STAFF: (FaceEmbedding, AdminStaffMember),
+    'overseer': (FaceEmbedding, OverseerCommitteeMember),
+    'branch': (FaceEmbedding, TactsoBranch, TactsoCommitteeMember),
+}
+
+
+def _staff_entry(member):
+    return {'type': 'staff', 'id': str(member.id), 'uid': member.uid, 'name': member.full_name,
+            'role': member.role, 'face_url': member.face_url}
+
+def _committee_entry(member):
+    return {'type': 'overseer_committee', 'id': str(member.id), 'overseer_id': str(member.overseer_id),
+            'name': member.full_name, 'portfolio': member.portfolio, 'face_url': member.face_url}
+
+def _branch_entries(branch):
+    try:
+        urls = [u for u in json.loads(branch.authorized_user_face_urls or '[]') if u]
+    except (TypeError, ValueError):
+        urls = []
+    names = {m.face_url: m for m in TactsoCommitteeMember.objects.filter(branch=branch, face_url__in=urls)}
+    entries = {}
+    for url in urls:
+        member = names.get(url)
+        entries[url] = {'type': 'branch_authorized', 'branch_id': str(branch.id),
+                        'name': member.full_name if member else '', 'portfolio': member.portfolio if member else '',
+                        'face_url': url}
+    return entries
+
+
+class FaceIndex:
+    """
+    In-memory index of enrolled reference embeddings, grouped by scope
+    (all staff, one overseer's committee, one TACTSO branch). Each scope is
+    stamped with the cache generations of the models it is built from and is
+    reloaded when any of them moves (every save/delete bumps them, see
+    signals.py), so writes made by any process reach every worker.
+    Scoring a live face against a scope is one matrix-vector product.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scopes = {}  # scope -> (generation, matrix, metas)
+
+    # --- Loading ---
+
+    def _load_owners(self, scope):
+        if scope == SCOPE_STAFF:
+            members = AdminStaffMember.objects.filter(is_active=True).exclude(face_url='')
+            return {str(m.id): _staff_entry(m) for m in members}
+        kind, _, key = scope.partition(':')
+        if kind == 'overseer':
+            members = OverseerCommitteeMember.objects.filter(overseer_id=key).exclude(face_url='')
+            return {str(m.id): _committee_entry(m) for m in members}
+        if kind == 'branch':
+            branch = TactsoBranch.objects.filter(id=key).first()
+            return _branch_entries(branch) if branch else {}
+        raise ValueError(f"Unknown face index scope: {scope}")
+
+    def _generation(self, scope):
+        models = SCOPE_SOURCES.get(scope.partition(':')[0])
+        if models is None: raise ValueError(f"Unknown face index scope: {scope}")
+        return tuple(get_generation(model.__name__) for model in models)
+
+    def _build(self, scope):
+        owners = self._load_owners(scope)
+        vectors = dict(FaceEmbedding.objects.filter(
+            face_url__in=[m['face_url'] for m in owners.values()]
+        ).values_list('face_url', 'embedding'))
+        rows = [(meta, np.frombuffer(vectors[meta['face_url']], dtype=np.float32))
+                for meta in owners.values() if vectors.get(meta['face_url']) is not None]
+        matrix = np.vstack([vec for _, vec in rows]) if rows else np.empty((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(matrix, dtype=np.float32), [meta for meta, _ in rows]
+
+    def _matrix(self, scope):
+        # Read the generation before loading, so a write during the load triggers another one
+        generation = self._generation(scope)
+        with self._lock:
+            built = self._scopes.get(scope)
+            if built is not None and built[0] == generation: return built[1], built[2]
+        matrix, metas = self._build(scope)
+        with self._lock:
+            self._scopes[scope] = (generation, matrix, metas)
+        return matrix, metas
+
+    # --- Queries ---
+
+    def search(self, scope, embedding, top_k=5):
+        matrix, metas = self._matrix(scope)
+        if not metas: return []
+        scores = matrix @ np.asarray(embedding, dtype=np.float32)
+        k = min(top_k, len(metas))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**metas[i], 'score': float(scores[i])} for i in top]
+
+
+face_index = FaceIndex()
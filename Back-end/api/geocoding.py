@@ -0,0 +1,153 @@
+"""
+Community geocoding, run off the request path (see tasks.py).
+
+Every answer, hits and misses alike, is stored in GeocodeCache under a
+normalized address, so each distinct address reaches the geocoder once.
+Calls to Nominatim go through a rate limiter shared by every process through
+the default cache (1 request/second by default, per the Nominatim usage
+policy), so Celery concurrency or extra web workers don't multiply the rate.
+"""
+import re
+import math
+import time
+import logging
+import datetime
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Community, GeocodeCache
+from .signals import invalidate_model
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_address(address):
+    # "  Soweto ,Gauteng " and "soweto, gauteng" are the same lookup
+    parts = [re.sub(r'\s+', ' ', part).strip() for part in (address or '').lower().split(',')]
+    return ', '.join(part for part in parts if part)[:500]
+
+
+class SharedRateLimiter:
+    """
+    At most one call per `min_delay` seconds across every process sharing the
+    cache. Time is cut into slots of `min_delay`; a caller claims the first
+    free slot with cache.add() (atomic on Redis and LocMem) and sleeps until
+    it starts, so calls from different processes are never closer than one slot.
+    With the LocMem cache (no REDIS_URL) this only holds within one process.
+    """
+
+    def __init__(self, name, min_delay):
+        self.name = name
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._last = 0.0
+
+    def _slot_key(self, slot):
+        return f"ratelimit:{self.name}:{slot}"
+
+    def wait(self):
+        if self.min_delay <= 0: return
+        now = time.time()
+        slot = math.ceil(now / self.min_delay)
+        while True:
+            starts = slot * self.min_delay
+            claimed = cache.add(self._slot_key(slot), 1, timeout=math.ceil(starts - now + self.min_delay) + 1)
+            if claimed is None:
+                # Cache unreachable (errors ignored): fall back to spacing this process's calls
+                return self._wait_locally()
+            if claimed: break
+            slot += 1
+        time.sleep(max(0.0, starts - time.time()))
+
+    def _wait_locally(self):
+        with self._lock:
+            delay = self._last + self.min_delay - time.monotonic()
+            if delay > 0: time.sleep(delay)
+            self._last = time.monotonic()
+
+
+class NominatimGeocoder:
+    """geocode(address) -> (latitude, longitude) or None. Raises on network/service errors."""
+
+    def __init__(self):
+        from geopy.geocoders import Nominatim
+        from geopy.extra.rate_limiter import RateLimiter
+        geolocator = Nominatim(user_agent=getattr(settings, 'GEOCODER_USER_AGENT', 'tact_backend_v2_smart_search'))
+        limiter = SharedRateLimiter('nominatim', getattr(settings, 'GEOCODER_MIN_DELAY', 1.0))
+
+        def limited_geocode(*args, **kwargs):
+            limiter.wait()
+            return geolocator.geocode(*args, **kwargs)
+
+        # Spacing comes from the shared limiter (retries included); RateLimiter only retries
+        self._geocode = RateLimiter(limited_geocode, min_delay_seconds=0, max_retries=1, swallow_exceptions=False)
+
+    def geocode(self, address):
+        location = self._geocode(address, timeout=getattr(settings, 'GEOCODER_TIMEOUT', 10))
+        return (location.latitude, location.longitude) if location else None
+
+
+_geocoder = None
+_geocoder_class = None
+_geocoder_lock = threading.Lock()
+
+def get_geocoder():
+    # One instance per process; rebuilt if GEOCODER_CLASS changes
+    global _geocoder, _geocoder_class
+    path = getattr(settings, 'GEOCODER_CLASS', 'api.geocoding.NominatimGeocoder')
+    with _geocoder_lock:
+        if _geocoder is None or _geocoder_class != path:
+            _geocoder, _geocoder_class = import_string(path)(), path
+        return _geocoder
+
+
+def lookup(address):
+    """Cached geocode of one address: (latitude, longitude) or None."""
+    key = normalize_address(address)
+    if not key: return None
+    cached = GeocodeCache.objects.filter(address_key=key).first()
+    if cached:
+        if cached.found: return (cached.latitude, cached.longitude)
+        # Misses are retried after a while: Nominatim's data improves
+        retry_after = datetime.timedelta(days=getattr(settings, 'GEOCODE_MISS_RETRY_DAYS', 30))
+        if cached.updated_at > timezone.now() - retry_after: return None
+
+    point = get_geocoder().geocode(address)
+    GeocodeCache.objects.update_or_create(address_key=key, defaults={
+        'address': address, 'found': point is not None,
+        'latitude': point[0] if point else None, 'longitude': point[1] if point else None,
+    })
+    return point
+
+def geocode_first(addresses):
+    """First address (in order) that resolves: (latitude, longitude, address) or None."""
+    for address in addresses:
+        point = lookup(address)
+        if point: return point[0], point[1], address
+    return None
+
+
+def geocode_communities(community_ids):
+    """Fills coordinates for the given communities that still lack them; returns how many were placed."""
+    placed = 0
+    communities = Community.objects.filter(id__in=community_ids).select_related('district__overseer')
+    for community in communities:
+        if community.latitude and community.longitude: continue
+        try:
+            result = geocode_first(community.address_attempts())
+        except Exception as e:
+            # Left without coordinates; the next save (or a retry of the task) tries again
+            logger.warning(f"⚠️ Geocoding {community.community_name} failed: {e}")
+            continue
+        if not result: continue
+        latitude, longitude, address = result
+        # update() instead of save(): saving would queue this community again
+        Community.objects.filter(pk=community.pk).update(latitude=latitude, longitude=longitude, full_address=address)
+        placed += 1
+
+    if placed: invalidate_model(Community)
+    return placed
@@ -0,0 +1,49 @@
+# api/management/commands/backfill_face_embeddings.py
+
+import json
+from django.core.management.base import BaseCommand
+from api.models import (
+    FaceEmbedding, Users, AdminStaffMember, OverseerCommitteeMember,
+    TactsoBranch, TactsoCommitteeMember
+)
+from api.views import get_reference_embedding, FACE_MODEL_NAME
+
+class Command(BaseCommand):
+    help = 'Computes and stores embeddings for every enrolled reference face that does not have one yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-embed faces that already have a stored embedding')
+
+    def handle(self, *args, **options):
+        # 1. Gather every reference face URL the verification endpoints can be asked about
+        urls = set(Users.objects.exclude(face_image_url__isnull=True).exclude(face_image_url='').values_list('face_image_url', flat=True))
+        urls.update(AdminStaffMember.objects.exclude(face_url='').values_list('face_url', flat=True))
+        urls.update(OverseerCommitteeMember.objects.exclude(face_url='').values_list('face_url', flat=True))
+        urls.update(TactsoCommitteeMember.objects.exclude(face_url='').values_list('face_url', flat=True))
+
+        for branch in TactsoBranch.objects.only('authorized_user_face_urls', 'education_officer_face_url'):
+            if branch.education_officer_face_url: urls.add(branch.education_officer_face_url)
+            try:
+                urls.update(u for u in json.loads(branch.authorized_user_face_urls or '[]') if u)
+            except (TypeError, ValueError):
+                self.stdout.write(self.style.WARNING(f'Skipping invalid authorized_user_face_urls on branch {branch.id}'))
+
+        # 2. Drop the ones that are already embedded (unless forced)
+        if options['force']:
+            FaceEmbedding.objects.filter(face_url__in=urls).delete()
+        else:
+            existing = set(FaceEmbedding.objects.filter(model_name=FACE_MODEL_NAME).values_list('face_url', flat=True))
+            urls -= existing
+
+        # 3. Embed the rest (get_reference_embedding persists on a miss)
+        stored, failed = 0, 0
+        for url in sorted(urls):
+            is_encrypted = url.endswith('.enc') or '.enc?' in url
+            emb, error = get_reference_embedding(url, is_encrypted)
+            if emb is None:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'{error}: {url}'))
+            else:
+                stored += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Stored {stored} face embeddings ({failed} failed).'))
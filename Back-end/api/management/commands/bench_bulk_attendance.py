@@ -0,0 +1,54 @@
+# api/management/commands/bench_bulk_attendance.py
+
+import time
+import uuid
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from api.attendance import bulk_record_attendance
+from api.models import Users
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = 'Times bulk_record_attendance for one service of N members (target: < 100 ms for 1,000); nothing is kept'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=1000, help='Entries in the service')
+        parser.add_argument('--runs', type=int, default=5, help='Timed runs (the first one inserts, the rest upsert)')
+
+    def handle(self, *args, **options):
+        count, runs = options['members'], options['runs']
+        if count < 1 or runs < 1: raise CommandError('--members and --runs must be at least 1')
+        date = datetime.date.today()
+        tag = uuid.uuid4().hex[:8]
+        timings = []
+
+        try:
+            with transaction.atomic():
+                # 1. Throwaway members, rolled back with everything else
+                Users.objects.bulk_create([
+                    Users(uid=f"bench-{tag}-{i}", name='Bench', surname=str(i), community_name=f"Bench {tag}")
+                    for i in range(count)
+                ])
+                entries = [{'member_uid': f"bench-{tag}-{i}", 'is_visitor': False, 'present': i % 3 != 0} for i in range(count)]
+
+                # 2. Same service marked repeatedly: first run inserts, later runs hit the upsert path
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    results = bulk_record_attendance(f"Bench {tag}", date, entries)
+                    timings.append((time.perf_counter() - started) * 1000)
+                saved = sum(1 for r in results if r['status'] == 'saved')
+                raise Rollback()
+        except Rollback:
+            pass
+
+        self.stdout.write(f"{'run':>4} {'ms':>9}")
+        for i, ms in enumerate(timings, 1): self.stdout.write(f"{i:>4} {ms:>9.1f}")
+        best = min(timings)
+        style = self.style.SUCCESS if best < 100 else self.style.WARNING
+        self.stdout.write(style(f"{saved}/{count} saved, best {best:.1f} ms, median {sorted(timings)[len(timings) // 2]:.1f} ms"))
+        if settings.DEBUG: self.stdout.write(self.style.WARNING('DEBUG is on: query logging inflates these timings (run with DJANGO_DEBUG=False)'))
@@ -0,0 +1,51 @@
+# api/management/commands/bench_face_batching.py
+
+import time
+import threading
+import cv2
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = 'Compares unbatched vs micro-batched face embedding throughput at several client concurrencies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--image', required=True, help='Path to a photo containing a face')
+        parser.add_argument('--clients', default='1,4,16,64', help='Comma separated concurrency levels')
+        parser.add_argument('--requests', type=int, default=4, help='Requests sent by each client')
+
+    def handle(self, *args, **options):
+        from api.face_engine import load_face_app, embed_batch, FaceBatcher
+
+        img = cv2.imread(options['image'])
+        if img is None: raise CommandError(f"Could not read image: {options['image']}")
+        levels = [int(c) for c in options['clients'].split(',') if c.strip()]
+        per_client = options['requests']
+
+        try:
+            app = load_face_app()
+        except Exception as e:
+            raise CommandError(f"Could not load the face model (the pack must be in ~/.insightface/models or downloadable): {e}")
+        embed_batch(app, [img])  # Warm-up so the first timed request does not pay session init
+        batcher = FaceBatcher(
+            lambda images: embed_batch(app, images),
+            window_ms=getattr(settings, 'FACE_BATCH_WINDOW_MS', 20),
+            max_batch=getattr(settings, 'FACE_BATCH_MAX_SIZE', 16),
+        )
+
+        def run(clients, call):
+            def client():
+                for _ in range(per_client): call()
+            threads = [threading.Thread(target=client) for _ in range(clients)]
+            start = time.perf_counter()
+            for t in threads: t.start()
+            for t in threads: t.join()
+            return clients * per_client / (time.perf_counter() - start)
+
+        self.stdout.write(f"{'clients':>8} {'unbatched img/s':>16} {'batched img/s':>14} {'speedup':>8}")
+        for clients in levels:
+            unbatched = run(clients, lambda: embed_batch(app, [img]))
+            batched = run(clients, lambda: batcher.submit([img]).result())
+            self.stdout.write(f"{clients:>8} {unbatched:>16.1f} {batched:>14.1f} {batched / unbatched:>7.2f}x")
+
+        self.stdout.write(self.style.SUCCESS(f'Detection batched in one session call: {app.det_model.batched}'))
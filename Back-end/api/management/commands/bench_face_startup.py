@@ -0,0 +1,77 @@
+# api/management/commands/bench_face_startup.py
+
+import sys
+import json
+import time
+import resource
+import subprocess
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+# label -> (allowed_modules, det_size); None loads every sub-model of the pack
+MODES = {
+    'all@640': (None, 640),
+    'det+rec@640': (['detection', 'recognition'], 640),
+    'det+rec@320': (['detection', 'recognition'], 320),
+}
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+class Command(BaseCommand):
+    help = 'Measures face model cold start (load + first inference) time and peak memory per loading mode'
+    # System checks import the URLconf (and so api.views) before measure() could time it
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(MODES), help=f"Comma separated, from: {', '.join(MODES)}, lazy")
+        parser.add_argument('--child', help='Internal: measure one mode in this process')
+
+    def measure(self, mode):
+        # Runs in a fresh process so every mode starts cold
+        started = time.perf_counter()
+        import api.views  # noqa: F401  (what every web/Celery/manage.py process imports)
+        imported = time.perf_counter() - started
+        result = {'mode': mode, 'import_s': round(imported, 2), 'load_s': None, 'first_inference_s': None}
+
+        if mode != 'lazy':
+            from api.face_engine import embed_batch, load_face_app
+            allowed_modules, det_size = MODES[mode]
+            started = time.perf_counter()
+            app = load_face_app((allowed_modules, (det_size, det_size)))
+            result['load_s'] = round(time.perf_counter() - started, 2)
+            result['modules'] = sorted(app.models)
+            started = time.perf_counter()
+            embed_batch(app, [np.zeros((det_size, det_size, 3), dtype=np.uint8)])
+            result['first_inference_s'] = round(time.perf_counter() - started, 2)
+
+        result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+        self.stdout.write(json.dumps(result))
+
+    def handle(self, *args, **options):
+        if options['child']: return self.measure(options['child'])
+
+        modes = [m.strip() for m in options['modes'].split(',') if m.strip()]
+        unknown = [m for m in modes if m != 'lazy' and m not in MODES]
+        if unknown: raise CommandError(f"Unknown modes: {', '.join(unknown)}")
+
+        # 1. Baseline: import only (what migrate/collectstatic/Celery pay now that loading is lazy)
+        if 'lazy' not in modes: modes.insert(0, 'lazy')
+
+        # 2. One cold process per mode
+        self.stdout.write(f"{'mode':>12} {'import s':>9} {'load s':>7} {'1st inf s':>10} {'peak RSS MB':>12}")
+        for mode in modes:
+            proc = subprocess.run(
+                [sys.executable, sys.argv[0], 'bench_face_startup', '--child', mode],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                self.stderr.write(self.style.ERROR(f"{mode}: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}"))
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            fmt = lambda v: '-' if v is None else f"{v:.2f}"
+            self.stdout.write(f"{mode:>12} {r['import_s']:>9.2f} {fmt(r['load_s']):>7} {fmt(r['first_inference_s']):>10} {r['peak_rss_mb']:>12.1f}")
+
+        self.stdout.write(self.style.SUCCESS('Face startup benchmark finished.'))
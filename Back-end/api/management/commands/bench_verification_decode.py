@@ -0,0 +1,59 @@
+# api/management/commands/bench_verification_decode.py
+
+import os
+import time
+import tempfile
+import cv2
+from cryptography.fernet import Fernet
+from django.core.management.base import BaseCommand, CommandError
+
+from api.face_engine import decode_image
+
+CHUNK_SIZE = 64 * 1024
+
+class Command(BaseCommand):
+    help = 'Measures the per-request cost of the temp-file decode path vs the in-memory decode path used by verification'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--image', required=True, help='Path to a typical live/reference photo')
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['image'], 'rb') as f: raw = f.read()
+        except OSError as e:
+            raise CommandError(str(e))
+        cipher = Fernet(Fernet.generate_key())
+        encrypted = cipher.encrypt(raw)
+        chunks = [raw[i:i + CHUNK_SIZE] for i in range(0, len(raw), CHUNK_SIZE)]
+
+        # Previous path: upload chunks -> temp file -> cv2.imread, and decrypt -> temp file -> cv2.imread
+        def temp_file_path():
+            live = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg").name
+            with open(live, 'wb+') as f:
+                for chunk in chunks: f.write(chunk)
+            ref = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
+            ref.write(cipher.decrypt(encrypted))
+            ref.close()
+            try:
+                return cv2.imread(live), cv2.imread(ref.name)
+            finally:
+                os.remove(live)
+                os.remove(ref.name)
+
+        # Current path: chunks -> bytearray, decrypt in memory, imdecode on a frombuffer view + downscale
+        def in_memory_path():
+            live = bytearray()
+            for chunk in chunks: live += chunk
+            return decode_image(live), decode_image(cipher.decrypt(encrypted))
+
+        results = {}
+        for name, fn in (('temp files + imread', temp_file_path), ('in-memory + imdecode', in_memory_path)):
+            fn()
+            start = time.perf_counter()
+            for _ in range(options['iterations']): fn()
+            results[name] = (time.perf_counter() - start) * 1000 / options['iterations']
+            self.stdout.write(f"{name:>22}: {results[name]:.2f} ms/request")
+
+        before, after = results.values()
+        self.stdout.write(self.style.SUCCESS(f'Saving: {before - after:.2f} ms/request ({(1 - after / before) * 100:.0f}%)'))
@@ -0,0 +1,58 @@
+# api/management/commands/migrate_weekly_contributions.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from api.contributions import ARCHIVE_BATCH_SIZE, WEEK_FIELDS, ledger_rows, save_ledger
+from api.models import ContributionHistory, Users
+
+class Command(BaseCommand):
+    help = 'Backfills the WeeklyContribution ledger from ContributionHistory and the legacy Users.week1..week4 columns (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Month the current week columns belong to (default: this year)')
+        parser.add_argument('--month', type=int, help='Month the current week columns belong to (default: this month)')
+        parser.add_argument('--skip-history', action='store_true', help='Only migrate the current week columns')
+
+    def write_batches(self, members, period):
+        written, batch = 0, {}
+        for member in members:
+            for row in ledger_rows([member], *period(member)):
+                # One ledger row per member/month/week: a later archive of the same month wins
+                batch[(row.member_uid, row.year, row.month, row.week)] = row
+            if len(batch) >= ARCHIVE_BATCH_SIZE:
+                save_ledger(list(batch.values()))
+                written, batch = written + len(batch), {}
+        if batch: save_ledger(list(batch.values()))
+        return written + len(batch)
+
+    def handle(self, *args, **options):
+        today = timezone.now()
+        year, month = options.get('year') or today.year, options.get('month') or today.month
+
+        # 1. Archived months, from ContributionHistory
+        history_rows = 0
+        if not options['skip_history']:
+            history = ContributionHistory.objects.order_by('archived_at').values(
+                'user_uid', 'overseer_uid', 'district_elder', 'community', 'year', 'month', *WEEK_FIELDS
+            ).iterator(chunk_size=2000)
+            members = (
+                {**h, 'uid': h['user_uid'], 'district_elder_name': h['district_elder'], 'community_name': h['community']}
+                for h in history
+            )
+            with transaction.atomic():
+                history_rows = self.write_batches(members, lambda m: (m['year'], m['month']))
+
+        # 2. The open month, from the legacy string columns (members with nothing recorded are skipped)
+        has_weeks = Q()
+        for field in WEEK_FIELDS: has_weeks |= ~Q(**{f'{field}__in': ['', '0']}) & Q(**{f'{field}__isnull': False})
+        current = Users.objects.filter(has_weeks).values(
+            'uid', 'overseer_uid', 'district_elder_name', 'community_name', *WEEK_FIELDS
+        ).iterator(chunk_size=2000)
+        with transaction.atomic():
+            current_rows = self.write_batches(current, lambda m: (year, month))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {history_rows} archived and {current_rows} current ({year}/{month}) weekly contribution rows.'
+        ))
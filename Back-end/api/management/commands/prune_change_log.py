@@ -0,0 +1,22 @@
+# api/management/commands/prune_change_log.py
+
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.sync import prune_change_log
+
+class Command(BaseCommand):
+    help = 'Deletes change feed entries older than CHANGE_LOG_RETENTION_DAYS (clients with older tokens do a full sync)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'CHANGE_LOG_RETENTION_DAYS', 90), help='Entries to keep, in days')
+
+    def handle(self, *args, **options):
+        # 1. Cutoff: anything changed before it is only useful to clients that must resync anyway
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        # 2. Delete in one statement (the newest entry is always kept)
+        deleted = prune_change_log(cutoff)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change log entries older than {options["days"]} days.'))
@@ -0,0 +1,34 @@
+# api/management/commands/rebuild_attendance_rollups.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.attendance import monthly_aggregates, save_rollups
+from api.models import AttendanceLog, AttendanceMonthlyRollup
+
+class Command(BaseCommand):
+    help = 'Recomputes AttendanceMonthlyRollup rows from the AttendanceLog history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Only rebuild this year')
+        parser.add_argument('--month', type=int, help='Only rebuild this month (requires --year)')
+
+    def handle(self, *args, **options):
+        year, month = options.get('year'), options.get('month')
+        if month and not year:
+            self.stderr.write(self.style.ERROR('--month requires --year'))
+            return
+
+        # 1. Scope the logs and rollups to rebuild
+        logs = AttendanceLog.objects.all()
+        rollups = AttendanceMonthlyRollup.objects.all()
+        if year:
+            logs, rollups = logs.filter(date__year=year), rollups.filter(year=year)
+        if month:
+            logs, rollups = logs.filter(date__month=month), rollups.filter(month=month)
+
+        # 2. Replace them with fresh aggregates (grouped per member and month by the database)
+        with transaction.atomic():
+            deleted, _ = rollups.delete()
+            written = save_rollups(monthly_aggregates(logs).iterator(chunk_size=2000))
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} attendance rollups (replaced {deleted}).'))
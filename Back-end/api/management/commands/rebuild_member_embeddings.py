@@ -0,0 +1,30 @@
+# api/management/commands/rebuild_member_embeddings.py
+
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from api.member_faces import EMBEDDING_DIM, member_face_store, stored_member_embeddings
+
+class Command(BaseCommand):
+    help = 'Rewrites the memory-mapped member embedding matrix used for duplicate-face screening'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmark', action='store_true', help='Time one screening pass over the rebuilt matrix')
+
+    def handle(self, *args, **options):
+        # 1. One row per member with a stored embedding of their current face (stale re-enrollment rows drop out)
+        started = time.perf_counter()
+        count = member_face_store.rebuild(stored_member_embeddings())
+        self.stdout.write(f'Wrote {count} member embeddings to {member_face_store.directory} in {time.perf_counter() - started:.2f}s')
+
+        # 2. Optional: time a screening pass (one matrix-vector product over every member)
+        if options['benchmark'] and count:
+            probe = np.random.default_rng(0).standard_normal(EMBEDDING_DIM).astype(np.float32)
+            probe /= np.linalg.norm(probe)
+            member_face_store.screen(None, probe)
+            runs = 20
+            started = time.perf_counter()
+            for _ in range(runs): member_face_store.screen(None, probe)
+            self.stdout.write(f'Screening {count} members: {(time.perf_counter() - started) / runs * 1000:.2f} ms per enrollment')
+
+        self.stdout.write(self.style.SUCCESS('Member embedding store rebuilt.'))
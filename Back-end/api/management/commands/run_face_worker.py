@@ -0,0 +1,30 @@
+# api/management/commands/run_face_worker.py
+
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = (
+        'Runs the face inference worker that owns the InsightFace model. Needs FACE_WORKER_ADDRESS and '
+        'FACE_WORKER_AUTHKEY, set to the same values on the web process, which must reach that address'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inference-threads', type=int, default=1, help='Threads running inference on the shared model')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'FACE_WORKER_ADDRESS', None):
+            raise CommandError('FACE_WORKER_ADDRESS is not set; web workers would not be able to reach this worker.')
+        if not getattr(settings, 'FACE_WORKER_AUTHKEY', None):
+            raise CommandError('FACE_WORKER_AUTHKEY is not set; web workers would not be able to authenticate.')
+
+        from api.face_engine import serve, worker_address, worker_authkey
+        address = worker_address()
+
+        # A socket file left behind by a previous run would make bind() fail
+        if isinstance(address, str) and os.path.exists(address):
+            os.remove(address)
+
+        self.stdout.write(self.style.SUCCESS(f'Starting face worker on {settings.FACE_WORKER_ADDRESS}'))
+        serve(address, worker_authkey(), inference_threads=options['inference_threads'])
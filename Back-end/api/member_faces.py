@@ -0,0 +1,209 @@
+"""
+Duplicate-face screening for member enrollment.
+
+Every enrolled member face is one row of a contiguous float32 matrix on disk
+(members.f32, EMBEDDING_DIM columns) with the matching uids in members.ids.
+Workers memory-map the matrix read-only, so they all share the page cache
+instead of each holding a copy, and screening a new face is a single
+matrix-vector product. Appends write in place, rebuilds write temp files and
+rename them into place; both are serialized with flock.
+
+A member who re-enrolls gets a new row; rows whose face is no longer current
+are dropped by `python manage.py rebuild_member_embeddings`.
+"""
+import os
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+from .face_engine import FACE_MODEL_NAME
+from .models import DuplicateFaceFlag, FaceEmbedding, Users
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+ROW_BYTES = EMBEDDING_DIM * 4
+
+
+class MemberFaceStore:
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._stamp = None       # (inode, size) of the matrix file last mapped
+        self._matrix = None
+        self._uids = []
+
+    @property
+    def directory(self):
+        return str(self._directory or getattr(settings, 'MEMBER_EMBEDDINGS_DIR', settings.BASE_DIR / 'face_store'))
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self, shared=False):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path('members.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # --- Writing ---
+
+    def append(self, member_uid, vector):
+        """
+        Adds one row in place unless it is already the member's latest; returns
+        True when written. The matrix row goes first and the uid line second,
+        so a row only counts once its uid line is complete: a crash part-way
+        leaves extra bytes that readers ignore and the next append trims.
+        """
+        vector = np.ascontiguousarray(vector, dtype=np.float32).reshape(EMBEDDING_DIM)
+        with self._file_lock():
+            uids, rows, ids_bytes = self._stored_rows()
+            if member_uid in uids:
+                last = len(uids) - 1 - uids[::-1].index(member_uid)
+                stored = np.memmap(self._path('members.f32'), dtype=np.float32, mode='r', offset=last * ROW_BYTES, shape=(EMBEDDING_DIM,))
+                if np.array_equal(stored, vector): return False
+
+            with open(self._path('members.f32'), 'ab') as f:
+                f.truncate(rows * ROW_BYTES)
+                f.write(vector.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._path('members.ids'), 'ab') as f:
+                f.truncate(ids_bytes)
+                f.write(f"{member_uid}\n".encode())
+                f.flush()
+                os.fsync(f.fileno())
+            return True
+
+    def _read_ids(self):
+        # Only newline-terminated lines count: a uid cut short by a crash is dropped
+        with open(self._path('members.ids'), 'rb') as f:
+            return f.read().decode().split('\n')[:-1]
+
+    def _stored_rows(self):
+        """(uids, rows, byte length of those uid lines) for the rows present in both files."""
+        try:
+            uids = self._read_ids()
+            rows = min(os.path.getsize(self._path('members.f32')) // ROW_BYTES, len(uids))
+        except FileNotFoundError:
+            return [], 0, 0
+        uids = uids[:rows]
+        return uids, rows, sum(len(uid.encode()) + 1 for uid in uids)
+
+    def _write(self, rows):
+        count = 0
+        matrix_tmp, ids_tmp = self._path('members.f32.tmp'), self._path('members.ids.tmp')
+        with open(matrix_tmp, 'wb') as matrix_file, open(ids_tmp, 'w') as ids_file:
+            for member_uid, vector in rows:
+                matrix_file.write(np.ascontiguousarray(vector, dtype=np.float32).reshape(EMBEDDING_DIM).tobytes())
+                ids_file.write(f"{member_uid}\n")
+                count += 1
+            for f in (matrix_file, ids_file):
+                f.flush()
+                os.fsync(f.fileno())
+        # The old uids go first: a crash between the renames leaves no ids file
+        # (ensure_built rebuilds from the database) rather than new uids over old rows
+        if os.path.exists(self._path('members.ids')): os.remove(self._path('members.ids'))
+        os.replace(matrix_tmp, self._path('members.f32'))
+        os.replace(ids_tmp, self._path('members.ids'))
+        return count
+
+    def rebuild(self, rows):
+        """Replaces the store with `rows` (iterable of (uid, vector)) via temp files and renames; returns the row count."""
+        with self._file_lock():
+            return self._write(rows)
+
+    def _built(self):
+        return os.path.exists(self._path('members.f32')) and os.path.exists(self._path('members.ids'))
+
+    def ensure_built(self):
+        """Containers start with an empty disk: builds the store from the database once. Returns True if it did."""
+        if self._built(): return False
+        with self._file_lock():
+            if self._built(): return False
+            self._write(stored_member_embeddings())
+            return True
+
+    # --- Reading ---
+
+    def _stat(self):
+        try:
+            matrix, ids = os.stat(self._path('members.f32')), os.stat(self._path('members.ids'))
+        except FileNotFoundError:
+            return None
+        return (matrix.st_ino, matrix.st_size, ids.st_ino, ids.st_size)
+
+    def _current(self):
+        if self._stat() is None: return None, []
+        with self._lock:
+            if self._stat() != self._stamp:
+                # Shared lock: the uids and the matrix are read as one consistent snapshot
+                with self._file_lock(shared=True):
+                    stamp = self._stat()
+                    uids, rows, _ = self._stored_rows()
+                    self._matrix = np.memmap(self._path('members.f32'), dtype=np.float32, mode='r', shape=(rows, EMBEDDING_DIM)) if rows else None
+                self._uids, self._stamp = uids, stamp
+            return self._matrix, self._uids
+
+    def screen(self, member_uid, vector, threshold=None, limit=None):
+        """Other members whose stored face scores >= threshold against `vector`: [(uid, score)], best first."""
+        threshold = getattr(settings, 'FACE_DUPLICATE_THRESHOLD', 0.6) if threshold is None else threshold
+        limit = limit or getattr(settings, 'FACE_DUPLICATE_MAX_CANDIDATES', 5)
+        matrix, uids = self._current()
+        if matrix is None: return []
+
+        scores = matrix @ np.asarray(vector, dtype=np.float32).reshape(EMBEDDING_DIM)
+        hits = np.flatnonzero(scores >= threshold)
+        best = {}
+        for i in hits[np.argsort(-scores[hits])]:
+            uid = uids[i]
+            if uid != member_uid and uid not in best: best[uid] = round(float(scores[i]), 4)
+            if len(best) >= limit: break
+        return list(best.items())
+
+
+def stored_member_embeddings():
+    """(uid, vector) for every member whose current face_image_url has a stored embedding."""
+    members = Users.objects.exclude(face_image_url__isnull=True).exclude(face_image_url='').values_list('uid', 'face_image_url')
+    for chunk_start in range(0, members.count(), 2000):
+        chunk = dict((url, uid) for uid, url in members.order_by('pk')[chunk_start:chunk_start + 2000])
+        embeddings = FaceEmbedding.objects.filter(face_url__in=chunk, model_name=FACE_MODEL_NAME).values_list('face_url', 'embedding')
+        for url, embedding in embeddings:
+            yield chunk[url], np.frombuffer(embedding, dtype=np.float32)
+
+
+member_face_store = MemberFaceStore()
+
+
+def screen_enrollment(member_uid, face_url):
+    """
+    Compares a newly enrolled face (embedded and stored at upload) with every
+    other member, flags candidates above FACE_DUPLICATE_THRESHOLD and adds the
+    face to the store. Returns the flags created.
+    """
+    stored = FaceEmbedding.objects.filter(face_url=face_url, model_name=FACE_MODEL_NAME).values_list('embedding', flat=True).first()
+    if stored is None: return []
+    vector = np.frombuffer(stored, dtype=np.float32)
+
+    # A fresh build already holds this face (it is stored before screening)
+    built = member_face_store.ensure_built()
+    candidates = member_face_store.screen(member_uid, vector)
+    flags = [
+        DuplicateFaceFlag(member_uid=member_uid, candidate_uid=candidate_uid, score=score, face_url=face_url)
+        for candidate_uid, score in candidates
+    ]
+    if flags:
+        DuplicateFaceFlag.objects.bulk_create(flags, ignore_conflicts=True)
+        logger.warning(f"⚠️ Possible duplicate enrollment: {member_uid} matches {[c for c, _ in candidates]}")
+    if not built: member_face_store.append(member_uid, vector)
+    return flags
+
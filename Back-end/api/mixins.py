@@ -1,9 +1,14 @@
-from django.core.cache import cache
+from rest_framework import status
 from rest_framework.response import Response
 
+from .caching import UncacheableResponse, get_generation, get_or_fill, list_cache_key, params_hash
+from .pagination import cursor_ordering
+
 class CachedListMixin:
     """
     A Mixin that provides 'Cache Forever, Clear on Update' logic for the list() action.
+    Every distinct set of query params gets its own entry, and all entries of a
+    model share its cache generation, so one write invalidates every variant.
     """
     # Default cache timeout (30 days)
     cache_timeout = 60 * 60 * 24 * 30 
@@ -13,23 +18,87 @@ class CachedListMixin:
         # Try to get queryset property, if None, call get_queryset()
         qs = self.queryset if self.queryset is not None else self.get_queryset()
         model_name = qs.model.__name__
-        cache_key = f"list_cache_{model_name}"
 
-        # 2. SAFETY CHECK: If the user is filtering (using query params), SKIP CACHE.
-        # Example: ?face_url=... or ?email=...
-        # We don't want to return the "All Users" cache when they asked for "One User".
-        if request.query_params:
-            return super().list(request, *args, **kwargs)
+        # 2. Key = model + current generation + normalized query params,
+        # so ?province=X and ?uid=... are cached separately from the full list.
+        cache_key = list_cache_key(model_name, request.query_params)
+
+        # 3. Check Redis; concurrent misses for the same key share one DB query
+        parent_list = super().list
+
+        def fill():
+            # 4. Fetch from DB (The Slow Part); errors are returned but not cached
+            response = parent_list(request, *args, **kwargs)
+            if response.status_code != 200: raise UncacheableResponse(response)
+            return response.data
+
+        try:
+            data = get_or_fill(cache_key, fill, timeout=self.cache_timeout, name=model_name)
+        except UncacheableResponse as e:
+            return e.response
+        return Response(data)
+
 
-        # 3. Check Redis
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
+class ConditionalListMixin:
+    """
+    Conditional GET for list(): the ETag is the model's cache generation plus
+    the query params, so an unchanged collection is answered with 304 from a
+    single cache read, without querying or serializing anything.
+    """
+
+    def get_list_etag(self, request):
+        qs = self.queryset if self.queryset is not None else self.get_queryset()
+        model_name = qs.model.__name__
+        return f'W/"{model_name}-{get_generation(model_name)}-{params_hash(request.query_params)}"'
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag(request)
+        # If-None-Match uses weak comparison: W/"x" and "x" are the same tag
+        client_tags = [tag.strip().removeprefix('W/') for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]
+        if etag.removeprefix('W/') in client_tags or '*' in client_tags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
 
-        # 4. Fetch from DB (The Slow Part)
         response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            # Let clients keep their copy but always revalidate it
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class SparseFieldsetMixin:
+    """
+    `?fields=a,b,c` on GET: the serializer only emits those fields, and when all
+    of them are plain model columns the queryset only loads those columns.
+    """
+    fields_query_param = 'fields'
+
+    def get_requested_fields(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method != 'GET': return None
+        raw = request.query_params.get(self.fields_query_param)
+        if not raw: return None
+        return {name.strip() for name in raw.split(',') if name.strip()} or None
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        requested = self.get_requested_fields()
+        if requested:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in requested: target.fields.pop(name)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        requested = self.get_requested_fields()
+        # select_related can't traverse deferred FKs, and computed/nested fields need the full row
+        if not requested or queryset.query.select_related or queryset.query.is_sliced: return queryset
 
-        # 5. Save to Redis
-        cache.set(cache_key, response.data, timeout=self.cache_timeout)
-        
-        return response
\ No newline at end of file
+        columns = {f.name for f in queryset.model._meta.concrete_fields}
+        if not requested <= columns: return queryset
+        needed = set(requested) | {self.lookup_field}
+        # Cursor pagination reads its key column from the last row of the page
+        needed |= {name.lstrip('-') for name in cursor_ordering(self, queryset.model)}
+        needed |= {name.lstrip('-') for name in getattr(self, 'ordering', None) or []}
+        return queryset.only(*(name for name in needed if name in columns))
@@ -1,7 +1,8 @@
 import uuid
-from django.db import models
+import numpy as np
+from django.db import models, transaction
+from django.db.models.functions import Lower
 from django.utils import timezone
-from geopy.geocoders import Nominatim 
 
 GENDER_CHOICES = (
     ('Male', 'Male'),
@@ -72,9 +73,13 @@ class Users(models.Model):
     week3 = models.CharField(max_length=255, blank=True, null=True)
     week4 = models.CharField(max_length=255, blank=True, null=True)
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Community lookups are case-insensitive (lower(community_name) = ...)
+        indexes = [models.Index(Lower('community_name'), name='users_community_lower_idx')]
+
     def __str__(self):
         return f"{self.email} ({self.role})"
         
@@ -92,7 +97,10 @@ class Visitor(models.Model):
     visitor_role = models.CharField(max_length=255, blank=True, null=True)
     ready_for_membership = models.BooleanField(default=False)
     last_attended_date = models.DateField(auto_now=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(Lower('community_name'), name='visitor_community_lower_idx')]
 
     def __str__(self):
         return f"Visitor: {self.name} {self.surname}"
@@ -112,7 +120,7 @@ class SellerListing(models.Model):
     seller_colors = models.JSONField(default=list) 
     seller_sizes = models.JSONField(default=list)
     is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         unique_together = ('product', 'seller') 
@@ -150,7 +158,7 @@ class Order(models.Model):
     is_paid = models.BooleanField(default=False)
     transaction_id = models.CharField(max_length=255, blank=True, null=True)
     paystack_transaction_data = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -252,34 +260,43 @@ class Community(models.Model):
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
 
-    def save(self, *args, **kwargs):
+    def address_attempts(self):
+        # Most to least specific; the first one Nominatim can place wins
         overseer = self.district.overseer
-        address_attempts = [
+        return [
             f"{self.community_name}, {overseer.region}, {overseer.province}, South Africa",
             f"{self.community_name}, {overseer.province}, South Africa",
             f"{self.community_name}, South Africa",
             f"{overseer.region}, {overseer.province}, South Africa"
         ]
-        self.full_address = address_attempts[0]
-
-        if not self.latitude or not self.longitude:
-            geolocator = Nominatim(user_agent="tact_backend_v2_smart_search")
-            for address in address_attempts:
-                try:
-                    location = geolocator.geocode(address, timeout=10)
-                    if location:
-                        self.latitude = location.latitude
-                        self.longitude = location.longitude
-                        self.full_address = address 
-                        break 
-                except Exception as e:
-                    continue 
- 
+
+    def save(self, *args, **kwargs):
+        has_location = bool(self.latitude and self.longitude)
+        if not has_location or not self.full_address: self.full_address = self.address_attempts()[0]
+
         super(Community, self).save(*args, **kwargs)
 
+        # Coordinates are filled in by the geocoding queue once the row is committed
+        if not has_location:
+            from .tasks import enqueue_geocoding
+            community_id = self.pk
+            transaction.on_commit(lambda: enqueue_geocoding([community_id]))
+
     def __str__(self):
         return self.community_name
 
+class GeocodeCache(models.Model):
+    """Geocoder answers (including misses) keyed by normalized address, shared by every community."""
+    address_key = models.CharField(max_length=500, unique=True)
+    address = models.TextField()
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    found = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.address} ({self.latitude}, {self.longitude})" if self.found else f"{self.address} (not found)"
+
 # ===============================================================================================
 # 3. FINANCIAL & EVENTS
 # ===============================================================================================
@@ -457,7 +474,7 @@ class AuditLog(models.Model):
     target_member_name = models.CharField(max_length=255, blank=True, verbose_name="Target Member Name")
     target_member_role = models.CharField(max_length=255, blank=True, verbose_name="Target Member Role")
     student_name = models.CharField(max_length=255, blank=True, default="N/A", verbose_name="Student Name")
-    timestamp = models.TextField(verbose_name="Timestamp")
+    timestamp = models.TextField(db_index=True, verbose_name="Timestamp")
     device_time = models.CharField(max_length=255, blank=True, verbose_name="Device Time")
 
     def __str__(self):
@@ -490,6 +507,27 @@ class AttendanceLog(models.Model):
     def __str__(self):
         return f"{self.community_name} - {self.member_uid} - {self.date}: {self.is_present}"
     
+class AttendanceMonthlyRollup(models.Model):
+    """One row per member per month, kept in step with AttendanceLog (see attendance.refresh_rollups)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    member_uid = models.CharField(max_length=255)
+    is_visitor = models.BooleanField(default=False)
+    community_name = models.CharField(max_length=255)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    # Bit d is set when a log exists / the member was present on day d of the month
+    recorded_days = models.BigIntegerField(default=0)
+    present_days = models.BigIntegerField(default=0)
+    present_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('member_uid', 'year', 'month')
+        indexes = [models.Index(Lower('community_name'), 'year', 'month', name='rollup_community_month_idx')]
+
+    def __str__(self):
+        return f"{self.community_name} - {self.member_uid} - {self.year}/{self.month}: {self.present_count}"
+
 class ContributionHistory(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     overseer_uid = models.CharField(max_length=255)
@@ -504,11 +542,47 @@ class ContributionHistory(models.Model):
     week2 = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     week3 = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     week4 = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
-    archived_at = models.DateTimeField(auto_now_add=True)
+    archived_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        # A member is archived once per overseer, community and month; also serves the "already archived?" lookup
+        constraints = [
+            models.UniqueConstraint(fields=['overseer_uid', 'community', 'year', 'month', 'user_uid'], name='contribution_history_member_month_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.month}/{self.year}"
 
+class WeeklyContribution(models.Model):
+    """
+    Typed ledger of weekly contributions: one row per member, month and week.
+    Users.week1..week4 are kept as a compatibility view of the open month
+    (see contributions.record_weekly_contributions).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    member_uid = models.CharField(max_length=255)
+    overseer_uid = models.CharField(max_length=255, blank=True, null=True)
+    district_elder_name = models.CharField(max_length=255, blank=True, null=True)
+    community_name = models.CharField(max_length=255, blank=True, null=True)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    week = models.PositiveSmallIntegerField()
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['member_uid', 'year', 'month', 'week'], name='weekly_contribution_member_week_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['community_name', 'year', 'month'], name='weekly_contrib_community_idx'),
+            models.Index(fields=['district_elder_name', 'year', 'month'], name='weekly_contrib_district_idx'),
+            models.Index(fields=['overseer_uid', 'year', 'month'], name='weekly_contrib_overseer_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.member_uid} - {self.year}/{self.month} week {self.week}: {self.amount}"
+
 class MonthlyReport(models.Model):
     id = models.CharField(primary_key=True, max_length=255) 
     community_name = models.CharField(max_length=255)
@@ -534,7 +608,7 @@ class MonthlyReport(models.Model):
     date_sundries = models.CharField(max_length=255, blank=True, null=True)
     date_council = models.CharField(max_length=255, blank=True, null=True)
     date_equipment = models.CharField(max_length=255, blank=True, null=True)
-    archived_at = models.DateTimeField(auto_now_add=True)
+    archived_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
         return self.id
@@ -544,7 +618,7 @@ class IssueReport(models.Model):
     title = models.CharField(max_length=255, verbose_name="Title")
     description = models.TextField(verbose_name="Description")
     reported_by = models.CharField(max_length=255, verbose_name="Reported By")
-    reported_at = models.DateTimeField(auto_now_add=True, verbose_name="Reported At")
+    reported_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Reported At")
     is_resolved = models.BooleanField(default=False, verbose_name="Is Resolved")
     resolved_at = models.DateTimeField(blank=True, null=True, verbose_name="Resolved At")
 
@@ -595,4 +669,66 @@ class ApostolicGreeting(models.Model):
         ordering = ['-year']
 
     def __str__(self):
-        return f"{self.apostle} - {self.year}"
\ No newline at end of file
+        return f"{self.apostle} - {self.year}"
+
+# ===============================================================================================
+# 6. FACE RECOGNITION
+# ===============================================================================================
+
+class FaceEmbedding(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    face_url = models.TextField(unique=True, verbose_name="Face URL")
+    embedding = models.BinaryField(verbose_name="Normalized Embedding (float32)")
+    model_name = models.CharField(max_length=255, default="buffalo_l", verbose_name="Model Name")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def vector(self):
+        return np.frombuffer(self.embedding, dtype=np.float32)
+
+    def __str__(self):
+        return f"Embedding: {self.face_url}"
+
+class DuplicateFaceFlag(models.Model):
+    """A member whose enrollment face matches another member's (see member_faces.screen_enrollment)."""
+    STATUS_CHOICES = (
+        ('Pending', 'Pending Review'),
+        ('Cleared', 'Cleared'),
+        ('Confirmed', 'Confirmed Duplicate'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    member_uid = models.CharField(max_length=255, db_index=True, verbose_name="Enrolling Member UID")
+    candidate_uid = models.CharField(max_length=255, db_index=True, verbose_name="Matching Member UID")
+    score = models.FloatField(verbose_name="Cosine Similarity")
+    face_url = models.TextField(verbose_name="Face URL")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('member_uid', 'candidate_uid')
+
+    def __str__(self):
+        return f"{self.member_uid} ~ {self.candidate_uid} ({self.score:.2f})"
+
+# ===============================================================================================
+# 7. DELTA SYNC
+# ===============================================================================================
+
+class ChangeLogEntry(models.Model):
+    OPERATION_CHOICES = (
+        ('upsert', 'Created / Updated'),
+        ('delete', 'Deleted'),
+    )
+    # Monotonic sync token handed to clients
+    seq = models.BigAutoField(primary_key=True)
+    model_label = models.CharField(max_length=50, verbose_name="Model")
+    object_id = models.CharField(max_length=255, verbose_name="Object ID")
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['model_label', 'seq'])]
+
+    def __str__(self):
+        return f"#{self.seq} {self.operation} {self.model_label}:{self.object_id}"
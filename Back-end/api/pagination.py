@@ -0,0 +1,40 @@
+from rest_framework.pagination import CursorPagination
+
+# First indexed/monotonic column found on a model is used as the cursor key
+CURSOR_CANDIDATES = ['created_at', 'archived_at', 'reported_at', 'timestamp', 'updated_at']
+
+
+def cursor_ordering(view, model):
+    """
+    Keyset ordering for a viewset: an explicit `cursor_ordering` on the view,
+    else newest-first on the first timestamp-like column, always tie-broken by pk.
+    """
+    ordering = getattr(view, 'cursor_ordering', None)
+    if ordering: return tuple(ordering)
+    names = {f.name for f in model._meta.concrete_fields}
+    for name in CURSOR_CANDIDATES:
+        if name in names: return (f"-{name}", '-pk')
+    return ('pk',)
+
+
+class OptInCursorPagination(CursorPagination):
+    """
+    Cursor pagination that only kicks in when the client asks for it
+    (`?page_size=` or `?cursor=`), so existing clients that expect a plain
+    list keep working. Pages are walked with the `next`/`previous` links.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if 'cursor' not in params and self.page_size_query_param not in params: return None
+        # Views that already slice (e.g. `?limit=`) keep their own window
+        if getattr(queryset, 'query', None) is not None and queryset.query.is_sliced: return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        if any(hasattr(backend, 'get_ordering') for backend in getattr(view, 'filter_backends', [])):
+            return super().get_ordering(request, queryset, view)
+        return cursor_ordering(view, queryset.model)
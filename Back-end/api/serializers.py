@@ -1,10 +1,12 @@
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from rest_framework import serializers
 from .models import (
     AdminStaffMember, Songs, Product, Users, Overseer, District, Community, 
     OverseerCommitteeMember, OverseerExpenseReport, UpcomingEvent, 
     CareerOpportunity, TactsoBranch,  AdminStaffMember, AuditLog,EventContribution,EventDiary,
     TactsoCommitteeMember, ApplicationRequest,UserUniversityApplication,Community, District, Overseer
-,SellerListing,Product, Order,OrderItem,ContributionHistory, MonthlyReport,IssueReport, Visitor)
+,SellerListing,Product, Order,OrderItem,ContributionHistory, MonthlyReport,IssueReport, Visitor, AttendanceLog)
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_id = serializers.PrimaryKeyRelatedField(
@@ -101,6 +103,14 @@ class SongSerializer(serializers.ModelSerializer):
         model = Songs
         fields = "__all__"
 
+def with_overseer_fields(queryset):
+    # Overseer name/region for UsersSerializer in the same query instead of two lookups per row
+    overseer = Overseer.objects.filter(uid=OuterRef('overseer_uid'))
+    return queryset.annotate(
+        annotated_overseer_name=Subquery(overseer.values('overseer_initials_surname')[:1]),
+        annotated_overseer_region=Subquery(overseer.values('region')[:1]),
+    )
+
 class UsersSerializer(serializers.ModelSerializer):
     overseer_name = serializers.SerializerMethodField()
     overseer_region = serializers.SerializerMethodField()
@@ -109,19 +119,35 @@ class UsersSerializer(serializers.ModelSerializer):
         model = Users
         fields ="__all__"
 
+    def _overseer(self, obj):
+        # Only for instances that did not come through UsersViewSet.get_queryset (e.g. right after create/update)
+        if not hasattr(obj, '_overseer_row'):
+            obj._overseer_row = Overseer.objects.filter(uid=obj.overseer_uid).values(
+                'overseer_initials_surname', 'region'
+            ).first() if obj.overseer_uid else None
+        return obj._overseer_row
+
     def get_overseer_name(self, obj):
-        if obj.overseer_uid:
-            overseer = Overseer.objects.filter(uid=obj.overseer_uid).first()
-            if overseer:
-                return overseer.overseer_initials_surname
-        return "Not Assigned"
+        if hasattr(obj, 'annotated_overseer_name'):
+            name = obj.annotated_overseer_name
+        else:
+            overseer = self._overseer(obj)
+            name = overseer['overseer_initials_surname'] if overseer else None
+        return name if name is not None else "Not Assigned"
 
     def get_overseer_region(self, obj):
-        if obj.overseer_uid:
-            overseer = Overseer.objects.filter(uid=obj.overseer_uid).first()
-            if overseer:
-                return overseer.region
-        return "Unknown Region"
+        if hasattr(obj, 'annotated_overseer_region'):
+            region = obj.annotated_overseer_region
+        else:
+            overseer = self._overseer(obj)
+            region = overseer['region'] if overseer else None
+        return region if region is not None else "Unknown Region"
+
+class AttendanceLogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AttendanceLog
+        fields = '__all__'
+
 class VisitorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Visitor
@@ -151,6 +177,54 @@ class DistrictSerializer(serializers.ModelSerializer):
             'overseer'
         ]
 
+class NewCommunitySerializer(serializers.Serializer):
+    # Missing, blank and null names are stored as 'Unknown', as the registration form always did
+    community_name = serializers.CharField(max_length=255, default='Unknown', allow_blank=True, allow_null=True)
+
+    def validate_community_name(self, value):
+        return (value or '').strip() or 'Unknown'
+
+class NewDistrictSerializer(serializers.Serializer):
+    """One district of an overseer registration payload, validated before anything is written."""
+    district_elder_name = serializers.CharField(max_length=255, default='Unknown', allow_blank=True, allow_null=True)
+    communities = NewCommunitySerializer(many=True, default=list)
+
+    def validate_district_elder_name(self, value):
+        return (value or '').strip() or 'Unknown'
+
+def create_districts(overseer, districts_data):
+    """
+    Inserts districts and their communities with one bulk_create each and
+    queues geocoding for all new communities as a single batch after commit.
+    """
+    from .signals import invalidate_model
+    from .tasks import enqueue_geocoding
+
+    if not districts_data: return []
+    districts, communities = [], []
+    for district_data in districts_data:
+        district_data = dict(district_data)
+        communities_data = district_data.pop('communities', [])
+        district_data.pop('overseer', None)
+        district = District(overseer=overseer, **district_data)
+        districts.append(district)
+        for community_data in communities_data:
+            community_data = {k: v for k, v in community_data.items() if k != 'district'}
+            community = Community(district=district, **community_data)
+            # bulk_create skips Community.save, so fill the default address here
+            community.full_address = community.full_address or community.address_attempts()[0]
+            communities.append(community)
+
+    District.objects.bulk_create(districts)
+    Community.objects.bulk_create(communities, batch_size=500)
+
+    # bulk_create sends no post_save signals
+    invalidate_model(District)
+    invalidate_model(Community)
+    community_ids = [c.pk for c in communities if not (c.latitude and c.longitude)]
+    transaction.on_commit(lambda: enqueue_geocoding(community_ids))
+    return districts
+
 class OverseerSerializer(serializers.ModelSerializer):
     districts = DistrictSerializer(many=True)
 
@@ -160,16 +234,9 @@ class OverseerSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data): 
         districts_data = validated_data.pop('districts')
-         
-        overseer = Overseer.objects.create(**validated_data)
- 
-        for district_data in districts_data:
-            communities_data = district_data.pop('communities')
-            district = District.objects.create(overseer=overseer, **district_data)
- 
-            for community_data in communities_data:
-                Community.objects.create(district=district, **community_data)
-
+        with transaction.atomic():
+            overseer = Overseer.objects.create(**validated_data)
+            create_districts(overseer, districts_data)
         return overseer
 
 class OverseerCommitteeMemberSerializer(serializers.ModelSerializer):
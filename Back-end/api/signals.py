@@ -1,34 +1,92 @@
+import logging
+
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from django.core.cache import cache
+from .caching import bump_generation
 from .models import (
     Songs, Product, Users, Overseer, District, Community, 
     OverseerCommitteeMember, OverseerExpenseReport, UpcomingEvent, 
     CareerOpportunity, TactsoBranch,   AdminStaffMember, AuditLog,
-    TactsoCommitteeMember, ApplicationRequest, UserUniversityApplication
+    TactsoCommitteeMember, ApplicationRequest, UserUniversityApplication, FaceEmbedding,
+    Visitor, AttendanceLog, EventDiary, EventContribution, MonthlyReport, ContributionHistory,
+    SellerListing, Order, IssueReport, ApostolicGreeting
 )
+from .sync import SYNC_LABELS, DELETE, record_changes
+
+logger = logging.getLogger(__name__)
 
 # List of all models we want to auto-clean
 ALL_MODELS = [
     Songs, Product, Users, Overseer, District, Community, 
     OverseerCommitteeMember, OverseerExpenseReport, UpcomingEvent, 
     CareerOpportunity, TactsoBranch,   AdminStaffMember, AuditLog,
-    TactsoCommitteeMember, ApplicationRequest, UserUniversityApplication
+    TactsoCommitteeMember, ApplicationRequest, UserUniversityApplication,
+    Visitor, AttendanceLog, EventDiary, EventContribution, MonthlyReport, ContributionHistory,
+    SellerListing, Order, IssueReport, ApostolicGreeting,
+    FaceEmbedding,  # face_index.py reloads a scope when this (or its owner model) moves
 ]
 
+# Which other models' cached output nests this model's serializer. These edges are
+# followed transitively: a Community save refreshes District, and so Overseer, lists.
+NESTED_DEPENDENCIES = {
+    Community: [District],                          # DistrictSerializer.communities
+    District: [Overseer],                           # OverseerSerializer.districts
+    EventContribution: [EventDiary],                # EventDiarySerializer.contributions
+}
+
+# Which other models' cached output copies some of this model's own columns
+# (source= / lookups). Only a write to the model itself changes those columns,
+# so these edges are followed one hop, from the model that was written.
+FIELD_DEPENDENCIES = {
+    Overseer: [District, EventContribution, Users], # overseer_uid / overseer_name / region
+    Product: [SellerListing],                       # product_name, description, image_url, category
+    TactsoBranch: [ApplicationRequest],             # university_name
+}
+
+def affected_models(model):
+    seen, stack = [], [model] + FIELD_DEPENDENCIES.get(model, [])
+    while stack:
+        current = stack.pop()
+        if current in seen: continue
+        seen.append(current)
+        stack.extend(NESTED_DEPENDENCIES.get(current, []))
+    return seen
+
+def invalidate_model(model):
+    """
+    Invalidates the cached lists of `model` and everything that embeds it.
+    Call this after bulk writes (queryset.update(), bulk_create()) that skip signals.
+    Runs once the surrounding transaction commits, so a concurrent read can't
+    re-cache pre-commit data under the new generation.
+    """
+    def bump():
+        for affected in affected_models(model):
+            generation = bump_generation(affected.__name__)
+            logger.debug(f"🧹 Data changed in {model.__name__}. {affected.__name__} cache generation is now {generation}")
+    transaction.on_commit(bump)
+
 def clear_model_cache(sender, instance, **kwargs):
     """
-    Deletes the specific cache key for the model that was just changed.
+    Invalidates every cached list variant of the model that was just changed
+    (and of the models whose output nests it).
     """
-    model_name = sender.__name__
-    cache_key = f"list_cache_{model_name}"
-    
-    # Check if key exists before trying to delete (optional optimization)
-    if cache.get(cache_key):
-        print(f"🧹 Data changed in {model_name}. Clearing cache key: {cache_key}")
-        cache.delete(cache_key)
+    invalidate_model(sender)
 
 # Register the signal for every model in the list
 for model in ALL_MODELS:
     post_save.connect(clear_model_cache, sender=model)
-    post_delete.connect(clear_model_cache, sender=model)
\ No newline at end of file
+    post_delete.connect(clear_model_cache, sender=model)
+
+# ==========================================
+# CHANGE FEED (delta sync for the mobile app)
+# ==========================================
+
+def record_saved(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk])
+
+def record_deleted(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], DELETE)
+
+for model in SYNC_LABELS:
+    post_save.connect(record_saved, sender=model)
+    post_delete.connect(record_deleted, sender=model)
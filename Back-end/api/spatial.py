@@ -0,0 +1,67 @@
+"""
+Nearest-community search.
+
+Communities with coordinates are kept in a KD-tree over unit-sphere xyz
+points, where straight-line (chord) distance orders points exactly like
+great-circle distance. The tree is rebuilt when the Community cache
+generation moves (every save/delete/bulk write bumps it, see signals.py),
+so all workers pick up changes without a full scan per request.
+"""
+import math
+import threading
+import numpy as np
+
+from .caching import get_generation
+from .models import Community
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_xyz(latitudes, longitudes):
+    lat, lng = np.radians(latitudes), np.radians(longitudes)
+    return np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+def km_to_chord(km):
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+class CommunitySpatialIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._tree = None
+        self._ids = []
+
+    def _rebuild(self, generation):
+        from scipy.spatial import cKDTree
+        rows = list(
+            Community.objects.filter(latitude__isnull=False, longitude__isnull=False)
+            .values_list('id', 'latitude', 'longitude')
+        )
+        self._ids = [row[0] for row in rows]
+        self._tree = cKDTree(to_unit_xyz([r[1] for r in rows], [r[2] for r in rows])) if rows else None
+        self._generation = generation
+
+    def _current(self):
+        # Read the generation before loading, so a write during the rebuild triggers another one
+        generation = get_generation(Community.__name__)
+        with self._lock:
+            if generation != self._generation: self._rebuild(generation)
+            return self._tree, self._ids
+
+    def nearest(self, latitude, longitude, limit=10, radius_km=None):
+        """[(community_id, distance_km)] of the `limit` closest communities, nearest first."""
+        tree, ids = self._current()
+        if tree is None: return []
+        bound = km_to_chord(radius_km) if radius_km is not None else np.inf
+        chords, indexes = tree.query(to_unit_xyz([latitude], [longitude])[0], k=min(limit, len(ids)), distance_upper_bound=bound)
+        chords, indexes = np.atleast_1d(chords), np.atleast_1d(indexes)
+        found = np.isfinite(chords)
+        return [(ids[i], round(float(km), 3)) for i, km in zip(indexes[found], chord_to_km(chords[found]))]
+
+
+community_index = CommunitySpatialIndex()
@@ -0,0 +1,119 @@
+"""
+Change feed for offline-first clients.
+
+Every save/delete of a synced model appends a ChangeLogEntry (see signals.py);
+`changes_since` turns the entries after a client's token into upserted rows
+and tombstones, so a sync costs O(changes) instead of O(collection).
+
+Entries are kept for CHANGE_LOG_RETENTION_DAYS (`python manage.py
+prune_change_log`); a client whose token is older than that does a full sync.
+"""
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ChangeLogEntry, Users, Visitor, AttendanceLog, Songs, Product, SellerListing
+from .serializers import (
+    UsersSerializer, VisitorSerializer, AttendanceLogSerializer, SongSerializer, ProductSerializer,
+    SellerListingSerializer, with_overseer_fields
+)
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+# label -> (model, serializer, queryset hook); the label is what clients send in ?models=
+SYNC_MODELS = {
+    'users': (Users, UsersSerializer, with_overseer_fields),
+    'visitors': (Visitor, VisitorSerializer, None),
+    'attendance': (AttendanceLog, AttendanceLogSerializer, None),
+    'songs': (Songs, SongSerializer, None),
+    'products': (Product, ProductSerializer, None),
+    'seller_listings': (SellerListing, SellerListingSerializer, lambda qs: qs.select_related('product')),
+}
+SYNC_LABELS = {model: label for label, (model, _, _) in SYNC_MODELS.items()}
+
+# Rows scoped to a community can be filtered server-side with ?community_name=
+COMMUNITY_SCOPED = {'users', 'visitors', 'attendance'}
+
+# Entries younger than this are held back so a sequence number allocated by a
+# slower concurrent writer can't be skipped by a client that already moved past it.
+VISIBILITY_LAG = datetime.timedelta(seconds=2)
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+
+def record_changes(model, object_ids, operation=UPSERT):
+    """
+    Appends change entries for `object_ids` once the current transaction commits.
+    Signals call this per row; bulk paths (bulk_create / queryset.update) call it directly.
+    """
+    label = SYNC_LABELS.get(model)
+    object_ids = [str(pk) for pk in object_ids]
+    if label is None or not object_ids: return
+    transaction.on_commit(lambda: ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(model_label=label, object_id=pk, operation=operation) for pk in object_ids
+    ]))
+
+def current_token():
+    return ChangeLogEntry.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+
+def token_expired(since):
+    """True when entries after `since` have been pruned, so the feed can't bring the client up to date."""
+    oldest = ChangeLogEntry.objects.order_by('seq').values_list('seq', flat=True).first()
+    return oldest is not None and since < oldest - 1
+
+def prune_change_log(before):
+    """
+    Deletes entries older than `before`; returns how many. The newest entry is
+    always kept, so token_expired() can still tell a pruned feed from an empty one.
+    """
+    deleted, _ = ChangeLogEntry.objects.filter(changed_at__lt=before, seq__lt=current_token()).delete()
+    return deleted
+
+def changes_since(since, labels, limit=DEFAULT_LIMIT, community_name=None, context=None):
+    """
+    Returns {'changes': {label: {'upserts': [...], 'deleted': [ids]}}, 'next': token, 'has_more': bool}
+    for at most `limit` change entries after `since`.
+    """
+    visible_before = timezone.now() - VISIBILITY_LAG
+    entries = list(
+        ChangeLogEntry.objects.filter(seq__gt=since, model_label__in=labels, changed_at__lte=visible_before)
+        .order_by('seq').values_list('seq', 'model_label', 'object_id', 'operation')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # The last operation on a row wins
+    latest = {}
+    for _, label, object_id, operation in entries: latest[(label, object_id)] = operation
+
+    changes = {}
+    for label in labels:
+        model, serializer_class, prepare = SYNC_MODELS[label]
+        upsert_ids = [pk for (l, pk), op in latest.items() if l == label and op == UPSERT]
+        deleted = [pk for (l, pk), op in latest.items() if l == label and op == DELETE]
+
+        rows = []
+        if upsert_ids:
+            queryset = model.objects.filter(pk__in=upsert_ids)
+            if prepare: queryset = prepare(queryset)
+            rows = list(queryset)
+            # Rows deleted after their last upsert entry are gone: send them as tombstones
+            found = {str(row.pk) for row in rows}
+            deleted += [pk for pk in upsert_ids if pk not in found]
+            if community_name and label in COMMUNITY_SCOPED:
+                # A row that left the community (e.g. a member who moved) must leave the client too
+                deleted += [str(row.pk) for row in rows if (row.community_name or '').lower() != community_name.lower()]
+                rows = [row for row in rows if (row.community_name or '').lower() == community_name.lower()]
+
+        changes[label] = {
+            'upserts': serializer_class(rows, many=True, context=context or {}).data,
+            'deleted': deleted,
+        }
+
+    return {
+        'changes': changes,
+        'next': entries[-1][0] if entries else since,
+        'has_more': has_more,
+    }
@@ -0,0 +1,69 @@
+"""
+Background jobs.
+
+With CELERY_BROKER_URL set, jobs go to the Celery workers
+(`celery -A tact_api worker`). Without a broker they run, one at a time, on
+a daemon thread of the web process, so requests still return immediately.
+"""
+import queue
+import logging
+import threading
+
+from celery import shared_task
+from django.conf import settings
+from django.db import connections
+
+from .geocoding import geocode_communities
+
+logger = logging.getLogger(__name__)
+
+
+# rate_limit is per worker process; the Nominatim limit itself is shared (geocoding.SharedRateLimiter)
+@shared_task(ignore_result=True, rate_limit='1/s')
+def geocode_communities_task(community_ids):
+    placed = geocode_communities(community_ids)
+    logger.info(f"✅ Geocoded {placed}/{len(community_ids)} communities")
+
+
+# ==========================================
+# IN-PROCESS FALLBACK QUEUE
+# ==========================================
+
+_jobs = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+def _run_jobs():
+    while True:
+        task, args = _jobs.get()
+        try:
+            task.apply(args=args)
+        except Exception as e:
+            logger.error(f"❌ Background job {task.name} failed: {e}")
+        finally:
+            connections.close_all()
+            _jobs.task_done()
+
+def _start_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_jobs, name='tact-background-jobs', daemon=True)
+            _worker.start()
+
+def enqueue(task, *args):
+    if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+        task.apply(args=args)
+        return
+    if getattr(settings, 'CELERY_BROKER_URL', None):
+        try:
+            task.delay(*args)
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ Broker unavailable for {task.name}, running it in-process: {e}")
+    _start_worker()
+    _jobs.put((task, args))
+
+def enqueue_geocoding(community_ids):
+    community_ids = [str(pk) for pk in community_ids]
+    if community_ids: enqueue(geocode_communities_task, community_ids)
@@ -1,3 +1,1280 @@
-from django.test import TestCase
+import os
+import sys
+import subprocess
+import datetime
+import time
+import tempfile
+import threading
+import io
+import unittest
+from unittest import mock
+from collections import Counter
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from cryptography.exceptions import InvalidTag
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.http import QueryDict
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .attendance import attendance_rows, build_row, bulk_record_attendance, record_attendance
+from . import views
+from .blob_cache import decrypted_blob_cache
+from .caching import _fill_lock_key, bump_generation, cache_stats, get_or_fill, list_cache_key
+from .chunked_crypto import DEFAULT_FRAME_SIZE, HEADER_LEN, TAG_LEN, ChunkedCipher, ContainerHeader, EncryptingReader, is_chunked
+from .contributions import archive_contributions, contribution_totals, ledger_rows, record_weekly_contributions, save_ledger
+from . import face_engine
+from .face_engine import FaceBatcher
+from .face_index import SCOPE_STAFF, FaceIndex
+from . import geocoding
+from .geocoding import SharedRateLimiter, normalize_address
+from .member_faces import EMBEDDING_DIM, MemberFaceStore, screen_enrollment
+from .serializers import NewDistrictSerializer, create_districts
+from .spatial import EARTH_RADIUS_KM, CommunitySpatialIndex
+from .models import (
+    AdminStaffMember, AttendanceLog, AttendanceMonthlyRollup, ChangeLogEntry, Community, ContributionHistory, District,
+    EventContribution, EventDiary, FaceEmbedding, GeocodeCache, Overseer, Songs, Users, Visitor, WeeklyContribution,
+)
+from .signals import affected_models
+from .sync import changes_since, current_token, prune_change_log, token_expired
+from .views import contribution_totals_report, decrypted_blob_etag
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class UsersListQueryCountTests(TestCase):
+    """The Users list must not issue per-row overseer lookups."""
+
+    def setUp(self):
+        for i in range(2):
+            Overseer.objects.create(
+                uid=f"overseer-{i}", overseer_initials_surname=f"Overseer {i}", email=f"o{i}@example.com",
+                province="Gauteng", region=f"Region {i}", code=f"C{i}",
+            )
+
+    def create_users(self, count):
+        Users.objects.bulk_create([
+            Users(uid=f"user-{i}", name=f"Member {i}", overseer_uid=f"overseer-{i % 3}") for i in range(count)
+        ])
+
+    def test_list_query_count_is_constant(self):
+        for count in (3, 60):
+            Users.objects.all().delete()
+            self.create_users(count)
+            with self.assertNumQueries(1):
+                response = self.client.get('/api/users/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), count)
+
+    def test_paginated_list_query_count_is_constant(self):
+        self.create_users(60)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/', {'page_size': 25})
+        self.assertEqual(len(response.json()['results']), 25)
+
+    def test_overseer_fields_are_resolved(self):
+        self.create_users(3)
+        rows = {row['uid']: row for row in self.client.get('/api/users/').json()}
+        self.assertEqual(rows['user-1']['overseer_name'], "Overseer 1")
+        self.assertEqual(rows['user-1']['overseer_region'], "Region 1")
+        # overseer-2 does not exist
+        self.assertEqual(rows['user-2']['overseer_name'], "Not Assigned")
+        self.assertEqual(rows['user-2']['overseer_region'], "Unknown Region")
+
+
+# ==========================================
+# SHARED CACHE TIER
+# ==========================================
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+def redis_caches(location, **pool_kwargs):
+    options = {'CLIENT_CLASS': 'django_redis.client.DefaultClient'}
+    if pool_kwargs: options['CONNECTION_POOL_KWARGS'] = pool_kwargs
+    return {'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': location, 'OPTIONS': options}}
+
+
+class CacheTierTestsMixin:
+
+    def setUp(self):
+        cache.clear()
+        cache_stats.reset()
+
+    def test_concurrent_misses_fill_once(self):
+        calls = []
+
+        def fill():
+            calls.append(1)
+            time.sleep(0.2)
+            return ['row']
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_or_fill('k', fill, timeout=60, name='Test'))) for _ in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['row']] * 8)
+        stats = cache_stats.snapshot()['Test']
+        self.assertEqual(stats['fills'], 1)
+        self.assertEqual(stats['misses'] + stats['hits'], 8)
+
+    @override_settings(CACHE_FILL_LOCK_TIMEOUT=1)
+    def test_lock_held_elsewhere_is_not_released(self):
+        # Another process took the fill lock and is still filling when our wait runs out
+        cache.set(_fill_lock_key('k'), 1, timeout=60)
+        self.assertEqual(get_or_fill('k', lambda: ['row'], timeout=60, name='Test'), ['row'])
+        self.assertIsNotNone(cache.get(_fill_lock_key('k')))
+
+    def test_stale_entry_is_served_while_revalidating(self):
+        cache.set('k', {'value': 'old', 'fresh_until': time.time() - 1}, timeout=60)
+        self.assertEqual(get_or_fill('k', lambda: 'new', timeout=60, name='Test'), 'old')
+
+        deadline = time.monotonic() + 5
+        while cache.get('k')['value'] != 'new' and time.monotonic() < deadline: time.sleep(0.02)
+        self.assertEqual(get_or_fill('k', lambda: 'newer', timeout=60, name='Test'), 'new')
+        self.assertEqual(cache_stats.snapshot()['Test']['stale_hits'], 1)
+
+    def test_generation_bump_changes_every_variant_key(self):
+        params = QueryDict('province=Gauteng&limit=10')
+        reordered = QueryDict('limit=10&province= Gauteng ')
+        before = list_cache_key('Community', params)
+        self.assertEqual(before, list_cache_key('Community', reordered))
+
+        bump_generation('Community')
+        self.assertNotEqual(before, list_cache_key('Community', params))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LocMemCacheTierTests(CacheTierTestsMixin, SimpleTestCase):
+    pass
+
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+@override_settings(CACHES=redis_caches('redis://localhost:6379/15', connection_class=getattr(fakeredis, 'FakeConnection', None)))
+class FakeRedisCacheTierTests(CacheTierTestsMixin, SimpleTestCase):
+    pass
+
+
+@unittest.skipUnless(os.environ.get('TEST_REDIS_URL'), "TEST_REDIS_URL is not set")
+@override_settings(CACHES=redis_caches(os.environ.get('TEST_REDIS_URL', '')))
+class RedisCacheTierTests(CacheTierTestsMixin, SimpleTestCase):
+    pass
+
+
+class CacheDependencyTests(SimpleTestCase):
+    """Nested serializers invalidate transitively, copied columns only one hop."""
+
+    def test_community_save_stops_at_nesting_parents(self):
+        self.assertEqual(set(affected_models(Community)), {Community, District, Overseer})
+
+    def test_overseer_save_reaches_copies_and_their_parents(self):
+        self.assertEqual(
+            set(affected_models(Overseer)),
+            {Overseer, District, EventContribution, EventDiary, Users},
+        )
+
+
+class ServeDecryptedImageConditionalTests(SimpleTestCase):
+    """Validators are only attached to successful image responses."""
+
+    URL = 'http://127.0.0.1:9/blob.enc'
+
+    def test_matching_etag_is_not_modified(self):
+        etag = decrypted_blob_etag(self.URL)
+        response = self.client.get('/api/serve_image/', {'url': self.URL}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_star_only_matches_an_existing_blob(self):
+        # Nothing listens on the URL: the blob can't be confirmed, so no 304
+        response = self.client.get('/api/serve_image/', {'url': self.URL}, HTTP_IF_NONE_MATCH='*')
+        self.assertGreaterEqual(response.status_code, 400)
+
+        stored = FakeStorageResponse(b'x', 206, {'Content-Range': 'bytes 0-0/10'})
+        with mock.patch.object(views.requests, 'get', return_value=stored) as get:
+            response = self.client.get('/api/serve_image/', {'url': self.URL}, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(get.call_args.kwargs['headers'], {'Range': 'bytes=0-0'})
+
+        with mock.patch.object(views.requests, 'get', return_value=FakeStorageResponse(b'', 404)):
+            response = self.client.get('/api/serve_image/', {'url': self.URL}, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+    def test_failed_fetch_has_no_validators(self):
+        response = self.client.get('/api/serve_image/', {'url': self.URL})
+        self.assertGreaterEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Cache-Control'))
+
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalListTests(TestCase):
+    """Song list revalidation: the ETag follows the Songs cache generation."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = type('FirebaseUser', (), {'is_authenticated': True})()
+        Songs.objects.create(artist='Choir', category='Hymn', song_url='https://songs/1.mp3', song_name='Hymn 1')
+
+    def get(self, if_none_match=None, **params):
+        headers = {'HTTP_IF_NONE_MATCH': if_none_match} if if_none_match else {}
+        request = APIRequestFactory().get('/api/songs/', params, **headers)
+        force_authenticate(request, user=self.user)
+        return views.SongViewSet.as_view({'get': 'list'})(request)
+
+    def test_matching_etag_is_not_modified(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+        with self.assertNumQueries(0):
+            response = self.get(first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        # Other query params are a different representation
+        self.assertEqual(self.get(first['ETag'], category='Hymn').status_code, 200)
+
+    def test_write_changes_the_etag(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Songs.objects.create(artist='Choir', category='Hymn', song_url='https://songs/2.mp3', song_name='Hymn 2')
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 2)
+
+    def test_weak_and_multiple_tags(self):
+        etag = self.get()['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        self.assertEqual(self.get(etag.removeprefix('W/')).status_code, 304)
+        self.assertEqual(self.get(f'"stale", {etag}').status_code, 304)
+        self.assertEqual(self.get('*').status_code, 304)
+        self.assertEqual(self.get('"stale", W/"older"').status_code, 200)
+
+
+# ==========================================
+# CHUNKED ENCRYPTION & RANGE SERVING
+# ==========================================
+
+class ChunkedCryptoTests(SimpleTestCase):
+
+    FRAME = 16
+
+    def setUp(self):
+        self.cipher = ChunkedCipher(os.urandom(32), frame_size=self.FRAME)
+
+    def test_round_trip_at_frame_boundaries(self):
+        for size in (0, 1, self.FRAME - 1, self.FRAME, self.FRAME + 1, 2 * self.FRAME, 3 * self.FRAME + 5):
+            data = os.urandom(size)
+            blob = self.cipher.encrypt(data)
+            self.assertEqual(len(blob), self.cipher.encrypted_size(size), size)
+            self.assertEqual(ContainerHeader.parse(blob).plaintext_size(len(blob)), size)
+            self.assertEqual(self.cipher.decrypt(blob), data, size)
+
+    def test_legacy_fernet_blobs_still_decrypt(self):
+        data = b'\xff\xd8\xff legacy jpeg'
+        token = views.cipher_suite.encrypt(data)
+        self.assertFalse(is_chunked(token))
+        self.assertEqual(views.decrypt_blob(token), data)
+
+    def test_truncated_or_reordered_frames_are_rejected(self):
+        blob = self.cipher.encrypt(os.urandom(3 * self.FRAME))
+        frame = self.FRAME + TAG_LEN
+        frames = [blob[HEADER_LEN + i * frame:HEADER_LEN + (i + 1) * frame] for i in range(3)]
+        damaged = {
+            'last frame dropped': blob[:HEADER_LEN + 2 * frame],
+            'cut mid-frame': blob[:-5],
+            'frames swapped': blob[:HEADER_LEN] + frames[1] + frames[0] + frames[2],
+        }
+        for name, data in damaged.items():
+            with self.assertRaises((ValueError, InvalidTag), msg=name):
+                self.cipher.decrypt(data)
+
+    def test_reader_rewinds_to_identical_bytes(self):
+        data = os.urandom(5 * self.FRAME + 3)
+        reader = EncryptingReader(self.cipher, io.BytesIO(data))
+        first = reader.read(40) + reader.read()
+        reader.seek(0)
+        self.assertEqual(reader.read(), first)
+        reader.seek(37)
+        self.assertEqual(reader.read(10), first[37:47])
+        self.assertEqual(reader.tell(), 47)
+        self.assertEqual(self.cipher.decrypt(first), data)
+
+
+class FakeStorageResponse:
+
+    def __init__(self, body, status_code=200, headers=None):
+        self.body, self.status_code, self.headers = body, status_code, headers or {}
+
+    def iter_content(self, size):
+        for i in range(0, len(self.body), size): yield self.body[i:i + size]
+
+    def close(self):
+        pass
+
+
+class ServeDecryptedImageRangeTests(SimpleTestCase):
+    """Range requests on chunked blobs fetch and decrypt only the frames they cover."""
+
+    def setUp(self):
+        decrypted_blob_cache.clear()
+        self.data = os.urandom(3 * DEFAULT_FRAME_SIZE + 1000)
+        self.blobs = {}
+        self.requests = []
+        patcher = mock.patch.object(views.requests, 'get', self.fake_get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_get(self, url, headers=None, stream=False, timeout=None):
+        blob = self.blobs[url]
+        byte_range = (headers or {}).get('Range')
+        self.requests.append(byte_range)
+        if not byte_range:
+            return FakeStorageResponse(blob, headers={'Content-Length': str(len(blob))})
+        start, end = (int(n) for n in byte_range[len('bytes='):].split('-'))
+        end = min(end, len(blob) - 1)
+        return FakeStorageResponse(blob[start:end + 1], 206, {'Content-Range': f"bytes {start}-{end}/{len(blob)}"})
+
+    def get(self, url, byte_range=None):
+        extra = {'HTTP_RANGE': byte_range} if byte_range else {}
+        response = self.client.get('/api/serve_image/', {'url': url}, **extra)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_range_spanning_frames(self):
+        url = 'https://storage/multi.enc'
+        self.blobs[url] = views.chunked_cipher.encrypt(self.data)
+        start, end = DEFAULT_FRAME_SIZE - 10, 2 * DEFAULT_FRAME_SIZE + 10
+        response, body = self.get(url, f"bytes={start}-{end}")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f"bytes {start}-{end}/{len(self.data)}")
+        self.assertEqual(body, self.data[start:end + 1])
+        # Header probe, then only frames 0..2 of 4
+        frame = DEFAULT_FRAME_SIZE + TAG_LEN
+        self.assertEqual(self.requests, [f"bytes=0-{HEADER_LEN - 1}", f"bytes={HEADER_LEN}-{HEADER_LEN + 3 * frame - 1}"])
+
+    def test_suffix_range_and_full_body(self):
+        url = 'https://storage/suffix.enc'
+        self.blobs[url] = views.chunked_cipher.encrypt(self.data)
+        response, body = self.get(url, 'bytes=-500')
+        self.assertEqual((response.status_code, body), (206, self.data[-500:]))
+
+        response, body = self.get(url)
+        self.assertEqual((response.status_code, body), (200, self.data))
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_unsatisfiable_range(self):
+        url = 'https://storage/short.enc'
+        self.blobs[url] = views.chunked_cipher.encrypt(self.data)
+        response, _ = self.get(url, f"bytes={len(self.data)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertFalse(response.has_header('ETag'))
+
+
+
+class FakeBucket:
+    """Records uploads and deletes; uploads into `fail_folder` raise."""
+    name = 'tact-test'
+
+    def __init__(self, fail_folder=None):
+        self.fail_folder, self.stored, self.deleted = fail_folder, {}, []
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+class FakeBlob:
+
+    def __init__(self, bucket, name):
+        self.bucket, self.name = bucket, name
+        self.public_url = f"https://storage.googleapis.com/{bucket.name}/{name}"
+
+    def upload_from_file(self, stream, size=None, content_type=None):
+        data = stream.read()
+        if self.name.startswith(f"{self.bucket.fail_folder}/"): raise ConnectionError('upload reset')
+        self.bucket.stored[self.name] = data
+
+    def make_public(self):
+        pass
+
+    def delete(self):
+        self.bucket.deleted.append(self.name)
+        del self.bucket.stored[self.name]
+
+
+class EncryptAndUploadManyTests(TestCase):
+
+    def upload(self, bucket):
+        files = {key: (io.BytesIO(f"{key} bytes".encode()), key) for key in ('profile', 'id_document', 'proof')}
+        with mock.patch.object(views, 'get_bucket', return_value=bucket):
+            return views.encrypt_and_upload_many(files)
+
+    def test_uploads_every_file(self):
+        bucket = FakeBucket()
+        urls = self.upload(bucket)
+        self.assertEqual(set(urls), {'profile', 'id_document', 'proof'})
+        for key, url in urls.items():
+            self.assertEqual(views.decrypt_blob(bucket.stored[url.split(f"/{bucket.name}/", 1)[1]]), f"{key} bytes".encode())
+
+    def test_one_failure_removes_the_others(self):
+        bucket = FakeBucket(fail_folder='id_document')
+        with self.assertRaises(views.UploadFailed) as raised:
+            self.upload(bucket)
+        self.assertIn('id_document', str(raised.exception))
+        self.assertEqual(bucket.stored, {})
+        self.assertEqual(sorted(name.split('/')[0] for name in bucket.deleted), ['profile', 'proof'])
+
+
+# ==========================================
+# GEOCODING QUEUE
+# ==========================================
+
+class StubGeocoder:
+    """Local stand-in for Nominatim: answers from KNOWN and records every call."""
+    KNOWN = {'Soweto, Gauteng, South Africa': (-26.2485, 27.8540)}
+    calls = []
+
+    def geocode(self, address):
+        StubGeocoder.calls.append(address)
+        return self.KNOWN.get(address)
+
+
+@override_settings(GEOCODER_CLASS='api.tests.StubGeocoder', CELERY_TASK_ALWAYS_EAGER=True)
+class CommunityGeocodingTests(TestCase):
+
+    def setUp(self):
+        StubGeocoder.calls = []
+        overseer = Overseer.objects.create(
+            uid="overseer-geo", overseer_initials_surname="Overseer", email="geo@example.com",
+            province="Gauteng", region="Johannesburg South", code="G1",
+        )
+        self.district = District.objects.create(overseer=overseer, district_elder_name="Elder")
+
+    def create_community(self, name, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Community.objects.create(district=self.district, community_name=name, **fields)
+
+    def test_save_returns_before_geocoding(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            community = Community.objects.create(district=self.district, community_name="Soweto")
+        self.assertEqual(StubGeocoder.calls, [])
+        self.assertIsNone(community.latitude)
+        self.assertEqual(community.full_address, "Soweto, Johannesburg South, Gauteng, South Africa")
+
+        for callback in callbacks: callback()
+        community.refresh_from_db()
+        self.assertAlmostEqual(community.latitude, -26.2485)
+        self.assertEqual(community.full_address, "Soweto, Gauteng, South Africa")
+
+    def test_each_address_is_geocoded_once(self):
+        self.create_community("Soweto")
+        self.assertEqual(len(StubGeocoder.calls), 2)
+
+        second = self.create_community("soweto ")
+        self.assertEqual(len(StubGeocoder.calls), 2)
+        second.refresh_from_db()
+        self.assertAlmostEqual(second.longitude, 27.8540)
+
+    def test_misses_are_cached(self):
+        first = self.create_community("Nowhere")
+        self.assertEqual(len(StubGeocoder.calls), 4)
+        self.assertEqual(GeocodeCache.objects.filter(found=False).count(), 4)
+
+        self.create_community("Nowhere")
+        self.assertEqual(len(StubGeocoder.calls), 4)
+        first.refresh_from_db()
+        self.assertIsNone(first.latitude)
+
+    def test_known_coordinates_skip_the_queue(self):
+        community = self.create_community("Placed", latitude=-26.0, longitude=28.0)
+        self.assertEqual(StubGeocoder.calls, [])
+        self.assertEqual(community.full_address, "Placed, Johannesburg South, Gauteng, South Africa")
+
+    def test_rate_limit_is_shared_between_processes(self):
+        # One limiter per simulated process, all claiming slots in the same cache
+        delay, calls = 0.05, []
+
+        def worker():
+            limiter = SharedRateLimiter('test-geocoder', delay)
+            for _ in range(3):
+                limiter.wait()
+                calls.append(time.time())
+
+        with override_settings(CACHES=LOCMEM_CACHES):
+            cache.clear()
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads: thread.start()
+            for thread in threads: thread.join(10)
+        calls.sort()
+        self.assertEqual(len(calls), 12)
+        self.assertGreaterEqual(min(b - a for a, b in zip(calls, calls[1:])), delay * 0.8)
+
+    def test_rate_limit_without_a_reachable_cache(self):
+        limiter, calls = SharedRateLimiter('test-geocoder', 0.05), []
+        with mock.patch.object(geocoding.cache, 'add', return_value=None):
+            for _ in range(3):
+                limiter.wait()
+                calls.append(time.monotonic())
+        self.assertGreaterEqual(min(b - a for a, b in zip(calls, calls[1:])), 0.04)
+
+    def test_normalize_address(self):
+        self.assertEqual(normalize_address("  Soweto ,Gauteng,  South   Africa "), "soweto, gauteng, south africa")
+
+
+class BulkDistrictCreateTests(TestCase):
+
+    def setUp(self):
+        self.overseer = Overseer.objects.create(
+            uid="overseer-bulk", overseer_initials_surname="Overseer", email="bulk@example.com",
+            province="Limpopo", region="Polokwane", code="B1",
+        )
+
+    def test_nested_registration_is_batched_inserts(self):
+        payload = [
+            {'district_elder_name': f"Elder {d}", 'communities': [{'community_name': f"Community {d}-{c}"} for c in range(10)]}
+            for d in range(20)
+        ]
+        with self.captureOnCommitCallbacks(execute=False):
+            with CaptureQueriesContext(connection) as queries:
+                create_districts(self.overseer, payload)
+
+        # Only INSERTs, one per backend batch (SQLite's variable limit splits 200 communities)
+        statements = [q['sql'] for q in queries.captured_queries]
+        self.assertTrue(all(sql.startswith('INSERT INTO') for sql in statements), statements)
+        per_table = Counter(sql.split()[2].strip('"') for sql in statements)
+        community_batch = min(500, connection.ops.bulk_batch_size(Community._meta.concrete_fields, [None] * 200) or 200)
+        self.assertEqual(per_table[District._meta.db_table], 1)
+        self.assertEqual(per_table[Community._meta.db_table], -(-200 // community_batch))
+
+        self.assertEqual(District.objects.filter(overseer=self.overseer).count(), 20)
+        community = Community.objects.get(community_name="Community 3-7")
+        self.assertEqual(community.district.district_elder_name, "Elder 3")
+        self.assertEqual(community.full_address, "Community 3-7, Polokwane, Limpopo, South Africa")
+
+    def test_blank_and_null_names_become_unknown(self):
+        serializer = NewDistrictSerializer(data=[
+            {'district_elder_name': '', 'communities': [{'community_name': None}, {'community_name': '  '}, {}]},
+            {'district_elder_name': None},
+            {},
+        ], many=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual([d['district_elder_name'] for d in serializer.validated_data], ['Unknown'] * 3)
+        self.assertEqual([c['community_name'] for c in serializer.validated_data[0]['communities']], ['Unknown'] * 3)
+
+
+
+# ==========================================
+# NEARBY COMMUNITIES
+# ==========================================
+
+def great_circle_km(lat1, lng1, lat2, lng2):
+    # Haversine, independent of the index's chord maths
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return float(2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a)))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, GEOCODER_CLASS='api.tests.StubGeocoder', CELERY_TASK_ALWAYS_EAGER=True)
+class NearbyCommunitiesTests(TestCase):
+    JOHANNESBURG = (-26.2041, 28.0473)
+    PLACES = {
+        'Pretoria': (-25.7479, 28.2293),
+        'Cape Town': (-33.9249, 18.4241),
+        'Germiston': (-26.2179, 28.1672),
+        'Polokwane': (-23.9045, 29.4689),
+    }
+
+    def setUp(self):
+        cache.clear()
+        overseer = Overseer.objects.create(
+            uid="overseer-near", overseer_initials_surname="Overseer", email="near@example.com",
+            province="Gauteng", region="Ekurhuleni", code="N1",
+        )
+        self.district = District.objects.create(overseer=overseer, district_elder_name="Elder")
+        self.index = CommunitySpatialIndex()
+        patcher = mock.patch.object(views, 'community_index', self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.communities = {
+                name: Community.objects.create(district=self.district, community_name=name, latitude=lat, longitude=lng)
+                for name, (lat, lng) in self.PLACES.items()
+            }
+            # Geocoder can't place it, so it never gets coordinates
+            Community.objects.create(district=self.district, community_name="Nowhere")
+
+    def nearby(self, **params):
+        response = self.client.get('/api/communities/nearby/', {'lat': self.JOHANNESBURG[0], 'lng': self.JOHANNESBURG[1], **params})
+        self.assertEqual(response.status_code, 200)
+        return [(row['community_name'], row['distance_km']) for row in response.json()]
+
+    def test_ordered_by_great_circle_distance(self):
+        rows = self.nearby()
+        expected = sorted(self.PLACES, key=lambda name: great_circle_km(*self.JOHANNESBURG, *self.PLACES[name]))
+        self.assertEqual([name for name, _ in rows], expected)
+        for name, distance in rows:
+            self.assertAlmostEqual(distance, great_circle_km(*self.JOHANNESBURG, *self.PLACES[name]), places=1)
+        self.assertEqual(len(self.nearby(limit=2)), 2)
+
+    def test_radius_cutoff(self):
+        # Germiston ~12 km, Pretoria ~54 km, Polokwane ~290 km
+        self.assertEqual([name for name, _ in self.nearby(radius=20)], ['Germiston'])
+        self.assertEqual([name for name, _ in self.nearby(radius=300)], ['Germiston', 'Pretoria', 'Polokwane'])
+        self.assertEqual(self.client.get('/api/communities/nearby/', {'lat': 100, 'lng': 0}).status_code, 400)
+        self.assertEqual(self.client.get('/api/communities/nearby/', {'lat': 0}).status_code, 400)
+
+    def test_communities_without_coordinates_are_skipped(self):
+        self.assertTrue(Community.objects.filter(community_name="Nowhere", latitude__isnull=True).exists())
+        self.assertEqual(len(self.index.nearest(*self.JOHANNESBURG, limit=50)), len(self.PLACES))
+
+    def test_index_follows_moves_and_deletes(self):
+        self.assertNotIn('Cape Town', [name for name, _ in self.nearby(radius=100)])
+        generation = self.index._generation
+
+        cape_town = self.communities['Cape Town']
+        cape_town.latitude, cape_town.longitude = -26.1, 28.0
+        with self.captureOnCommitCallbacks(execute=True):
+            cape_town.save()
+        self.assertIn('Cape Town', [name for name, _ in self.nearby(radius=100)])
+        self.assertNotEqual(self.index._generation, generation)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.communities['Germiston'].delete()
+        self.assertNotIn('Germiston', [name for name, _ in self.nearby()])
+
+
+# ==========================================
+# DUPLICATE FACE SCREENING
+# ==========================================
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FaceIndexGenerationTests(TestCase):
+    """A scope is reloaded when a write (from any process) bumps one of its source generations."""
+
+    def staff(self, uid):
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        vector[0] = 1.0
+        FaceEmbedding.objects.create(face_url=f"https://faces/{uid}.jpg", embedding=vector.tobytes())
+        return AdminStaffMember.objects.create(
+            uid=uid, full_name=uid, name=uid, surname=uid, email=f"{uid}@example.com",
+            role='Admin', face_url=f"https://faces/{uid}.jpg",
+        ), vector
+
+    def test_scope_follows_writes_from_other_processes(self):
+        index = FaceIndex()
+        with self.captureOnCommitCallbacks(execute=True):
+            _, vector = self.staff('staff-1')
+        self.assertEqual([m['uid'] for m in index.search(SCOPE_STAFF, vector)], ['staff-1'])
+
+        # Another worker deactivates the member: only the shared generation tells this process
+        AdminStaffMember.objects.filter(uid='staff-1').update(is_active=False)
+        self.assertEqual(len(index.search(SCOPE_STAFF, vector)), 1)
+        bump_generation(AdminStaffMember.__name__)
+        self.assertEqual(index.search(SCOPE_STAFF, vector), [])
+
+
+class MemberFaceStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = MemberFaceStore(directory.name)
+        rng = np.random.default_rng(7)
+        vectors = rng.standard_normal((3, EMBEDDING_DIM)).astype(np.float32)
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def test_screen_flags_other_members_only(self):
+        self.store.rebuild([('a', self.vectors[0]), ('b', self.vectors[1])])
+        self.assertEqual([uid for uid, _ in self.store.screen('new', self.vectors[1])], ['b'])
+        self.assertEqual(self.store.screen('b', self.vectors[1]), [])
+        self.assertEqual(self.store.screen('new', self.vectors[2]), [])
+
+    def test_appended_rows_are_visible(self):
+        self.store.rebuild([('a', self.vectors[0])])
+        self.assertEqual(self.store.screen('new', self.vectors[2]), [])
+        self.store.append('c', self.vectors[2])
+        matches = self.store.screen('new', self.vectors[2])
+        self.assertEqual(matches[0][0], 'c')
+        self.assertAlmostEqual(matches[0][1], 1.0, places=3)
+
+    def test_append_skips_the_members_latest_row(self):
+        self.assertTrue(self.store.append('a', self.vectors[0]))
+        self.assertFalse(self.store.append('a', self.vectors[0]))
+        self.assertTrue(self.store.append('a', self.vectors[1]))
+        with open(os.path.join(self.store.directory, 'members.ids')) as f:
+            self.assertEqual(f.read().splitlines(), ['a', 'a'])
+
+    def crash_mid_append(self, vector, uid_fragment=''):
+        # The matrix row reached disk, the uid line did not (or only part of it)
+        with open(os.path.join(self.store.directory, 'members.f32'), 'ab') as f:
+            f.write(vector.tobytes())
+        with open(os.path.join(self.store.directory, 'members.ids'), 'a') as f:
+            f.write(uid_fragment)
+
+    def test_crash_between_the_two_writes_leaves_the_store_readable(self):
+        self.store.rebuild([('a', self.vectors[0])])
+        self.crash_mid_append(self.vectors[1])
+        self.assertEqual(self.store.screen('new', self.vectors[1]), [])
+        self.assertEqual(self.store.screen('new', self.vectors[0])[0][0], 'a')
+
+        self.store.append('c', self.vectors[2])
+        with open(os.path.join(self.store.directory, 'members.ids')) as f:
+            self.assertEqual(f.read().splitlines(), ['a', 'c'])
+        self.assertEqual(os.path.getsize(os.path.join(self.store.directory, 'members.f32')), 2 * EMBEDDING_DIM * 4)
+        self.assertEqual(self.store.screen('new', self.vectors[2])[0][0], 'c')
+        self.assertEqual(self.store.screen('new', self.vectors[1]), [])
+
+    def test_partial_uid_line_is_not_a_row(self):
+        self.store.rebuild([('a', self.vectors[0])])
+        self.crash_mid_append(self.vectors[1], uid_fragment='gho')
+        self.assertEqual(self.store.screen('new', self.vectors[1]), [])
+
+        self.store.append('c', self.vectors[2])
+        with open(os.path.join(self.store.directory, 'members.ids')) as f:
+            self.assertEqual(f.read(), 'a\nc\n')
+
+    def test_append_does_not_rewrite_the_matrix(self):
+        self.store.rebuild([('a', self.vectors[0])])
+        inode = os.stat(os.path.join(self.store.directory, 'members.f32')).st_ino
+        self.store.append('c', self.vectors[2])
+        self.assertEqual(os.stat(os.path.join(self.store.directory, 'members.f32')).st_ino, inode)
+
+    def test_missing_ids_file_reads_as_empty(self):
+        # A rebuild interrupted between its renames
+        self.store.rebuild([('a', self.vectors[0])])
+        os.remove(os.path.join(self.store.directory, 'members.ids'))
+        self.assertEqual(self.store.screen('new', self.vectors[0]), [])
+
+
+class ScreenEnrollmentTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overridden = override_settings(MEMBER_EMBEDDINGS_DIR=directory.name)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.directory = directory.name
+
+    def test_first_screening_builds_without_a_second_row(self):
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        vector[0] = 1.0
+        url = 'https://faces/member-1.jpg'
+        FaceEmbedding.objects.create(face_url=url, embedding=vector.tobytes())
+        Users.objects.create(uid='member-1', name='Thabo', surname='M', community_name='Soweto', face_image_url=url)
+
+        self.assertEqual(screen_enrollment('member-1', url), [])
+        screen_enrollment('member-1', url)
+        with open(os.path.join(self.directory, 'members.ids')) as f:
+            self.assertEqual(f.read().splitlines(), ['member-1'])
+
+
+
+
+# ==========================================
+# FACE VERIFICATION
+# ==========================================
+
+class FakeFaceEngine:
+    """Stands in for the model: an image's "face" is a unit vector keyed by its bytes."""
+
+    def __init__(self, faces):
+        self.faces, self.embedded = faces, []
+
+    def decode_image(self, data):
+        return bytes(data)
+
+    def embed_image(self, img):
+        self.embedded.append(img)
+        if img not in self.faces: return None
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        vector[self.faces[img]] = 1.0
+        return vector
+
+
+class FaceVerificationTests(TestCase):
+    REF_URL = 'https://storage/reference.jpg'
+
+    def setUp(self):
+        self.engine = FakeFaceEngine({b'thabo': 0, b'thabo again': 0, b'sipho': 1})
+        self.reference = b'thabo'
+        for name, fake in (('decode_image', self.engine.decode_image), ('embed_image', self.engine.embed_image),
+                           ('is_available', lambda: True)):
+            patcher = mock.patch.object(views.face_engine, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(views.requests, 'get', lambda url, timeout=None: mock.Mock(content=self.reference))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reference_embedding_is_reused(self):
+        self.assertTrue(views.perform_verification(b'thabo again', self.REF_URL, False)['matched'])
+        self.assertEqual(self.engine.embedded, [b'thabo', b'thabo again'])
+        self.assertEqual(FaceEmbedding.objects.get(face_url=self.REF_URL).model_name, views.FACE_MODEL_NAME)
+
+        result = views.perform_verification(b'sipho', self.REF_URL, False)
+        self.assertFalse(result['matched'])
+        self.assertAlmostEqual(result['score'], 0.0)
+        # Only the live image was embedded the second time
+        self.assertEqual(self.engine.embedded[2:], [b'sipho'])
+
+    def test_changed_reference_is_recomputed(self):
+        # A re-upload gets a new URL: the old embedding is never consulted for it
+        views.perform_verification(b'thabo', self.REF_URL, False)
+        self.reference = b'sipho'
+        self.assertTrue(views.perform_verification(b'sipho', 'https://storage/reference-2.jpg', False)['matched'])
+
+        # A local reference rewritten in place is detected by its modification time
+        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as f:
+            f.write(b'thabo')
+        self.addCleanup(os.remove, f.name)
+        self.assertTrue(views.perform_verification(b'thabo', f.name, False)['matched'])
+        with open(f.name, 'wb') as rewritten: rewritten.write(b'sipho')
+        os.utime(f.name, (time.time() + 60, time.time() + 60))
+        self.assertTrue(views.perform_verification(b'sipho', f.name, False)['matched'])
+        self.assertEqual(FaceEmbedding.objects.get(face_url=f.name).vector[1], 1.0)
+
+    def test_no_face_in_reference(self):
+        self.reference = b'landscape'
+        self.assertEqual(views.perform_verification(b'thabo', self.REF_URL, False), {'matched': False, 'error': 'Face not detected'})
+        self.assertFalse(FaceEmbedding.objects.filter(face_url=self.REF_URL).exists())
+        # Not cached as a miss: a later verification tries the reference again
+        self.reference = b'thabo'
+        self.assertTrue(views.perform_verification(b'thabo', self.REF_URL, False)['matched'])
+
+    def test_no_face_in_live_image(self):
+        self.assertEqual(views.perform_verification(b'blurred', self.REF_URL, False), {'matched': False, 'error': 'Face not detected'})
+
+
+# ==========================================
+# FACE BATCHING
+# ==========================================
+
+class FaceBatcherTests(SimpleTestCase):
+    """The fake model records each batch it is given; the first call blocks until released."""
+
+    def batcher(self, run=None, **kwargs):
+        self.batches, self.release = [], threading.Event()
+
+        def run_batch(images):
+            self.batches.append(list(images))
+            if len(self.batches) == 1: self.release.wait(5)
+            return (run or (lambda imgs: [img * 10 for img in imgs]))(images)
+
+        return FaceBatcher(run_batch, **kwargs)
+
+    def hold(self, batcher):
+        # Occupy the worker so the next submissions queue up behind it
+        first = batcher.submit([0])
+        while not self.batches: time.sleep(0.001)
+        return first
+
+    def test_lone_request_skips_the_window(self):
+        batcher = self.batcher(window_ms=5000)
+        self.release.set()
+        started = time.monotonic()
+        self.assertEqual(batcher.submit([1, 2]).result(5), [10, 20])
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_queued_requests_are_coalesced(self):
+        batcher = self.batcher(window_ms=50)
+        first = self.hold(batcher)
+        futures = [batcher.submit([i]) for i in (1, 2, 3)]
+        self.release.set()
+        self.assertEqual([f.result(5) for f in [first] + futures], [[0], [10], [20], [30]])
+        self.assertEqual(self.batches, [[0], [1, 2, 3]])
+
+    def test_max_batch_splits(self):
+        batcher = self.batcher(window_ms=50, max_batch=2)
+        first = self.hold(batcher)
+        futures = [batcher.submit([i]) for i in (1, 2, 3)]
+        self.release.set()
+        self.assertEqual([f.result(5) for f in [first] + futures], [[0], [10], [20], [30]])
+        self.assertEqual(self.batches, [[0], [1, 2], [3]])
+
+    def test_failing_request_does_not_poison_its_batch(self):
+        def run(images):
+            if 'bad' in images: raise ValueError('undecodable')
+            return [img * 10 for img in images]
+
+        batcher = self.batcher(run, window_ms=50)
+        first = self.hold(batcher)
+        good, bad, other = batcher.submit([1]), batcher.submit(['bad']), batcher.submit([2, 3])
+        self.release.set()
+        self.assertEqual(first.result(5), [0])
+        self.assertEqual(good.result(5), [10])
+        self.assertEqual(other.result(5), [20, 30])
+        with self.assertRaises(ValueError): bad.result(5)
+
+
+
+class FaceWorkerTests(SimpleTestCase):
+    """serve() and FaceWorkerClient over a real Unix socket; the model is replaced by a fake batch function."""
+
+    AUTHKEY = b'test-authkey'
+
+    def setUp(self):
+        # Abstract namespace: no socket file to clean up after the (never-ending) serve thread
+        self.address = f"\0tact-face-worker-test-{os.urandom(4).hex()}"
+        for name, fake in (('load_face_app', lambda: None), ('embed_batch', self.fake_embed_batch)):
+            patcher = mock.patch.object(face_engine, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        threading.Thread(target=face_engine.serve, args=(self.address, self.AUTHKEY), daemon=True).start()
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                Client(self.address, authkey=self.AUTHKEY).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline: raise
+                time.sleep(0.005)
+
+    @staticmethod
+    def fake_embed_batch(app, images):
+        if any(img is None for img in images): raise ValueError('no image')
+        return [np.full(4, img.mean(), dtype=np.float32) for img in images]
+
+    def test_round_trip(self):
+        client = face_engine.FaceWorkerClient(self.address, self.AUTHKEY, timeout=5)
+        images = [np.full((8, 8, 3), value, dtype=np.uint8) for value in (1, 2)]
+        result = client.call('embed', images)
+        self.assertEqual([float(v[0]) for v in result], [1.0, 2.0])
+        # Same connection, reused for the next call
+        self.assertEqual(float(client.call('embed', images[1:])[0][0]), 2.0)
+
+        with self.assertRaisesRegex(RuntimeError, 'Unknown op'):
+            client.call('detect', images)
+        with self.assertRaisesRegex(RuntimeError, 'no image'):
+            client.call('embed', [None])
+
+    def test_wrong_authkey_is_rejected_without_stopping_the_worker(self):
+        with self.assertRaises(AuthenticationError):
+            face_engine.FaceWorkerClient(self.address, b'wrong', timeout=5).call('embed', [])
+        client = face_engine.FaceWorkerClient(self.address, self.AUTHKEY, timeout=5)
+        self.assertEqual(client.call('embed', []), [])
+
+    @override_settings(FACE_WORKER_ADDRESS='127.0.0.1:7100', FACE_WORKER_AUTHKEY='')
+    def test_missing_authkey(self):
+        self.assertEqual(face_engine.worker_address(), ('127.0.0.1', 7100))
+        with self.assertRaises(ImproperlyConfigured):
+            face_engine.worker_authkey()
+        with self.assertRaisesRegex(CommandError, 'FACE_WORKER_AUTHKEY'):
+            call_command('run_face_worker')
+
+
+
+class LazyFaceEngineTests(SimpleTestCase):
+
+    def test_importing_views_does_not_load_the_model(self):
+        # A fresh interpreter: this test process may already have imported the engine's dependencies
+        script = (
+            "import sys, django; django.setup()\n"
+            "import api.views, api.urls\n"
+            "from api import face_engine\n"
+            "print(face_engine._engine_ready, face_engine._batcher, 'insightface' in sys.modules, 'onnxruntime' in sys.modules)\n"
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'tact_api.settings'}
+        env.pop('FACE_WORKER_ADDRESS', None)
+        proc = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.strip().splitlines()[-1], 'False None False False')
+
+
+# ==========================================
+# ATTENDANCE REPORTS
+# ==========================================
+
+class AttendanceReportTests(TestCase):
+
+    def setUp(self):
+        self.member = Users.objects.create(uid="member-1", name="Thabo", surname="M", community_name="Soweto")
+        self.visitor = Visitor.objects.create(community_name="soweto", name="Lerato", surname="K", gender="Female")
+
+    def report(self):
+        return {row['ui_id']: row for row in (build_row(r, 31) for r in attendance_rows(2026, 3, community="Soweto"))}
+
+    def test_members_and_visitors_are_reported(self):
+        record_attendance("member-1", "Soweto", False, True, datetime.date(2026, 3, 1))
+        record_attendance("member-1", "Soweto", False, False, datetime.date(2026, 3, 8))
+        record_attendance(str(self.visitor.id), "Soweto", True, True, datetime.date(2026, 3, 5))
+
+        rows = self.report()
+        self.assertEqual(rows["member-1"]['attendance'], {1: True, 8: False})
+        self.assertEqual(rows["member-1"]['total_present'], 1)
+        # Visitors are keyed by the dashed UUID on every backend
+        visitor = rows[str(self.visitor.id)]
+        self.assertTrue(visitor['is_visitor'])
+        self.assertEqual(visitor['attendance'], {5: True})
+        self.assertEqual(visitor['total_present'], 1)
+
+    def test_unrecorded_members_have_empty_months(self):
+        rows = self.report()
+        self.assertEqual(rows[str(self.visitor.id)]['attendance'], {})
+        self.assertEqual(rows["member-1"]['total_present'], 0)
+
+
+class BulkAttendanceTests(TestCase):
+    """One call marks a whole service: upserted logs, last_attended_date and rollups."""
+
+    DATE = datetime.date(2026, 3, 8)
+
+    def setUp(self):
+        for i in range(3):
+            Users.objects.create(uid=f"member-{i}", name=f"Member {i}", surname="M", community_name="Soweto")
+        self.visitor = Visitor.objects.create(community_name="Soweto", name="Lerato", surname="K", gender="Female")
+
+    def statuses(self, entries):
+        return [r['status'] for r in bulk_record_attendance("Soweto", self.DATE, entries)]
+
+    def test_saves_logs_last_attended_and_rollups(self):
+        self.assertEqual(self.statuses([
+            {'member_uid': 'member-0', 'present': True},
+            {'member_uid': 'member-1', 'present': False},
+            {'member_uid': str(self.visitor.id), 'is_visitor': True, 'present': True},
+        ]), ['saved'] * 3)
+
+        self.assertEqual(AttendanceLog.objects.filter(date=self.DATE, is_present=True).count(), 2)
+        self.assertEqual(Users.objects.get(uid='member-0').last_attended_date, self.DATE)
+        self.assertNotEqual(Users.objects.get(uid='member-1').last_attended_date, self.DATE)
+        self.visitor.refresh_from_db()
+        self.assertEqual(self.visitor.last_attended_date, self.DATE)
+
+        rollup = AttendanceMonthlyRollup.objects.get(member_uid='member-0', year=2026, month=3)
+        self.assertEqual((rollup.recorded_days, rollup.present_days, rollup.present_count), (1 << 8, 1 << 8, 1))
+
+    def test_second_call_upserts(self):
+        self.statuses([{'member_uid': 'member-0', 'present': True}])
+        self.statuses([{'member_uid': 'member-0', 'present': False}])
+
+        self.assertEqual(AttendanceLog.objects.filter(member_uid='member-0').count(), 1)
+        self.assertFalse(AttendanceLog.objects.get(member_uid='member-0').is_present)
+        rollup = AttendanceMonthlyRollup.objects.get(member_uid='member-0', year=2026, month=3)
+        self.assertEqual((rollup.present_days, rollup.present_count), (0, 0))
+
+    def test_later_service_recomputes_existing_rollups(self):
+        self.statuses([{'member_uid': 'member-0', 'present': True}, {'member_uid': str(self.visitor.id), 'is_visitor': True, 'present': True}])
+        rollup_id = AttendanceMonthlyRollup.objects.get(member_uid='member-0').id
+
+        # member-0 already has a March rollup (updated in place), member-1 does not (inserted)
+        bulk_record_attendance("Soweto Central", datetime.date(2026, 3, 15), [
+            {'member_uid': 'member-0', 'present': False},
+            {'member_uid': 'member-1', 'present': True},
+            {'member_uid': str(self.visitor.id), 'is_visitor': True, 'present': True},
+        ])
+        rollups = {r.member_uid: r for r in AttendanceMonthlyRollup.objects.filter(year=2026, month=3)}
+        self.assertEqual(len(rollups), 3)
+        member = rollups['member-0']
+        self.assertEqual(member.id, rollup_id)
+        self.assertEqual((member.recorded_days, member.present_days, member.present_count), ((1 << 8) | (1 << 15), 1 << 8, 1))
+        self.assertEqual((member.community_name, member.is_visitor), ('Soweto Central', False))
+        self.assertEqual((rollups['member-1'].recorded_days, rollups['member-1'].present_count), (1 << 15, 1))
+        visitor = rollups[str(self.visitor.id)]
+        self.assertEqual((visitor.is_visitor, visitor.present_count), (True, 2))
+
+    def test_change_feed_gets_the_written_rows(self):
+        self.statuses([{'member_uid': 'member-0', 'present': True}])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.statuses([{'member_uid': 'member-0', 'present': True}, {'member_uid': 'member-1', 'present': False}])
+        logged = set(ChangeLogEntry.objects.values_list('object_id', flat=True))
+        # Upserted logs are reported by their stored ids, in the same form the signals use
+        self.assertTrue({str(pk) for pk in AttendanceLog.objects.values_list('id', flat=True)} <= logged)
+        self.assertIn(str(Users.objects.get(uid='member-0').id), logged)
+        self.assertNotIn(str(Users.objects.get(uid='member-1').id), logged)
+
+    def test_string_flags_are_parsed(self):
+        results = bulk_record_attendance("Soweto", self.DATE, [
+            {'member_uid': 'member-0', 'is_visitor': 'false', 'present': 'false'},
+            {'member_uid': 'member-1', 'is_visitor': '0', 'present': '1'},
+        ])
+        self.assertEqual([(r['status'], r['is_visitor'], r['present']) for r in results],
+                         [('saved', False, False), ('saved', False, True)])
+        self.assertFalse(AttendanceLog.objects.get(member_uid='member-0').is_present)
+
+    def test_unknown_duplicate_and_invalid_entries(self):
+        self.assertEqual(self.statuses([
+            {'member_uid': 'member-0', 'present': False},
+            {'member_uid': 'nobody', 'present': True},
+            {'member_uid': 'not-a-uuid', 'is_visitor': True, 'present': True},
+            {'member_uid': 'member-1', 'present': 'maybe'},
+            {'present': True},
+            'member-2',
+            {'member_uid': 'member-0', 'present': True},
+        ]), ['duplicate', 'not_found', 'not_found', 'invalid', 'invalid', 'invalid', 'saved'])
+        # The last entry for a member wins
+        self.assertTrue(AttendanceLog.objects.get(member_uid='member-0').is_present)
+        self.assertEqual(AttendanceLog.objects.count(), 1)
+
+    def test_query_count_does_not_grow_with_the_service(self):
+        # Stand-in for the timing target (see bench_bulk_attendance): no per-entry queries
+        for i in range(3, 40):
+            Users.objects.create(uid=f"member-{i}", name=f"Member {i}", surname="M", community_name="Soweto")
+
+        def queries(count):
+            entries = [{'member_uid': f"member-{i}", 'present': True} for i in range(count)]
+            with CaptureQueriesContext(connection) as captured:
+                self.statuses(entries)
+            return len(captured)
+
+        self.assertEqual(queries(4), queries(40))
+
+
+# ==========================================
+# CHANGE FEED
+# ==========================================
+
+class ChangeFeedTests(TestCase):
+
+    def save(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            member = Users.objects.update_or_create(uid='member-1', defaults={'name': 'Thabo', 'surname': 'M', **fields})[0]
+        # Entries younger than VISIBILITY_LAG are held back
+        ChangeLogEntry.objects.update(changed_at=timezone.now() - datetime.timedelta(minutes=1))
+        return member
+
+    def test_member_who_moves_community_gets_a_tombstone(self):
+        member = self.save(community_name='Soweto')
+        since = current_token()
+        self.save(community_name='Tembisa')
+
+        soweto = changes_since(since, ['users'], community_name='soweto')['changes']['users']
+        self.assertEqual((soweto['upserts'], soweto['deleted']), ([], [str(member.pk)]))
+        tembisa = changes_since(since, ['users'], community_name='Tembisa')['changes']['users']
+        self.assertEqual([row['uid'] for row in tembisa['upserts']], ['member-1'])
+
+    def test_pruned_tokens_require_a_full_sync(self):
+        self.save(community_name='Soweto')
+        stale = current_token()
+        self.save(community_name='Tembisa')
+        self.save(community_name='Soweto')
+        newest = current_token()
+
+        self.assertEqual(prune_change_log(timezone.now()), 2)
+        self.assertEqual(ChangeLogEntry.objects.get().seq, newest)
+        self.assertTrue(token_expired(stale))
+        self.assertFalse(token_expired(newest - 1))
+        self.assertFalse(token_expired(newest))
+
+
+# ==========================================
+# CONTRIBUTIONS
+# ==========================================
+
+class ArchiveContributionsTests(TestCase):
+
+    def member(self, uid, community, overseer='overseer-1', district='Elder A', week1='100'):
+        return Users.objects.create(
+            uid=uid, name=uid, surname='M', overseer_uid=overseer, district_elder_name=district,
+            community_name=community, week1=week1, week2='50', week3='0', week4='',
+        )
+
+    def weeks(self, uid):
+        return Users.objects.filter(uid=uid).values_list(*['week1', 'week2', 'week3', 'week4']).get()
+
+    def test_overseer_wide_archive_covers_every_community(self):
+        self.member('m1', 'Soweto')
+        self.member('m2', 'Tembisa', district='Elder B')
+
+        result = archive_contributions('overseer-1', 2026, 3)
+        self.assertEqual((result['archived'], result['members']), (['Soweto', 'Tembisa'], 2))
+        self.assertEqual(ContributionHistory.objects.filter(overseer_uid='overseer-1', year=2026, month=3).count(), 2)
+        self.assertEqual(self.weeks('m2'), ('0', '0', '0', '0'))
+        self.assertEqual(WeeklyContribution.objects.get(member_uid='m1', year=2026, month=3, week=1).amount, 100)
+
+    def test_retry_after_partial_archive_skips_archived_communities(self):
+        self.member('m1', 'Soweto')
+        self.member('m2', 'Tembisa')
+        archive_contributions('overseer-1', 2026, 3, community='Soweto')
+        # New contributions for Soweto after its archive must survive the retry
+        Users.objects.filter(uid='m1').update(week1='30')
+
+        result = archive_contributions('overseer-1', 2026, 3)
+        self.assertEqual((result['archived'], result['skipped']), (['Tembisa'], ['Soweto']))
+        self.assertEqual(self.weeks('m1')[0], '30')
+        self.assertEqual(self.weeks('m2')[0], '0')
+        self.assertEqual(ContributionHistory.objects.get(user_uid='m1').week1, 100)
+
+    def test_overseers_sharing_a_community_name_archive_separately(self):
+        self.member('m1', 'Zion')
+        self.member('m2', 'Zion', overseer='overseer-2', week1='70')
+        archive_contributions('overseer-1', 2026, 3)
+
+        result = archive_contributions('overseer-2', 2026, 3)
+        self.assertEqual((result['archived'], result['skipped']), (['Zion'], []))
+        self.assertEqual(ContributionHistory.objects.get(overseer_uid='overseer-2').week1, 70)
+        self.assertEqual(self.weeks('m2')[0], '0')
+
+    def test_weeks_mirrored_into_the_next_month_move_to_the_archive(self):
+        self.member('m1', 'Soweto')
+        # Edited after month end, before the archive ran: mirrored into April
+        record_weekly_contributions(['m1'], 2026, 4)
+        archive_contributions('overseer-1', 2026, 3)
+
+        self.assertEqual(contribution_totals(2026, 4), [])
+        self.assertEqual(contribution_totals(2026, 3)[0]['total'], 150)
+
+
+class WeeklyLedgerTests(TestCase):
+
+    def setUp(self):
+        for uid, community, week1 in (('m1', 'Soweto', 'R 1,200'), ('m2', 'Soweto', '50.5'), ('m3', 'Tembisa', 'n/a')):
+            Users.objects.create(
+                uid=uid, name=uid, surname='M', overseer_uid='overseer-1', district_elder_name='Elder A',
+                community_name=community, week1=week1, week2='10', week3='', week4=None,
+            )
+
+    def test_record_mirrors_legacy_weeks(self):
+        record_weekly_contributions(['m1', 'm2', 'm3'], 2026, 3)
+        amounts = dict(WeeklyContribution.objects.filter(week=1).values_list('member_uid', 'amount'))
+        self.assertEqual(amounts, {'m1': Decimal('1200.00'), 'm2': Decimal('50.50'), 'm3': Decimal('0.00')})
+        self.assertEqual(WeeklyContribution.objects.count(), 12)
+
+    def test_save_ledger_upserts(self):
+        members = list(Users.objects.filter(uid='m1').values('uid', 'overseer_uid', 'district_elder_name', 'community_name', 'week1', 'week2', 'week3', 'week4'))
+        save_ledger(ledger_rows(members, 2026, 3))
+        members[0]['week1'] = '5'
+        save_ledger(ledger_rows(members, 2026, 3))
+        self.assertEqual(WeeklyContribution.objects.filter(member_uid='m1').count(), 4)
+        self.assertEqual(WeeklyContribution.objects.get(member_uid='m1', week=1).amount, Decimal('5.00'))
+
+    def test_totals_per_group(self):
+        record_weekly_contributions(['m1', 'm2', 'm3'], 2026, 3)
+        rows = {row['community_name']: row for row in contribution_totals(2026, 3)}
+        self.assertEqual((rows['Soweto']['week1'], rows['Soweto']['week2'], rows['Soweto']['total']),
+                         (Decimal('1250.50'), Decimal('20.00'), Decimal('1270.50')))
+        self.assertEqual(rows['Tembisa']['total'], Decimal('10.00'))
+
+        by_overseer = contribution_totals(2026, 3, group_by='overseer', community='soweto')
+        self.assertEqual([(r['overseer_uid'], r['total']) for r in by_overseer], [('overseer-1', Decimal('1270.50'))])
+        self.assertEqual(contribution_totals(2026, 4), [])
+
+    def test_totals_report_endpoint(self):
+        record_weekly_contributions(['m1', 'm2', 'm3'], 2026, 3)
+        user = type('FirebaseUser', (), {'is_authenticated': True})()
+
+        def get(params):
+            request = APIRequestFactory().get('/api/contribution_totals/', params)
+            force_authenticate(request, user=user)
+            return contribution_totals_report(request)
+
+        self.assertEqual(get({'year': 2026, 'month': 13}).status_code, 400)
+        self.assertEqual(get({'year': 2026, 'month': 3, 'group_by': 'street'}).status_code, 400)
+        response = get({'year': 2026, 'month': 3, 'group_by': 'district'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(r['district_elder_name'], r['total']) for r in response.data['data']], [('Elder A', Decimal('1280.50'))])
@@ -8,7 +8,7 @@ from .views import (
     CareerOpportunityViewSet, TactsoBranchViewSet,  
     StaffMemberViewSet, AuditLogViewSet, BranchCommitteeMemberViewSet,
     ApplicationRequestViewSet, UserUniversityApplicationViewSet,
-    recognize_face, send_legal_broadcast,ServeDecryptedImageView,
+    recognize_face, identify_face, send_legal_broadcast,ServeDecryptedImageView,
     CatalogViewSet, 
     SellerInventoryViewSet, 
     OrderViewSet,
@@ -54,6 +54,7 @@ router.register(r'event_contributions', EventContributionViewSet, basename='even
 urlpatterns = [ 
     path('', include(router.urls)), 
     path('verify_faces/', recognize_face, name='verify_faces'),  
+    path('identify_face/', identify_face, name='identify_face'),
     path('send-email/', send_legal_broadcast, name='send_email'),
     path('serve_image/', ServeDecryptedImageView.as_view(), name='serve_image'), 
     path('initialize-subscription/', initialize_subscription), 
@@ -64,7 +65,15 @@ urlpatterns = [
     path('paystack-webhook/', paystack_webhook),
     # Add this to your urlpatterns in urls.py
     path('monthly_attendance_report/', views.monthly_attendance_report, name='monthly_attendance_report'),
+    path('regional_attendance_report/', views.regional_attendance_report, name='regional_attendance_report'),
+    path('attendance_summary/', views.attendance_summary_report, name='attendance_summary'),
+    path('attendance/bulk/', views.bulk_attendance, name='bulk_attendance'),
+    path('contribution_totals/', views.contribution_totals_report, name='contribution_totals'),
     
     # Utilities
     path('send_custom_email/', send_custom_email), 
+    path('cache_stats/', views.cache_statistics, name='cache_stats'),
+
+    # Offline sync
+    path('changes_since/', views.sync_changes, name='changes_since'),
 ]
@@ -3,32 +3,30 @@ import datetime
 import os
 import json
 import threading 
-import tempfile
 from django.utils.timezone import now
-import urllib.request
 import hmac
 import hashlib
+import uuid
 import subprocess
 import shutil
 import requests
-import cv2
 import numpy as np
 from decimal import Decimal
 from email.message import EmailMessage
 import logging
-from calendar import monthrange
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 
 from django.core.exceptions import ImproperlyConfigured
 from celery import shared_task
 
 from cryptography.fernet import Fernet
-from sklearn.metrics.pairwise import cosine_similarity
-from insightface.app import FaceAnalysis
 
 from django.conf import settings
 from django.core.mail import send_mail, get_connection
-from django.http import HttpResponse, FileResponse
+from django.http import HttpResponse, HttpResponseNotModified, FileResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.decorators import api_view, action, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework import viewsets, filters, status
@@ -43,15 +41,29 @@ from firebase_admin import credentials, firestore, storage, auth as firebase_aut
 
 from django.core.mail import EmailMultiAlternatives
 
-from .mixins import CachedListMixin
-from django.db import transaction 
+from .mixins import CachedListMixin, ConditionalListMixin, SparseFieldsetMixin
+from .signals import invalidate_model
+from .caching import cache_stats
+from .tasks import enqueue
+from .spatial import community_index
+from .member_faces import screen_enrollment
+from .contributions import WEEK_FIELDS, TOTAL_GROUPS, archive_contributions, contribution_totals, record_weekly_contributions
+from .attendance import attendance_summary, bulk_record_attendance, record_attendance, stream_community_report, stream_regional_report
+from .sync import SYNC_MODELS, DEFAULT_LIMIT as SYNC_DEFAULT_LIMIT, MAX_LIMIT as SYNC_MAX_LIMIT, changes_since, current_token, token_expired
+from .face_index import face_index, SCOPE_STAFF, overseer_scope, branch_scope
+from . import face_engine
+from .face_engine import FACE_MODEL_NAME
+from .blob_cache import decrypted_blob_cache, blob_key
+from .chunked_crypto import ChunkedCipher, ContainerHeader, EncryptingReader, HEADER_LEN, is_chunked, sniff_content_type
+from django.db import transaction, connections
 
 from .models import (
-    AttendanceLog, IssueReport, Order, Songs, Product, Users, Overseer, District, Community, 
+    IssueReport, Order, Songs, Product, Users, Overseer, District, Community, 
     OverseerCommitteeMember, OverseerExpenseReport, UpcomingEvent, 
     CareerOpportunity, TactsoBranch, AdminStaffMember, AuditLog,
     TactsoCommitteeMember, ApplicationRequest, UserUniversityApplication, 
-    SellerListing, ContributionHistory, MonthlyReport,Visitor,EventContribution,EventDiary
+    SellerListing, ContributionHistory, MonthlyReport,Visitor,EventContribution,EventDiary,
+    FaceEmbedding
 )
  
 from .serializers import (
@@ -61,7 +73,8 @@ from .serializers import (
     UpcomingEventSerializer, CareerOpportunitySerializer, 
     TactsoBranchSerializer,AdminStaffMemberSerializer, AuditLogSerializer,
     TactsoCommitteeMemberSerializer, ApplicationRequestSerializer,EventContributionSerializer,EventDiarySerializer,
-    UserUniversityApplicationSerializer, SellerListingSerializer, ContributionHistorySerializer, MonthlyReportSerializer,VisitorSerializer
+    UserUniversityApplicationSerializer, SellerListingSerializer, ContributionHistorySerializer, MonthlyReportSerializer,VisitorSerializer,
+    NewDistrictSerializer, create_districts, with_overseer_fields
 )
 
 logger = logging.getLogger(__name__)
@@ -73,6 +86,7 @@ logger = logging.getLogger(__name__)
 if hasattr(settings, 'ENCRYPTION_KEY') and settings.ENCRYPTION_KEY:
     try:
         cipher_suite = Fernet(settings.ENCRYPTION_KEY)
+        chunked_cipher = ChunkedCipher.from_fernet_key(settings.ENCRYPTION_KEY)
     except Exception as e:
         logger.critical(f"Encryption Init Failed: {e}")
         raise ImproperlyConfigured(f"Invalid ENCRYPTION_KEY: {e}")
@@ -80,13 +94,15 @@ else:
     logger.critical("CRITICAL SECURITY WARNING: No ENCRYPTION_KEY found in settings.")
     raise ImproperlyConfigured("ENCRYPTION_KEY must be set in production to prevent complete data loss.")
 
-try:
-    GLOBAL_FACE_APP = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
-    GLOBAL_FACE_APP.prepare(ctx_id=0)
-    logger.info("✅ InsightFace model loaded.")
-except Exception as e:
-    GLOBAL_FACE_APP = None
-    logger.error(f"❌ Error loading InsightFace: {e}")
+FACE_MATCH_THRESHOLD = 0.50
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # resumable upload chunk, must be a multiple of 256 KB
+STREAM_READ_SIZE = 256 * 1024
+BULK_ATTENDANCE_MAX_ENTRIES = 5000
+NEARBY_DEFAULT_LIMIT = 10
+NEARBY_MAX_LIMIT = 100
+
+# Shared by every request: all files of one submission upload in parallel
+upload_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'UPLOAD_MAX_WORKERS', 8), thread_name_prefix='upload')
 
 if not firebase_admin._apps:
     firebase_config = os.environ.get('FIREBASE_SERVICE_ACCOUNT_JSON')
@@ -145,70 +161,170 @@ class IsFirebaseAuthenticated(BasePermission):
 # 2. HELPER FUNCTIONS (Security, AI, Email)
 # ==========================================
 
+_bucket = None
+_bucket_lock = threading.Lock()
+
+def get_bucket():
+    # One bucket handle (and storage client) per process instead of one per upload
+    global _bucket
+    if _bucket is None:
+        with _bucket_lock:
+            if _bucket is None: _bucket = storage.bucket()
+    return _bucket
+
+def upload_encrypted(file_obj, folder):
+    bucket = get_bucket()
+    filename = f"{folder}/{os.urandom(16).hex()}.enc"
+    blob = bucket.blob(filename)
+    blob.chunk_size = UPLOAD_CHUNK_SIZE
+
+    # Encrypt frame by frame while uploading, so the file is never held in memory
+    file_obj.seek(0)
+    size = getattr(file_obj, 'size', None)
+    blob.upload_from_file(
+        EncryptingReader(chunked_cipher, file_obj),
+        size=chunked_cipher.encrypted_size(size) if size is not None else None,
+        content_type='application/octet-stream',
+    )
+    blob.make_public()
+    if folder == 'secure_faces':
+        try:
+            file_obj.seek(0)
+            save_face_embedding(blob.public_url, face_engine.decode_image(file_obj.read()))
+        except Exception as e:
+            logger.error(f"Face Embedding Store Error: {e}")
+    return blob.public_url
+
 def encrypt_and_upload_to_firebase(file_obj, folder):
     if not cipher_suite: return None
     try:
-        file_data = file_obj.read()
-        encrypted_data = cipher_suite.encrypt(file_data)
-        bucket = storage.bucket()
-        filename = f"{folder}/{os.urandom(16).hex()}.enc"
-        blob = bucket.blob(filename)
-        blob.upload_from_string(encrypted_data, content_type='application/octet-stream')
-        blob.make_public()
-        return blob.public_url
+        return upload_encrypted(file_obj, folder)
     except Exception as e:
         logger.error(f"Encryption Upload Error: {e}")
         return None
 
-def decrypt_from_url_to_temp(url):
+class UploadFailed(Exception):
+    pass
+
+def _upload_task(file_obj, folder):
+    try:
+        return upload_encrypted(file_obj, folder)
+    finally:
+        # Pool threads must not keep their own DB connection open between requests
+        connections.close_all()
+
+def delete_uploaded(urls):
+    if not urls: return
+    bucket = get_bucket()
+    prefix = f"/{bucket.name}/"
+    names = [url.split(prefix, 1)[1] for url in urls if url and prefix in url]
+    if not names: return
+    FaceEmbedding.objects.filter(face_url__in=urls).delete()
+    for name, result in zip(names, upload_executor.map(lambda n: _safe_delete(bucket, n), names)):
+        if not result: logger.warning(f"⚠️ Could not remove orphaned upload {name}")
+
+def _safe_delete(bucket, name):
+    try:
+        bucket.blob(name).delete()
+        return True
+    except Exception:
+        return False
+
+def encrypt_and_upload_many(files):
+    """
+    Encrypts and uploads {key: (file_obj, folder)} concurrently and returns
+    {key: url}. All or nothing: if any upload fails, the ones that succeeded
+    are deleted again and UploadFailed is raised.
+    """
+    if not cipher_suite: raise UploadFailed("Encryption is not configured")
+    futures = {key: upload_executor.submit(_upload_task, file_obj, folder) for key, (file_obj, folder) in files.items()}
+    urls, failed = {}, []
+    for key, future in futures.items():
+        try:
+            urls[key] = future.result()
+        except Exception as e:
+            logger.error(f"Encryption Upload Error ({key}): {e}")
+            failed.append(key)
+    if failed:
+        delete_uploaded(list(urls.values()))
+        raise UploadFailed(f"Failed to encrypt {', '.join(failed)}")
+    return urls
+
+def decrypt_blob(data):
+    # Chunked containers start with MAGIC; anything else is a legacy Fernet token
+    if is_chunked(data): return chunked_cipher.decrypt(data)
+    return cipher_suite.decrypt(bytes(data))
+
+def decrypt_from_url(url):
     if not cipher_suite: return None
     try:
-        with requests.get(url, stream=True, timeout=120) as response:
-            response.raise_for_status()
-            encrypted_data = response.content
-        decrypted_data = cipher_suite.decrypt(encrypted_data)
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg")
-        temp_file.write(decrypted_data)
-        temp_file.close()
-        return temp_file.name
+        response = requests.get(url, timeout=120)
+        response.raise_for_status()
+        return decrypt_blob(response.content)
     except Exception as e:
         logger.error(f"Decryption Error: {e}")
         return None
 
-def perform_verification(live_path, ref_path, is_encrypted_ref):
-    if GLOBAL_FACE_APP is None: return {'matched': False, 'error': 'AI Engine Down'}
-    real_ref_path = ref_path
-    temp_files_to_clean = []
+def read_upload(uploaded_file):
+    data = bytearray()
+    for chunk in uploaded_file.chunks(): data += chunk
+    return data
+
+def fetch_reference_bytes(ref_url, is_encrypted_ref):
+    if is_encrypted_ref: return decrypt_from_url(ref_url)
+    if ref_url.startswith('http'):
+        response = requests.get(ref_url, timeout=60)
+        response.raise_for_status()
+        return response.content
+    with open(ref_url, 'rb') as f: return f.read()
+
+def extract_face_embedding(img):
+    if not face_engine.is_available() or img is None: return None
+    return face_engine.embed_image(img)
+
+def save_face_embedding(face_url, img):
+    emb = extract_face_embedding(img)
+    if emb is None:
+        logger.warning(f"No face detected, embedding not stored for: {face_url}")
+        return None
+    FaceEmbedding.objects.update_or_create(
+        face_url=face_url, defaults={'embedding': emb.tobytes(), 'model_name': FACE_MODEL_NAME}
+    )
+    return emb
+
+def reference_changed(ref_url, stored):
+    # Uploads get a fresh random name, so only a local file can change under the same path
+    if ref_url.startswith('http') or not os.path.exists(ref_url): return False
+    return os.path.getmtime(ref_url) > stored.updated_at.timestamp()
+
+def get_reference_embedding(ref_url, is_encrypted_ref):
+    """
+    Returns (embedding, error). Stored embeddings are used as-is; on a miss the
+    reference is fetched, embedded once and persisted for every later call.
+    """
+    stored = FaceEmbedding.objects.filter(face_url=ref_url, model_name=FACE_MODEL_NAME).first()
+    if stored and not reference_changed(ref_url, stored): return stored.vector, None
+
+    ref_data = fetch_reference_bytes(ref_url, is_encrypted_ref)
+    if not ref_data: return None, 'Decryption failed'
+    emb = save_face_embedding(ref_url, face_engine.decode_image(ref_data))
+    if emb is None: return None, 'Face not detected'
+    return emb, None
+
+def perform_verification(live_data, ref_path, is_encrypted_ref):
+    if not face_engine.is_available(): return {'matched': False, 'error': 'AI Engine Down'}
     try:
-        if is_encrypted_ref:
-            real_ref_path = decrypt_from_url_to_temp(ref_path)
-            if not real_ref_path: return {'matched': False, 'error': 'Decryption failed'}
-            temp_files_to_clean.append(real_ref_path)
-        elif ref_path.startswith('http'):
-            legacy_temp = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg").name
-            urllib.request.urlretrieve(ref_path, legacy_temp)
-            real_ref_path = legacy_temp
-            temp_files_to_clean.append(legacy_temp)
-
-        def get_embedding(path):
-            img = cv2.imread(path)
-            if img is None: return None
-            faces = GLOBAL_FACE_APP.get(img)
-            if not faces: return None
-            faces = sorted(faces, key=lambda x: (x.bbox[2]-x.bbox[0]) * (x.bbox[3]-x.bbox[1]), reverse=True)
-            return faces[0].embedding
-
-        emb_live = get_embedding(live_path)
-        emb_ref = get_embedding(real_ref_path)
-        if emb_live is None or emb_ref is None: return {'matched': False, 'error': 'Face not detected'}
+        emb_ref, error = get_reference_embedding(ref_path, is_encrypted_ref)
+        if error: return {'matched': False, 'error': error}
+
+        emb_live = extract_face_embedding(face_engine.decode_image(live_data))
+        if emb_live is None: return {'matched': False, 'error': 'Face not detected'}
         
-        sim = cosine_similarity(emb_live.reshape(1, -1), emb_ref.reshape(1, -1))[0][0]
-        return {'matched': sim > 0.50, 'score': float(sim)}
+        # Both embeddings are L2-normalized, so the dot product is the cosine similarity
+        sim = float(np.dot(emb_live, emb_ref))
+        return {'matched': sim > FACE_MATCH_THRESHOLD, 'score': sim}
     except Exception as e:
         return {'matched': False, 'error': str(e)}
-    finally:
-        for p in temp_files_to_clean:
-            if os.path.exists(p): os.remove(p)
 
 
 @api_view(['POST'])
@@ -219,16 +335,48 @@ def recognize_face(request):
     ref_url = request.data.get('reference_url')
     if not live_file or not ref_url: return Response({'error': 'Missing data'}, status=400)
 
-    temp_live = tempfile.NamedTemporaryFile(delete=False, suffix=".jpg").name
+    is_encrypted = ref_url.endswith('.enc') or '.enc?' in ref_url
+    result = perform_verification(read_upload(live_file), ref_url, is_encrypted)
+    if result.get('error'): return Response({'matched': False, 'message': result['error']})
+    return Response({'matched': result['matched'], 'distance': result.get('score', 0.0)})
+
+
+@api_view(['POST'])
+@authentication_classes([FirebaseAuthentication])
+@permission_classes([IsFirebaseAuthenticated])
+def identify_face(request):
+    """
+    1:N lookup: embeds the live image once and scores it against every enrolled
+    face in the scope ('staff', 'overseer' + overseer_id, 'branch' + branch_id).
+    """
+    live_file = request.FILES.get('live_image')
+    if not live_file: return Response({'error': 'Missing live_image'}, status=400)
+
+    scope = request.data.get('scope', 'staff')
     try:
-        with open(temp_live, 'wb+') as f:
-            for chunk in live_file.chunks(): f.write(chunk)
-        is_encrypted = ref_url.endswith('.enc') or '.enc?' in ref_url
-        result = perform_verification(temp_live, ref_url, is_encrypted)
-        if result.get('error'): return Response({'matched': False, 'message': result['error']})
-        return Response({'matched': result['matched'], 'distance': result.get('score', 0.0)})
-    finally:
-        if os.path.exists(temp_live): os.remove(temp_live)
+        if scope == 'staff':
+            scope_key = SCOPE_STAFF
+        elif scope == 'overseer':
+            scope_key = overseer_scope(uuid.UUID(str(request.data.get('overseer_id'))))
+        elif scope == 'branch':
+            scope_key = branch_scope(uuid.UUID(str(request.data.get('branch_id'))))
+        else:
+            return Response({'error': f"Unknown scope '{scope}'"}, status=400)
+    except ValueError:
+        return Response({'error': f"A valid id is required for scope '{scope}'"}, status=400)
+
+    try: top_k = max(1, min(int(request.data.get('top_k', 5)), 50))
+    except (TypeError, ValueError): top_k = 5
+
+    if not face_engine.is_available(): return Response({'matched': False, 'message': 'AI Engine Down'})
+    img = face_engine.decode_image(read_upload(live_file))
+    try: emb_live = extract_face_embedding(img)
+    except Exception as e: return Response({'matched': False, 'message': str(e), 'matches': []})
+    if emb_live is None: return Response({'matched': False, 'message': 'Face not detected', 'matches': []})
+
+    matches = face_index.search(scope_key, emb_live, top_k)
+    for m in matches: m['matched'] = m['score'] > FACE_MATCH_THRESHOLD
+    return Response({'matched': bool(matches and matches[0]['matched']), 'scope': scope, 'matches': matches})
 
 
 @shared_task
@@ -265,8 +413,33 @@ def send_legal_broadcast(request):
     inc_policy = request.data.get('include_policy', False)
     if not inc_terms and not inc_policy: return Response({'error': 'Select document type.'}, status=400)
     
-    process_bulk_email_task.delay(inc_terms, inc_policy)
+    enqueue(process_bulk_email_task, inc_terms, inc_policy)
     return Response({'message': 'Broadcast started via background worker.'})
+class RangeNotSatisfiable(Exception):
+    pass
+
+def parse_byte_range(range_header, size):
+    """
+    Parses a single `bytes=start-end` Range header into an inclusive (start, end).
+    Returns None when there is no usable range (the full body is served instead).
+    """
+    if not range_header or not range_header.startswith('bytes=') or ',' in range_header: return None
+    start, _, end = range_header[len('bytes='):].strip().partition('-')
+    try:
+        if start:
+            start, end = int(start), min(int(end), size - 1) if end else size - 1
+        else:
+            start, end = max(0, size - int(end)), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end: raise RangeNotSatisfiable()
+    return start, end
+
+def decrypted_blob_etag(url):
+    # Encrypted blobs get a random name on upload and are never rewritten,
+    # so the URL alone identifies the content.
+    return quote_etag(blob_key(url))
+
 class ServeDecryptedImageView(APIView):
     authentication_classes = []
     permission_classes = []
@@ -275,35 +448,137 @@ class ServeDecryptedImageView(APIView):
         encrypted_url = request.query_params.get('url')
         if not encrypted_url: 
             return HttpResponse("Missing URL", status=400)
+        # Validators go on successful responses only (see finish), never on errors
+        self.etag = decrypted_blob_etag(encrypted_url)
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        # "*" only matches a representation that exists, so it needs a look at storage first
+        if self.etag in parse_etags(if_none_match) or (if_none_match.strip() == '*' and self.blob_exists(encrypted_url)):
+            not_modified = HttpResponseNotModified()
+            not_modified['ETag'] = self.etag
+            return not_modified
+        range_header = request.META.get('HTTP_RANGE')
             
         try:
-            response = requests.get(encrypted_url)
-            if response.status_code != 200: 
-                return HttpResponse("Failed to fetch image", status=404)
-                
-            # Decrypt the raw bytes
-            decrypted_data = cipher_suite.decrypt(response.content)
-            
-            # Dynamically determine content type using file "magic bytes"
-            content_type = "application/octet-stream" # Fallback
-            
-            if decrypted_data.startswith(b'%PDF'):
-                content_type = "application/pdf"
-            elif decrypted_data.startswith(b'\xff\xd8\xff'):
-                content_type = "image/jpeg"
-            elif decrypted_data.startswith(b'\x89PNG\r\n\x1a\n'):
-                content_type = "image/png"
-            
-            # Send response and force the browser to display it inline
-            http_response = HttpResponse(decrypted_data, content_type=content_type)
-            http_response['Content-Disposition'] = 'inline'
-            
-            return http_response
-            
+            cached = decrypted_blob_cache.get(encrypted_url)
+            if cached is not None:
+                return self.bytes_response(*cached, range_header)
+
+            if range_header:
+                response = self.ranged_response(encrypted_url, range_header)
+                if response is not None: return response
+
+            return self.full_response(encrypted_url, range_header)
+
+        except RangeNotSatisfiable:
+            return HttpResponse("Requested range not satisfiable", status=416)
         except Exception as e:
             logger.error(f"Error serving decrypted file: {e}")
             return HttpResponse(f"Error: {e}", status=500)
 
+    def blob_exists(self, encrypted_url):
+        if decrypted_blob_cache.get(encrypted_url) is not None: return True
+        # A one-byte GET rather than HEAD: signed storage URLs are usually only valid for GET
+        try:
+            probe = requests.get(encrypted_url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=30)
+        except requests.RequestException:
+            return False
+        probe.close()
+        return probe.status_code in (200, 206)
+
+    def finish(self, http_response):
+        # Force the browser to display it inline
+        http_response['Content-Disposition'] = 'inline'
+        # Keep the copy but revalidate it, so a deleted blob stops being served
+        http_response['Cache-Control'] = 'private, no-cache'
+        http_response['Accept-Ranges'] = 'bytes'
+        http_response['ETag'] = self.etag
+        return http_response
+
+    def bytes_response(self, content_type, decrypted_data, range_header=None):
+        byte_range = parse_byte_range(range_header, len(decrypted_data))
+        if byte_range is None:
+            return self.finish(HttpResponse(decrypted_data, content_type=content_type))
+        start, end = byte_range
+        http_response = HttpResponse(decrypted_data[start:end + 1], content_type=content_type, status=206)
+        http_response['Content-Range'] = f"bytes {start}-{end}/{len(decrypted_data)}"
+        return self.finish(http_response)
+
+    def full_response(self, encrypted_url, range_header):
+        upstream = requests.get(encrypted_url, stream=True, timeout=30)
+        if upstream.status_code != 200:
+            upstream.close()
+            return HttpResponse("Failed to fetch image", status=404)
+
+        chunks = upstream.iter_content(STREAM_READ_SIZE)
+        head = bytearray()
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= HEADER_LEN: break
+
+        total = upstream.headers.get('Content-Length')
+        if not is_chunked(head) or total is None or int(total) <= decrypted_blob_cache.max_item_bytes:
+            # Legacy Fernet tokens can only be authenticated as a whole; small
+            # chunked blobs are decrypted in one go so they can be cached.
+            for chunk in chunks: head += chunk
+            upstream.close()
+            decrypted_data = decrypt_blob(head)
+            cached = (sniff_content_type(decrypted_data), decrypted_data)
+            decrypted_blob_cache.set(encrypted_url, *cached)
+            return self.bytes_response(*cached, range_header)
+
+        total = int(total)
+        header = ContainerHeader.parse(head)
+
+        def frames():
+            try:
+                yield from chunked_cipher.decrypt_frames(header, itertools.chain([bytes(head[HEADER_LEN:])], chunks), total)
+            finally:
+                upstream.close()
+
+        http_response = StreamingHttpResponse(frames(), content_type=header.content_type)
+        http_response['Content-Length'] = header.plaintext_size(total)
+        return self.finish(http_response)
+
+    def ranged_response(self, encrypted_url, range_header):
+        """
+        Serves a Range request on a chunked blob by fetching only the header and
+        the frames that cover the range. Returns None for legacy Fernet blobs
+        (or storage that ignores Range), which fall back to a full download.
+        """
+        probe = requests.get(encrypted_url, headers={'Range': f"bytes=0-{HEADER_LEN - 1}"}, stream=True, timeout=30)
+        head = next(probe.iter_content(HEADER_LEN), b'') if probe.status_code == 206 else b''
+        probe.close()
+        content_range = probe.headers.get('Content-Range', '')
+        if not is_chunked(head) or '/' not in content_range: return None
+
+        header = ContainerHeader.parse(head)
+        total = int(content_range.rpartition('/')[2])
+        size = header.plaintext_size(total)
+        byte_range = parse_byte_range(range_header, size)
+        if byte_range is None: return None
+
+        start, end = byte_range
+        first, last, ct_start, ct_end = ChunkedCipher.frame_range(header, total, start, end)
+        upstream = requests.get(encrypted_url, headers={'Range': f"bytes={ct_start}-{ct_end}"}, stream=True, timeout=30)
+        if upstream.status_code != 206:
+            upstream.close()
+            return None
+
+        def frames():
+            skip, remaining = start - first * header.frame_size, end - start + 1
+            try:
+                for plaintext in chunked_cipher.decrypt_frames(header, upstream.iter_content(STREAM_READ_SIZE), total, first, last):
+                    piece = plaintext[skip:skip + remaining]
+                    skip, remaining = 0, remaining - len(piece)
+                    yield piece
+            finally:
+                upstream.close()
+
+        http_response = StreamingHttpResponse(frames(), content_type=header.content_type, status=206)
+        http_response['Content-Length'] = end - start + 1
+        http_response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        return self.finish(http_response)
+
 @api_view(['POST'])
 @authentication_classes([FirebaseAuthentication])
 @permission_classes([IsFirebaseAuthenticated])
@@ -446,6 +721,7 @@ def paystack_webhook(request):
                     amount=paid_zar,
                     remarks="Successfully Paid via Paystack"
                 )
+                invalidate_model(EventContribution)
                 
                 if updated_count > 0:
                     logger.info(f"✅ Event Contribution Verified: Overseer {overseer_id} paid R{paid_zar} for Event {event_id}")
@@ -539,6 +815,7 @@ def paystack_webhook(request):
                     subscription_status='payment_failed',
                     last_attempted=datetime.datetime.now()
                 )
+                invalidate_model(Overseer)
                 logger.info(f"⚠️ Initial charge failed for overseer {overseer_uid}.")
             except Exception as e:
                 logger.error(f"❌ Error handling failure for {overseer_uid}: {e}")
@@ -674,6 +951,43 @@ def create_payment_link(request):
         logger.error(f"Payment Link Error: {e}")
         return Response({'error': 'Server error'}, status=500)
     
+@api_view(['GET'])
+@authentication_classes([FirebaseAuthentication])
+@permission_classes([IsFirebaseAuthenticated])
+def sync_changes(request):
+    """
+    Delta sync: ?since=<token>&models=users,visitors&community_name=...&limit=500
+    Without `since` (or with one older than the kept change log) the client gets the
+    current token and must do one full fetch first.
+    """
+    requested = request.query_params.get('models')
+    labels = [m.strip() for m in requested.split(',') if m.strip()] if requested else list(SYNC_MODELS)
+    unknown = [label for label in labels if label not in SYNC_MODELS]
+    if unknown: return Response({'error': f"Unknown models: {', '.join(unknown)}", 'available': list(SYNC_MODELS)}, status=400)
+
+    since = request.query_params.get('since')
+    try:
+        since = int(since) if since else None
+        limit = min(int(request.query_params.get('limit', SYNC_DEFAULT_LIMIT)), SYNC_MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'since and limit must be integers'}, status=400)
+    if since is None or token_expired(since):
+        return Response({'changes': {}, 'next': current_token(), 'has_more': False, 'full_sync_required': True})
+
+    return Response(changes_since(
+        since, labels, limit=max(limit, 1),
+        community_name=request.query_params.get('community_name'),
+        context={'request': request},
+    ))
+
+@api_view(['GET'])
+@authentication_classes([FirebaseAuthentication])
+@permission_classes([IsFirebaseAuthenticated])
+def cache_statistics(request):
+    # Per-process counters of the list cache (hits, stale hits, misses, coalesced waits, fill times)
+    if request.query_params.get('reset') == 'true': cache_stats.reset()
+    return Response({'pid': os.getpid(), 'backend': settings.CACHES['default']['BACKEND'], 'keys': cache_stats.snapshot()})
+
 @api_view(['POST']) 
 def send_custom_email(request):
     to = request.data.get('to')
@@ -705,7 +1019,7 @@ def send_custom_email(request):
 # 4. MODEL VIEWSETS
 # ===========================================================================================================
 
-class OverseerViewSet(CachedListMixin, viewsets.ModelViewSet):
+class OverseerViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     def get_permissions(self):
         if self.request.method == 'GET':
             return [AllowAny()]
@@ -742,45 +1056,51 @@ class OverseerViewSet(CachedListMixin, viewsets.ModelViewSet):
             except Exception as e:
                 return Response({"error": f"Invalid districts JSON format: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
  
+        # The whole nested payload is validated before any upload or insert
+        districts_serializer = NewDistrictSerializer(data=districts_data, many=True)
+        if not districts_serializer.is_valid():
+            return Response({"districts": districts_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
         data['districts'] = [] 
+        files = {}
         sec_file = request.FILES.get('secretary_face_image')
-        if sec_file:
-            data['secretary_face_url'] = encrypt_and_upload_to_firebase(sec_file, 'secure_faces')
-        
+        if sec_file: files['secretary_face_url'] = (sec_file, 'secure_faces')
         chair_file = request.FILES.get('chairperson_face_image')
-        if chair_file:
-            data['chairperson_face_url'] = encrypt_and_upload_to_firebase(chair_file, 'secure_faces') 
+        if chair_file: files['chairperson_face_url'] = (chair_file, 'secure_faces')
+        try:
+            uploaded = encrypt_and_upload_many(files)
+        except UploadFailed as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        data.update(uploaded)
             
         serializer = self.get_serializer(data=data)
         if not serializer.is_valid():
+            delete_uploaded(list(uploaded.values()))
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
-        self.perform_create(serializer)
-        overseer = serializer.instance
- 
-        if data.get('secretary_name') and data.get('secretary_face_url'):
-            OverseerCommitteeMember.objects.create(
-                overseer=overseer, full_name=data['secretary_name'], portfolio='Secretary', face_url=data['secretary_face_url']
-            )
-        if data.get('chairperson_name') and data.get('chairperson_face_url'):
-            OverseerCommitteeMember.objects.create(
-                overseer=overseer, full_name=data['chairperson_name'], portfolio='Chairperson', face_url=data['chairperson_face_url']
-            )
-
-        for d_data in districts_data:
-            district = District.objects.create(
-                overseer=overseer,
-                district_elder_name=d_data.get('district_elder_name', 'Unknown')
-            )
-            for c_data in d_data.get('communities', []):
-                Community.objects.create(
-                    district=district,
-                    community_name=c_data.get('community_name', 'Unknown')
-                )
-
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class StaffMemberViewSet(CachedListMixin, viewsets.ModelViewSet):
+        try:
+            with transaction.atomic():
+                self.perform_create(serializer)
+                overseer = serializer.instance
+
+                if data.get('secretary_name') and data.get('secretary_face_url'):
+                    OverseerCommitteeMember.objects.create(
+                        overseer=overseer, full_name=data['secretary_name'], portfolio='Secretary', face_url=data['secretary_face_url']
+                    )
+                if data.get('chairperson_name') and data.get('chairperson_face_url'):
+                    OverseerCommitteeMember.objects.create(
+                        overseer=overseer, full_name=data['chairperson_name'], portfolio='Chairperson', face_url=data['chairperson_face_url']
+                    )
+
+                create_districts(overseer, districts_serializer.validated_data)
+        except Exception:
+            delete_uploaded(list(uploaded.values()))
+            raise
+
+        overseer = Overseer.objects.prefetch_related('districts__communities').get(pk=overseer.pk)
+        return Response(self.get_serializer(overseer).data, status=status.HTTP_201_CREATED)
+
+class StaffMemberViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = AdminStaffMember.objects.all() 
@@ -804,7 +1124,7 @@ class StaffMemberViewSet(CachedListMixin, viewsets.ModelViewSet):
         if not staff: return Response({"error": "Not found"}, status=404)
         return Response(self.get_serializer(staff).data)
 
-class UsersViewSet(viewsets.ModelViewSet):
+class UsersViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Users.objects.all()
     serializer_class = UsersSerializer
     lookup_field = 'uid'
@@ -820,7 +1140,7 @@ class UsersViewSet(viewsets.ModelViewSet):
         return [FirebaseAuthentication()]
 
     def get_queryset(self):
-        queryset = Users.objects.all()
+        queryset = with_overseer_fields(Users.objects.all())
         uid = self.request.query_params.get('uid')
         if uid: queryset = queryset.filter(uid=uid)
         email = self.request.query_params.get('email')
@@ -841,22 +1161,35 @@ class UsersViewSet(viewsets.ModelViewSet):
         user_instance, created = Users.objects.get_or_create(uid=uid)
         serializer = self.get_serializer(user_instance, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                self.mirror_weekly_contributions(request, uid)
             return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def update(self, request, *args, **kwargs):
         kwargs['partial'] = True
         attendance_status = request.data.get('attendance_status')
-        if attendance_status:
-            instance = self.get_object()
-            is_present = (attendance_status == 'Present')
-            if is_present: instance.last_attended_date = now().date()
-            AttendanceLog.objects.update_or_create(
-                member_uid=instance.uid, date=now().date(),
-                defaults={'community_name': instance.community_name, 'is_visitor': False, 'is_present': is_present}
-            )
-        return super().update(request, *args, **kwargs)
+        with transaction.atomic():
+            if attendance_status:
+                instance = self.get_object()
+                is_present = (attendance_status == 'Present')
+                if is_present: instance.last_attended_date = now().date()
+                record_attendance(instance.uid, instance.community_name, False, is_present, now().date())
+            response = super().update(request, *args, **kwargs)
+            if response.status_code == 200: self.mirror_weekly_contributions(request, response.data.get('uid'))
+            return response
+
+    def mirror_weekly_contributions(self, request, uid):
+        # Compatibility shim: clients still write week1..week4 strings; keep the typed ledger in step.
+        # The month defaults to the current one; contribution_year/contribution_month override it.
+        if not uid or not any(field in request.data for field in WEEK_FIELDS): return
+        try:
+            year = int(request.data.get('contribution_year') or now().year)
+            month = int(request.data.get('contribution_month') or now().month)
+        except (TypeError, ValueError):
+            year, month = now().year, now().month
+        record_weekly_contributions([uid], year, month)
 
     @action(detail=True, methods=['post'])
     def submit_verification(self, request, uid=None):
@@ -870,18 +1203,27 @@ class UsersViewSet(viewsets.ModelViewSet):
             return Response({"error": "Missing signature, id_document, or face_image files."}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            sig_url = encrypt_and_upload_to_firebase(signature_file, 'secure_signatures')
-            id_url = encrypt_and_upload_to_firebase(id_file, 'secure_ids')
-            face_url = encrypt_and_upload_to_firebase(face_file, 'secure_faces')
-            
-            if not all([sig_url, id_url, face_url]):
+            try:
+                uploaded = encrypt_and_upload_many({
+                    'signature': (signature_file, 'secure_signatures'),
+                    'id_document': (id_file, 'secure_ids'),
+                    'face_image': (face_file, 'secure_faces'),
+                })
+            except UploadFailed:
                 return Response({"error": "Failed to encrypt and securely store files."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            sig_url, id_url, face_url = uploaded['signature'], uploaded['id_document'], uploaded['face_image']
                 
             user.contract_signature_url = sig_url
             user.id_document_url = id_url
             user.face_image_url = face_url
             user.verification_status = "Pending Live Check"
             user.save()
+
+            try:
+                screen_enrollment(user.uid, face_url)
+            except Exception as e:
+                # Screening never blocks an enrollment; the rebuild command picks the face up later
+                logger.error(f"Duplicate face screening failed for {user.uid}: {e}")
             
             return Response({
                 "message": "Files encrypted and securely stored.",
@@ -892,7 +1234,7 @@ class UsersViewSet(viewsets.ModelViewSet):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class VisitorViewSet(viewsets.ModelViewSet):
+class VisitorViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = Visitor.objects.all()
@@ -909,71 +1251,113 @@ class VisitorViewSet(viewsets.ModelViewSet):
     def update(self, request, *args, **kwargs):
         kwargs['partial'] = True
         attendance_status = request.data.get('attendance_status')
-        if attendance_status:
-            instance = self.get_object()
-            is_present = (attendance_status == 'Present')
-            if is_present: instance.last_attended_date = now().date()
-            AttendanceLog.objects.update_or_create(
-                member_uid=str(instance.id), date=now().date(),
-                defaults={'community_name': instance.community_name, 'is_visitor': True, 'is_present': is_present}
-            )
-        return super().update(request, *args, **kwargs)
+        with transaction.atomic():
+            if attendance_status:
+                instance = self.get_object()
+                is_present = (attendance_status == 'Present')
+                if is_present: instance.last_attended_date = now().date()
+                record_attendance(str(instance.id), instance.community_name, True, is_present, now().date())
+            return super().update(request, *args, **kwargs)
 
 @api_view(['GET'])
 @authentication_classes([FirebaseAuthentication])
 @permission_classes([IsFirebaseAuthenticated])
-def monthly_attendance_report(request):
+def attendance_summary_report(request):
+    """Monthly / yearly totals per community from the rollup table: ?year=&[month=]&(community_name= | overseer_uid=)"""
     community = request.query_params.get('community_name')
-    month = int(request.query_params.get('month'))
-    year = int(request.query_params.get('year'))
-
-    if not community or not month or not year:
-        return Response({'error': 'Missing parameters'}, status=400)
+    overseer_uid = request.query_params.get('overseer_uid')
+    try:
+        year = int(request.query_params.get('year', ''))
+        month = int(request.query_params['month']) if request.query_params.get('month') else None
+    except ValueError:
+        return Response({'error': 'year and month must be integers'}, status=400)
+    if not community and not overseer_uid:
+        return Response({'error': 'community_name or overseer_uid is required'}, status=400)
 
-    _, num_days = monthrange(year, month)
+    return Response({'year': year, 'month': month, 'data': attendance_summary(year, community, overseer_uid, month)})
 
-    logs = AttendanceLog.objects.filter(
-        community_name__iexact=community.strip(),
-        date__year=year,
-        date__month=month
-    )
-    
-    log_dict = {}
-    for log in logs:
-        if log.member_uid not in log_dict:
-            log_dict[log.member_uid] = {}
-        log_dict[log.member_uid][log.date.day] = log.is_present
-
-    users = Users.objects.filter(community_name__iexact=community.strip())
-    visitors = Visitor.objects.filter(community_name__iexact=community.strip())
-
-    report_data = []
-
-    def process_member(member, is_visitor):
-        uid_key = str(member.id) if is_visitor else member.uid
-        attendance = log_dict.get(uid_key, {})
-        total_present = sum(1 for status in attendance.values() if status)
-        total_absent = num_days - total_present 
-        percentage = (total_present / num_days) * 100 if num_days > 0 else 0
-        visitor_cat = getattr(member, 'visitor_category', 'Registered') if is_visitor else 'Registered'
-        visitor_role = getattr(member, 'visitor_role', '') if is_visitor else ''
-
-        report_data.append({
-            'ui_id': uid_key, 'name': member.name, 'surname': member.surname,
-            'gender': member.gender, 'is_visitor': is_visitor, 'visitor_category': visitor_cat,
-            'visitor_role': visitor_role, 'attendance': attendance, 'total_present': total_present,
-            'total_absent': total_absent, 'percentage': round(percentage, 1)
-        })
-
-    for u in users: process_member(u, False)
-    for v in visitors: process_member(v, True)
+@api_view(['POST'])
+@authentication_classes([FirebaseAuthentication])
+@permission_classes([IsFirebaseAuthenticated])
+def bulk_attendance(request):
+    """
+    Marks a whole service in one call:
+    {"community_name": "...", "date": "YYYY-MM-DD" (default today), "entries": [{"member_uid", "is_visitor", "present"}]}
+    """
+    community = (request.data.get('community_name') or '').strip()
+    entries = request.data.get('entries')
+    if not community or not isinstance(entries, list) or not entries:
+        return Response({'error': 'community_name and a non-empty entries list are required'}, status=400)
+    if len(entries) > BULK_ATTENDANCE_MAX_ENTRIES:
+        return Response({'error': f'At most {BULK_ATTENDANCE_MAX_ENTRIES} entries per request'}, status=400)
+    try:
+        date = datetime.date.fromisoformat(request.data['date']) if request.data.get('date') else now().date()
+    except (TypeError, ValueError):
+        return Response({'error': 'date must be YYYY-MM-DD'}, status=400)
 
+    results = bulk_record_attendance(community, date, entries)
     return Response({
-        'community_name': community, 'month': month, 'year': year,
-        'num_days': num_days, 'data': report_data
+        'community_name': community, 'date': date.isoformat(),
+        'saved': sum(1 for r in results if r['status'] == 'saved'), 'results': results,
     })
 
-class TactsoBranchViewSet(viewsets.ModelViewSet):
+def parse_report_period(request):
+    try:
+        month, year = int(request.query_params.get('month', '')), int(request.query_params.get('year', ''))
+    except ValueError:
+        return None
+    return (year, month) if 1 <= month <= 12 and year > 0 else None
+
+@api_view(['GET'])
+@authentication_classes([FirebaseAuthentication])
+@permission_classes([IsFirebaseAuthenticated])
+def contribution_totals_report(request):
+    """Weekly contribution totals from the ledger: ?year=&month=&group_by=community|district|overseer&[overseer_uid=&district_elder_name=&community_name=]"""
+    period = parse_report_period(request)
+    group_by = request.query_params.get('group_by', 'community')
+    if not period or group_by not in TOTAL_GROUPS:
+        return Response({'error': f"year, month and group_by ({', '.join(TOTAL_GROUPS)}) are required"}, status=400)
+    year, month = period
+
+    rows = contribution_totals(
+        year, month, group_by=group_by,
+        overseer_uid=request.query_params.get('overseer_uid'),
+        district_elder=request.query_params.get('district_elder_name'),
+        community=request.query_params.get('community_name'),
+    )
+    return Response({'year': year, 'month': month, 'group_by': group_by, 'data': rows})
+
+@api_view(['GET'])
+@authentication_classes([FirebaseAuthentication])
+@permission_classes([IsFirebaseAuthenticated])
+def monthly_attendance_report(request):
+    community = request.query_params.get('community_name')
+    period = parse_report_period(request)
+    if not community or not community.strip() or not period:
+        return Response({'error': 'Missing parameters'}, status=400)
+    year, month = period
+
+    # Present counts and day bitmaps are aggregated in the database and streamed row by row
+    return StreamingHttpResponse(stream_community_report(community.strip(), year, month), content_type='application/json')
+
+@api_view(['GET'])
+@authentication_classes([FirebaseAuthentication])
+@permission_classes([IsFirebaseAuthenticated])
+def regional_attendance_report(request):
+    """Every community of an overseer (optionally one district) in a single call."""
+    overseer_uid = request.query_params.get('overseer_uid')
+    district_elder_name = request.query_params.get('district_elder_name')
+    period = parse_report_period(request)
+    if not overseer_uid or not period:
+        return Response({'error': 'Missing parameters'}, status=400)
+    year, month = period
+
+    return StreamingHttpResponse(
+        stream_regional_report(year, month, overseer_uid.strip(), district_elder_name.strip() if district_elder_name else None),
+        content_type='application/json'
+    )
+
+class TactsoBranchViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = TactsoBranch.objects.all()
@@ -988,29 +1372,29 @@ class TactsoBranchViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         data = request.data.dict()
         if 'image_url' not in data: data['image_url'] = ""
-        auth_faces = []
         
         officer_file = request.FILES.get('education_officer_face_image')
-        if officer_file:
-            url = encrypt_and_upload_to_firebase(officer_file, 'secure_faces')
-            if url:
-                data['education_officer_face_url'] = url
-                auth_faces.append(url)
-            else: return Response({"error": "Failed to encrypt Officer face"}, status=500)
-        else: return Response({"error": "Education Officer face is required"}, status=400)
-
+        if not officer_file: return Response({"error": "Education Officer face is required"}, status=400)
         chair_file = request.FILES.get('chairperson_face_image')
-        chair_url = None
-        if chair_file:
-            chair_url = encrypt_and_upload_to_firebase(chair_file, 'secure_faces')
-            if chair_url: auth_faces.append(chair_url)
-            else: return Response({"error": "Failed to encrypt Chairperson face"}, status=500)
-        else: return Response({"error": "Chairperson face is required"}, status=400)
+        if not chair_file: return Response({"error": "Chairperson face is required"}, status=400)
+
+        try:
+            uploaded = encrypt_and_upload_many({
+                'Officer face': (officer_file, 'secure_faces'),
+                'Chairperson face': (chair_file, 'secure_faces'),
+            })
+        except UploadFailed as e:
+            return Response({"error": str(e)}, status=500)
+        data['education_officer_face_url'] = uploaded['Officer face']
+        chair_url = uploaded['Chairperson face']
+        auth_faces = [data['education_officer_face_url'], chair_url]
 
         data['authorized_user_face_urls'] = json.dumps(auth_faces)
         
         serializer = self.get_serializer(data=data)
-        if not serializer.is_valid(): return Response(serializer.errors, status=400)
+        if not serializer.is_valid():
+            delete_uploaded(auth_faces)
+            return Response(serializer.errors, status=400)
         
         self.perform_create(serializer)
         branch = serializer.instance
@@ -1026,7 +1410,7 @@ class TactsoBranchViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.data, status=201)  
 
-class CommunityViewSet(CachedListMixin, viewsets.ModelViewSet):
+class CommunityViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     queryset = Community.objects.all()
     serializer_class = CommunitySerializer
     
@@ -1044,7 +1428,31 @@ class CommunityViewSet(CachedListMixin, viewsets.ModelViewSet):
         if province: queryset = queryset.filter(district__overseer__province__iexact=province)
         return queryset
 
-class DistrictViewSet(CachedListMixin, viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """The `limit` closest communities to ?lat=&lng= (optionally within ?radius= km), with distance_km."""
+        params = request.query_params
+        try:
+            lat, lng = float(params['lat']), float(params['lng'])
+            radius = float(params['radius']) if params.get('radius') else None
+            limit = max(1, min(int(params.get('limit', NEARBY_DEFAULT_LIMIT)), NEARBY_MAX_LIMIT))
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'lat and lng are required numbers; radius (km) and limit are optional'}, status=400)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or (radius is not None and radius <= 0):
+            return Response({'error': 'Coordinates or radius out of range'}, status=400)
+
+        matches = community_index.nearest(lat, lng, limit=limit, radius_km=radius)
+        communities = Community.objects.in_bulk([community_id for community_id, _ in matches])
+        results = []
+        for community_id, distance in matches:
+            # Deleted since the index was built
+            if community_id not in communities: continue
+            row = self.get_serializer(communities[community_id]).data
+            row['distance_km'] = distance
+            results.append(row)
+        return Response(results)
+
+class DistrictViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     queryset = District.objects.all()
     serializer_class = DistrictSerializer
 
@@ -1067,13 +1475,13 @@ class DistrictViewSet(CachedListMixin, viewsets.ModelViewSet):
             except ValueError: pass
         return queryset
 
-class SongViewSet(CachedListMixin, viewsets.ModelViewSet):
+class SongViewSet(SparseFieldsetMixin, ConditionalListMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = Songs.objects.all()
     serializer_class = SongSerializer
 
-class CatalogViewSet(viewsets.ModelViewSet):
+class CatalogViewSet(SparseFieldsetMixin, ConditionalListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = Product.objects.all()
@@ -1081,7 +1489,7 @@ class CatalogViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'category']
 
-class SellerInventoryViewSet(viewsets.ModelViewSet):
+class SellerInventoryViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     serializer_class = SellerListingSerializer
@@ -1094,7 +1502,7 @@ class SellerInventoryViewSet(viewsets.ModelViewSet):
         
     def perform_create(self, serializer): serializer.save()
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     serializer_class = OrderSerializer 
@@ -1140,7 +1548,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             logger.error(f"Verification Error: {e}")
             return Response(self.get_serializer(order).data)
 
-class OverseerCommitteeMemberViewSet(CachedListMixin, viewsets.ModelViewSet):
+class OverseerCommitteeMemberViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = OverseerCommitteeMember.objects.all()
@@ -1176,7 +1584,7 @@ class OverseerCommitteeMemberViewSet(CachedListMixin, viewsets.ModelViewSet):
         if face_url: queryset = queryset.filter(face_url=face_url)
         return queryset
 
-class OverseerExpenseReportViewSet(CachedListMixin, viewsets.ModelViewSet):
+class OverseerExpenseReportViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = OverseerExpenseReport.objects.all()
@@ -1195,19 +1603,19 @@ class OverseerExpenseReportViewSet(CachedListMixin, viewsets.ModelViewSet):
             except: pass
         return queryset   
      
-class UpcomingEventViewSet(CachedListMixin, viewsets.ModelViewSet):
+class UpcomingEventViewSet(SparseFieldsetMixin, ConditionalListMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = UpcomingEvent.objects.all()
     serializer_class = UpcomingEventSerializer
 
-class CareerOpportunityViewSet(CachedListMixin, viewsets.ModelViewSet):
+class CareerOpportunityViewSet(SparseFieldsetMixin, ConditionalListMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = CareerOpportunity.objects.all()
     serializer_class = CareerOpportunitySerializer
 
-class BranchCommitteeMemberViewSet(CachedListMixin, viewsets.ModelViewSet):
+class BranchCommitteeMemberViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = TactsoCommitteeMember.objects.all()
@@ -1220,7 +1628,7 @@ class BranchCommitteeMemberViewSet(CachedListMixin, viewsets.ModelViewSet):
             if current_count >= 5: return Response({"error": "Maximum limit of 5 committee members reached."}, status=status.HTTP_400_BAD_REQUEST)
         return super().create(request, *args, **kwargs)
 
-class ApplicationRequestViewSet(CachedListMixin, viewsets.ModelViewSet):
+class ApplicationRequestViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = ApplicationRequest.objects.all()
@@ -1236,18 +1644,13 @@ class ApplicationRequestViewSet(CachedListMixin, viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
         data = request.data.dict()
-        def encrypt_field(field_name):
-            file_obj = request.FILES.get(field_name)
-            if file_obj:
-                secure_url = encrypt_and_upload_to_firebase(file_obj, 'secure_applications')
-                if secure_url: data[field_name] = secure_url
-                else: raise Exception(f"Failed to encrypt {field_name}")
+        document_fields = ['id_passport_url', 'school_results_url', 'proof_of_registration_url', 'other_qualifications_url']
+        files = {field: (request.FILES[field], 'secure_applications') for field in document_fields if request.FILES.get(field)}
+        uploaded = {}
 
         try:
-            encrypt_field('id_passport_url')
-            encrypt_field('school_results_url')
-            encrypt_field('proof_of_registration_url')
-            encrypt_field('other_qualifications_url')
+            uploaded = encrypt_and_upload_many(files)
+            data.update(uploaded)
 
             serializer = self.get_serializer(data=data)
             serializer.is_valid(raise_exception=True)
@@ -1256,15 +1659,16 @@ class ApplicationRequestViewSet(CachedListMixin, viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
         except Exception as e:
+            delete_uploaded(list(uploaded.values()))
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class UserUniversityApplicationViewSet(CachedListMixin, viewsets.ModelViewSet):
+class UserUniversityApplicationViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = UserUniversityApplication.objects.all()
     serializer_class = UserUniversityApplicationSerializer
  
-class AuditLogViewSet(viewsets.ModelViewSet): 
+class AuditLogViewSet(SparseFieldsetMixin, viewsets.ModelViewSet): 
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = AuditLog.objects.all()
@@ -1279,7 +1683,7 @@ class AuditLogViewSet(viewsets.ModelViewSet):
         if timestamp: queryset = queryset.filter(timestamp=timestamp)
         return queryset
     
-class ContributionHistoryViewSet(viewsets.ModelViewSet):
+class ContributionHistoryViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = ContributionHistory.objects.all()
@@ -1300,7 +1704,7 @@ class ContributionHistoryViewSet(viewsets.ModelViewSet):
         if month: qs = qs.filter(month=month)
         return qs
 
-class MonthlyReportViewSet(viewsets.ModelViewSet):
+class MonthlyReportViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = MonthlyReport.objects.all()
@@ -1309,6 +1713,11 @@ class MonthlyReportViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def archive_month(self, request):
+        """
+        Archives one community (`community` + `district_elder`), a district
+        (`district_elder` only) or a whole overseer (`overseer_uid` only).
+        report_data / expenses_data are saved for single-community archives.
+        """
         data = request.data
         overseer_uid = data.get('overseer_uid')
         elder = data.get('district_elder')
@@ -1320,41 +1729,35 @@ class MonthlyReportViewSet(viewsets.ModelViewSet):
         report_data = data.get('report_data', {})
         expenses_data = data.get('expenses_data', {})
 
-        if not all([overseer_uid, elder, community, year, month]):
+        if not all([overseer_uid, year, month]) or (community and not elder):
             return Response({'error': 'Missing required fields'}, status=400)
+        try:
+            year, month = int(year), int(month)
+        except (TypeError, ValueError):
+            return Response({'error': 'year and month must be integers'}, status=400)
 
         try:
             with transaction.atomic():
-                users = Users.objects.filter(overseer_uid=overseer_uid, district_elder_name=elder, community_name=community)
-
-                history_records = []
-                for user in users:
-                    history_records.append(ContributionHistory(
-                        overseer_uid=overseer_uid, user_uid=user.uid, name=user.name, surname=user.surname,
-                        district_elder=elder, community=community, month=month, year=year,
-                        week1=float(user.week1 or 0), week2=float(user.week2 or 0), week3=float(user.week3 or 0), week4=float(user.week4 or 0),
-                    ))
-                    
-                    user.week1 = "0"
-                    user.week2 = "0"
-                    user.week3 = "0"
-                    user.week4 = "0"
-                    user.save()
-                
-                ContributionHistory.objects.bulk_create(history_records)
-
-                report_id = f"{community}_{year}_{month}"
-                MonthlyReport.objects.update_or_create(
-                    id=report_id,
-                    defaults={'community_name': community, 'year': year, 'month': month, **report_data}
-                )
-                OverseerExpenseReport.objects.create(**expenses_data)
-
-            return Response({'status': 'success', 'message': 'Month archived successfully'})
+                result = archive_contributions(overseer_uid, year, month, district_elder=elder, community=community)
+
+                if community:
+                    report_id = f"{community}_{year}_{month}"
+                    MonthlyReport.objects.update_or_create(
+                        id=report_id,
+                        defaults={'community_name': community, 'year': year, 'month': month, **report_data}
+                    )
+                    if expenses_data:
+                        # Keyed on community + month so a retried archive updates instead of duplicating
+                        expenses = {k: v for k, v in expenses_data.items() if k not in ('overseer_uid', 'community_name', 'year', 'month')}
+                        OverseerExpenseReport.objects.update_or_create(
+                            overseer_uid=overseer_uid, community_name=community, year=year, month=month, defaults=expenses
+                        )
+
+            return Response({'status': 'success', 'message': 'Month archived successfully', **result})
         except Exception as e:
             return Response({'error': str(e)}, status=500)
         
-class IssueReportViewSet(viewsets.ModelViewSet):
+class IssueReportViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = IssueReport.objects.all()
@@ -1366,7 +1769,7 @@ class IssueReportViewSet(viewsets.ModelViewSet):
         if is_resolved is not None: qs = qs.filter(is_resolved=(is_resolved.lower() == 'true')) 
         return qs
 
-class EventDiaryViewSet(CachedListMixin, viewsets.ModelViewSet):
+class EventDiaryViewSet(SparseFieldsetMixin, ConditionalListMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = EventDiary.objects.all()
@@ -1378,7 +1781,7 @@ class EventDiaryViewSet(CachedListMixin, viewsets.ModelViewSet):
         if year: queryset = queryset.filter(year=year)
         return queryset
 
-class EventContributionViewSet(CachedListMixin, viewsets.ModelViewSet):
+class EventContributionViewSet(SparseFieldsetMixin, CachedListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = EventContribution.objects.all()
@@ -1396,7 +1799,7 @@ from .models import ApostolicGreeting
 from .serializers import ApostolicGreetingSerializer
 # Ensure FirebaseAuthentication and IsFirebaseAuthenticated are imported
 
-class ApostolicGreetingViewSet(viewsets.ModelViewSet):
+class ApostolicGreetingViewSet(SparseFieldsetMixin, ConditionalListMixin, viewsets.ModelViewSet):
     authentication_classes = [FirebaseAuthentication]
     permission_classes = [IsFirebaseAuthenticated]
     queryset = ApostolicGreeting.objects.all()
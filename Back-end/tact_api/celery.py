@@ -0,0 +1,10 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tact_api.settings')
+
+# Run a worker with: celery -A tact_api worker
+app = Celery('tact_api')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -112,6 +112,36 @@ DATABASES = {
     )
 }
 
+# Shared cache tier. Set REDIS_URL so every gunicorn worker (and the face/celery
+# processes) see the same list caches and invalidations; otherwise each process
+# gets its own LocMem cache.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'tact',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                # A Redis outage degrades to cache misses instead of 500s
+                'IGNORE_EXCEPTIONS': True,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'tact-default',
+        }
+    }
+
+# Cached lists are served stale for this long after expiry while one refresh runs
+CACHE_STALE_TTL = int(os.environ.get('CACHE_STALE_TTL', 300))
+# How long concurrent misses wait on the request that is filling the same key
+CACHE_FILL_LOCK_TIMEOUT = int(os.environ.get('CACHE_FILL_LOCK_TIMEOUT', 30))
+
 # ==========================================
 # 5. PASSWORD VALIDATION
 # ==========================================
@@ -185,10 +215,27 @@ except Exception as e:
 FIREBASE_SERVICE_ACCOUNT_JSON = os.environ.get('FIREBASE_SERVICE_ACCOUNT_JSON')
 FIREBASE_STORAGE_BUCKET = 'tact-3c612.firebasestorage.app'
 
+# Decrypted blobs served by ServeDecryptedImageView (per-process LRU, bounded by bytes).
+# Set DECRYPTED_BLOB_SHARED_CACHE to a cache alias (e.g. "default" on Redis) to share them across workers.
+DECRYPTED_BLOB_CACHE_MAX_BYTES = int(os.environ.get('DECRYPTED_BLOB_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+DECRYPTED_BLOB_CACHE_MAX_ITEM_BYTES = int(os.environ.get('DECRYPTED_BLOB_CACHE_MAX_ITEM_BYTES', 8 * 1024 * 1024))
+DECRYPTED_BLOB_SHARED_CACHE = os.environ.get('DECRYPTED_BLOB_SHARED_CACHE')
+DECRYPTED_BLOB_SHARED_TIMEOUT = int(os.environ.get('DECRYPTED_BLOB_SHARED_TIMEOUT', 60 * 60))
+
+# Threads shared by all requests for parallel encrypt+upload of submitted files
+UPLOAD_MAX_WORKERS = int(os.environ.get('UPLOAD_MAX_WORKERS', 8))
+
 # Paystack
 PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY')
 PAYSTACK_API_BASE = os.environ.get('PAYSTACK_API_BASE')
 
+# Django REST Framework
+# Lists stay plain arrays unless the client sends ?page_size= or ?cursor= (see api/pagination.py)
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.OptInCursorPagination',
+    'PAGE_SIZE': 100,
+}
+
 # System Misc
 APPEND_SLASH = True
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -204,4 +251,59 @@ if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
     X_FRAME_OPTIONS = 'DENY'
     # Ensure HTTPS is recognized behind proxy
-    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
\ No newline at end of file
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+
+# ==========================================
+# 11. FACE RECOGNITION
+# ==========================================
+
+# Face inference worker (python manage.py run_face_worker, the Procfile "face" process).
+# e.g. "unix:/tmp/tact_face.sock" or "127.0.0.1:8765"; the web process must be able to reach it.
+# Unset = load the model in-process, and the "face" process exits without starting.
+FACE_WORKER_ADDRESS = os.environ.get('FACE_WORKER_ADDRESS')
+FACE_WORKER_AUTHKEY = os.environ.get('FACE_WORKER_AUTHKEY')  # Required with FACE_WORKER_ADDRESS; same value on both sides
+FACE_WORKER_TIMEOUT = int(os.environ.get('FACE_WORKER_TIMEOUT', '30'))
+
+# Micro-batching: live images arriving within the window are embedded together
+FACE_BATCH_WINDOW_MS = int(os.environ.get('FACE_BATCH_WINDOW_MS', '20'))
+FACE_BATCH_MAX_SIZE = int(os.environ.get('FACE_BATCH_MAX_SIZE', '16'))
+
+# Live/reference photos are downscaled to this longest side before detection
+FACE_MAX_IMAGE_SIDE = int(os.environ.get('FACE_MAX_IMAGE_SIDE', '1280'))
+
+# The model loads lazily on first use; the web process warms it up in the background at boot (wsgi.py).
+# Only detection + recognition are needed for embeddings; "all" also loads landmarks and genderage.
+FACE_ALLOWED_MODULES = [m.strip() for m in os.environ.get('FACE_ALLOWED_MODULES', 'detection,recognition').split(',') if m.strip() and m.strip() != 'all']
+FACE_DET_SIZE = int(os.environ.get('FACE_DET_SIZE', '640'))
+FACE_WARM_UP = os.environ.get('FACE_WARM_UP', 'True') == 'True'
+
+# Enrollment duplicate screening: member embeddings live in a memory-mapped matrix under this directory
+MEMBER_EMBEDDINGS_DIR = os.environ.get('MEMBER_EMBEDDINGS_DIR', str(BASE_DIR / 'face_store'))
+FACE_DUPLICATE_THRESHOLD = float(os.environ.get('FACE_DUPLICATE_THRESHOLD', '0.6'))
+FACE_DUPLICATE_MAX_CANDIDATES = int(os.environ.get('FACE_DUPLICATE_MAX_CANDIDATES', '5'))
+
+# ==========================================
+# 12. BACKGROUND JOBS & GEOCODING
+# ==========================================
+
+# Celery broker (e.g. the Redis URL) for `celery -A tact_api worker`.
+# Unset = background jobs run on a thread inside the web process (see api/tasks.py).
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL')
+CELERY_TASK_IGNORE_RESULT = True
+
+# Community coordinates are looked up in the background and cached in GeocodeCache
+GEOCODER_CLASS = os.environ.get('GEOCODER_CLASS', 'api.geocoding.NominatimGeocoder')
+GEOCODER_USER_AGENT = 'tact_backend_v2_smart_search'
+# Nominatim policy: at most 1 request/second. Enforced across processes through the
+# default cache, so with several web workers or Celery concurrency > 1 set REDIS_URL.
+GEOCODER_MIN_DELAY = float(os.environ.get('GEOCODER_MIN_DELAY', 1.0))
+GEOCODER_TIMEOUT = int(os.environ.get('GEOCODER_TIMEOUT', 10))
+GEOCODE_MISS_RETRY_DAYS = int(os.environ.get('GEOCODE_MISS_RETRY_DAYS', 30))
+
+# ==========================================
+# 13. OFFLINE SYNC
+# ==========================================
+
+# Change feed entries older than this are deleted by `python manage.py prune_change_log` (run it daily).
+# Clients whose token predates the oldest kept entry are told to do a full sync.
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 90))
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tact_api.settings')
 
 application = get_wsgi_application()
+
+# Only the web process warms the face model; management commands and workers load it on demand
+from django.conf import settings
+if settings.FACE_WARM_UP:
+    from api.face_engine import warm_up_in_background
+    warm_up_in_background()